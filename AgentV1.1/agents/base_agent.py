@@ -35,9 +35,11 @@ class BaseAgent(ABC):
         self.status = "stopped"
         logger.info(f"[{self.name}] Teardown complete")
 
-    async def log(self, action: str, input_data: str = "", output_data: str = "", status: str = "ok"):
-        """Log an action to memory."""
-        await self.memory.log_action(self.name, action, input_data, output_data, status)
+    async def log(
+        self, action: str, input_data: str = "", output_data: str = "", status: str = "ok", durable: bool = False
+    ):
+        """Log an action to memory (write-behind; durable=True commits before returning)."""
+        await self.memory.log_action(self.name, action, input_data, output_data, status, durable=durable)
         logger.info(f"[{self.name}] {action}: {status}")
 
     def set_status(self, status: str, action: str | None = None):
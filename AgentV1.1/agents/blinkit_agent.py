@@ -1,6 +1,8 @@
 import asyncio
 import json
 import logging
+import time
+import uuid
 
 from openai import AsyncOpenAI
 from browser_use import Agent, BrowserSession
@@ -8,111 +10,529 @@ from browser_use.llm.models import ChatOpenAI
 
 from agents.base_agent import BaseAgent
 from config import config
+from core import text_match
+from core.blinkit_client import BlinkItAPIError, BlinkItCheckoutError, BlinkItClient
+from core.catalog import ProductCatalog
+from core.dom_actions import DOMActions
 from core.intent import IntentDetector
+from core.llm_cache import LLMCache
 from core.memory import Memory
 from core.step_logger import log_step, StepType
 from events.bus import EventBus
+from models.schemas import FoodOption, OrderStatus
 
 logger = logging.getLogger(__name__)
 
+SEARCH_INPUT = 'input[placeholder="Search for atta dal and more."]'
+
+# Product card whose name best matches: exact (case-insensitive) name wins,
+# otherwise the first card containing it.
+_FIND_CARD_JS = """(productName) => {
+    const wanted = productName.trim().toLowerCase();
+    const cards = [...document.querySelectorAll('a[href^="/product/"]')];
+    const nameOf = (card) => (card.querySelector('.line-clamp-2')?.textContent || card.textContent || '').trim().toLowerCase();
+    return cards.find(c => nameOf(c) === wanted) || cards.find(c => nameOf(c).includes(wanted)) || null;
+}"""
+
+# Click the green "Add" button on the matching card
+_CLICK_ADD_JS = f"""(productName) => {{
+    const card = ({_FIND_CARD_JS})(productName);
+    if (!card) return false;
+    const button = [...card.querySelectorAll('button')].find(b => b.textContent.trim() === 'Add');
+    if (!button) return false;
+    button.scrollIntoView({{block: 'center'}});
+    button.click();
+    return true;
+}}"""
+
+# The card's "Add" button has turned into quantity controls (- 1 +)
+_IN_CART_JS = f"""(productName) => {{
+    const card = ({_FIND_CARD_JS})(productName);
+    if (!card) return false;
+    const buttons = [...card.querySelectorAll('button')];
+    return buttons.length >= 2 && !buttons.some(b => b.textContent.trim() === 'Add');
+}}"""
+
+# Every product card on the results page as {name, price, index, product_id, has_add}.
+# Cards are tagged with data-agent-card so the Add button can be clicked again later
+# by selector; "empty" distinguishes a real no-results page from cards not rendering.
+_EXTRACT_CARDS_JS = """() => {
+    const cards = [...document.querySelectorAll('a[href^="/product/"]')];
+    return JSON.stringify({
+        empty: cards.length === 0 && (document.body.innerText || '').includes('No Data found'),
+        cards: cards.map((card, index) => {
+            card.setAttribute('data-agent-card', String(index));
+            const buttons = [...card.querySelectorAll('button')];
+            return {
+                index,
+                name: (card.querySelector('.line-clamp-2')?.textContent || '').trim(),
+                price: (card.querySelector('.font-semibold')?.textContent || '').trim(),
+                unit: (card.querySelector('.line-clamp-2')?.nextElementSibling?.textContent || '').trim(),
+                product_id: (card.getAttribute('href') || '').split('-').pop(),
+                in_stock: !card.textContent.includes('Out of stock'),
+                has_add: buttons.some(b => b.textContent.trim() === 'Add'),
+            };
+        }),
+    });
+}"""
+
+# Product links of the listing on screen, to tell the results of a new search from it
+_RESULT_HREFS_JS = """() => [...document.querySelectorAll('a[href^="/product/"]')].map(a => a.getAttribute('href')).join('|')"""
+# Results for this query: ?q= is the query, no loading skeletons, and either the
+# empty-state message or "Search Results: N" with cards other than the listing
+# seen before the search (`before`, null to skip) — /search with no query shows
+# every product, and the old cards stay up for a render after the URL changes
+_SEARCH_READY_JS = """(query, before) => {
+    const q = new URLSearchParams(location.search).get('q') || '';
+    if (q.trim().toLowerCase() !== query.trim().toLowerCase()) return false;
+    if (document.querySelector('.animate-pulse')) return false;
+    const text = document.body.innerText || '';
+    const match = text.match(/Search Results:\\s*(\\d+)/);
+    if (match && Number(match[1]) > 0) {
+        const hrefs = [...document.querySelectorAll('a[href^="/product/"]')].map(a => a.getAttribute('href')).join('|');
+        return hrefs !== '' && hrefs !== before;
+    }
+    return text.includes('No Data found');
+}"""
+
 
 class BlinkItAgent(BaseAgent):
     """
     BlinkeyIt ordering agent. Spawned on-demand when ORDER_REQUESTED fires.
-    Opens BlinkeyIt in a new tab, searches for the item, picks the best option,
-    adds to cart, and checks out via COD.
+    Searches for each item, picks the best option, adds to cart, and checks out via COD —
+    several queued items go through one login and one checkout (run_batch).
+    - API mode (api_client set): talks to the BlinkeyIt server directly, no LLM browsing
+    - Browser mode: opens BlinkeyIt in a new tab and drives the UI with browser-use
+      (also the fallback when the API flow fails)
     """
 
-    def __init__(self, browser_session: BrowserSession, event_bus: EventBus, memory: Memory, intent_detector: IntentDetector):
+    def __init__(
+        self,
+        browser_session: BrowserSession,
+        event_bus: EventBus,
+        memory: Memory,
+        intent_detector: IntentDetector,
+        api_client: BlinkItClient | None = None,
+        logged_in: bool = False,
+        cart_lock: asyncio.Lock | None = None,
+        catalog: ProductCatalog | None = None,
+        llm_cache: LLMCache | None = None,
+    ):
         super().__init__("BlinkItAgent", browser_session, event_bus, memory)
         self.intent_detector = intent_detector
+        self.api_client = api_client
+        self.logged_in = logged_in  # True when the session comes pre-logged-in from the browser pool
+        # Concurrent orders share one BlinkeyIt account cart, and checkout empties it —
+        # hold this from add-to-cart through checkout so orders don't clobber each other
+        self.cart_lock = cart_lock or asyncio.Lock()
+        self.catalog = catalog  # local product index; lets search skip the server and the browser
+        self.llm_cache = llm_cache  # memoized fallback search terms
         self.llm = ChatOpenAI(model=config.LLM_MODEL, api_key=config.OPENAI_API_KEY)
+        self.actions = DOMActions("BlinkItAgent", browser_session, self.llm)
         self.openai_client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
 
     async def setup(self):
         """Navigate to BlinkeyIt and login if needed."""
         self.set_status("running", "Setting up BlinkeyIt")
+        if not self.logged_in:
+            await self._navigate_and_login()
+            self.logged_in = True
+        self.set_status("idle", None)
 
-    async def run(self, item: str = ""):
-        """Full ordering flow: navigate → login → search → pick → cart → checkout."""
+    async def run(self, item: str = "", order_id: str | None = None):
+        """Order a single item (see run_batch)."""
         if not item:
             logger.error("[BlinkItAgent] No item specified")
             return
-
-        self.set_status("running", f"Ordering: {item}")
-        await log_step("BlinkItAgent", StepType.EVENT, f"Starting order flow for '{item}'")
-        logger.info(f"[BlinkItAgent] Starting order flow for: {item}")
+        await self.run_batch([OrderStatus(order_id=order_id or uuid.uuid4().hex[:8], item=item)])
+
+    async def run_batch(self, orders: list[OrderStatus]) -> bool:
+        """Full ordering flow for one or more items in a single cart session:
+        login once → search + pick (+ add) per item → one COD checkout.
+        Uses the HTTP API when an api_client is set, falling back to the browser flow
+        only while the account's cart is as the API flow found it.
+        Publishes ORDER_COMPLETED / ORDER_FAILED per item, with its order_id
+        (ORDER_FAILED carries outcome="unknown" when the COD order was sent but never confirmed).
+        Orders cancelled mid-flow are skipped if not yet in the cart; one with
+        cancel_requested gets ORDER_FAILED with outcome "cancelled" once it is
+        dropped, or "unknown" if it was already in the cart and got ordered.
+        Returns False if the flow failed (the browser session may be mid-page)."""
+        items = ", ".join(f"'{o.item}'" for o in orders)
+        self.set_status("running", f"Ordering: {items}")
+        await log_step("BlinkItAgent", StepType.EVENT, f"Starting order flow for {items}", f"mode={'api' if self.api_client else 'browser'}, batch_size={len(orders)}")
+        logger.info(f"[BlinkItAgent] Starting order flow for: {items}")
+        started = time.monotonic()
+        failed: dict[str, str] = {}  # order_id → reason the item was dropped
 
         try:
-            # Step 1: Navigate to BlinkeyIt and login
-            await self._navigate_and_login()
+            if self.api_client is not None:
+                try:
+                    picked = await self._order_via_api(orders, failed)
+                except BlinkItCheckoutError:
+                    raise
+                except BlinkItAPIError as e:
+                    await log_step("BlinkItAgent", StepType.EVENT, "API order flow failed, falling back to browser flow", f"error={str(e)}")
+                    logger.warning(f"[BlinkItAgent] API flow failed for {items}: {e} — falling back to browser")
+                    await self.log("api_fallback", items, str(e), status="error")
+                    failed.clear()
+                    picked = await self._order_via_browser(orders, failed)
+            else:
+                picked = await self._order_via_browser(orders, failed)
+
+        except Exception as e:
+            outcome = "unknown" if isinstance(e, BlinkItCheckoutError) and e.stage == "submitted" else "failed"
+            await log_step("BlinkItAgent", StepType.EVENT, f"Order FAILED for {items}", f"error={str(e)}, outcome={outcome}")
+            logger.error(f"[BlinkItAgent] Order failed for {items}: {e} (outcome {outcome})")
+            await self.log("order_failed", items, str(e), status="error")
+            for order in orders:
+                if order.status == "cancelled":
+                    continue
+                if order.cancel_requested and outcome == "failed":
+                    await self.event_bus.publish("ORDER_FAILED", {"order_id": order.order_id, "item": order.item, "error": "cancelled", "outcome": "cancelled"})
+                else:
+                    await self.event_bus.publish("ORDER_FAILED", {"order_id": order.order_id, "item": order.item, "error": str(e), "outcome": outcome})
+            self.set_status("error", str(e))
+            return False
+
+        elapsed = time.monotonic() - started
+        for order in orders:
+            if order.status == "cancelled":
+                continue
+            chosen = picked.get(order.order_id)
+            if order.cancel_requested:
+                if chosen:
+                    error = f"Cancelled too late: '{chosen.name}' was already in the cart and got ordered"
+                    await log_step("BlinkItAgent", StepType.EVENT, f"Could not cancel '{order.item}'", f"error={error}")
+                    await self.event_bus.publish("ORDER_FAILED", {"order_id": order.order_id, "item": order.item, "error": error, "outcome": "unknown"})
+                else:
+                    await log_step("BlinkItAgent", StepType.EVENT, f"Dropped cancelled '{order.item}' from order")
+                    await self.event_bus.publish("ORDER_FAILED", {"order_id": order.order_id, "item": order.item, "error": "cancelled", "outcome": "cancelled"})
+                continue
+            if not chosen:
+                error = failed.get(order.order_id, "No products found")
+                await log_step("BlinkItAgent", StepType.EVENT, f"Dropping '{order.item}' from order", f"error={error}")
+                logger.warning(f"[BlinkItAgent] Not ordering {order.item}: {error}")
+                await self.event_bus.publish("ORDER_FAILED", {"order_id": order.order_id, "item": order.item, "error": error})
+                continue
+
+            # Publish success
+            await log_step("BlinkItAgent", StepType.EVENT, f"Order placed successfully for '{chosen.name}'", f"original_request='{order.item}', price={chosen.price}, elapsed={elapsed:.1f}s")
+            await self.event_bus.publish("ORDER_COMPLETED", {
+                "order_id": order.order_id,
+                "item": order.item,
+                "chosen": chosen.name,
+                "status": "success",
+            })
+            logger.info(f"[BlinkItAgent] Order completed for: {order.item} in {elapsed:.1f}s")
+        self.set_status("idle", None)
+        return True
+
+    async def _choose_option(self, options: list[FoodOption], item: str) -> FoodOption:
+        """Pick the best option using the LLM decision step."""
+        options_summary = ", ".join(f"{o.name} ({o.price})" for o in options[:5])
+        await log_step("BlinkItAgent", StepType.REASON, f"Evaluating {len(options)} product options via LLM", f"options=[{options_summary}]")
+        decision = await self.intent_detector.decide_food_option([o.model_dump() for o in options], item)
+        chosen_index = decision.get("chosen_index", 0)
+        if not isinstance(chosen_index, int) or not 0 <= chosen_index < len(options):
+            chosen_index = 0
+        chosen = options[chosen_index]
+
+        await log_step("BlinkItAgent", StepType.DECIDE, f"Selected '{chosen.name}' at {chosen.price}", f"reason={decision.get('reason', 'N/A')}")
+        logger.info(f"[BlinkItAgent] Chose: {chosen.name} (index {chosen_index})")
+        await self.log("decision", self._dump(options), json.dumps(decision))
+        return chosen
+
+    async def _choose_within_budget(self, options: list[FoodOption], order: OrderStatus, spent: int, failed: dict[str, str]) -> FoodOption | None:
+        """
+        Pick an option that fits the SuperMemory price cap on its own and
+        together with what the batch has already spent (in paise). Options
+        whose price couldn't be read are never picked, since they can't be
+        checked against the cap. Records why in failed[order_id] when nothing fits.
+        """
+        if not options:
+            failed[order.order_id] = "No products found"
+            return None
+
+        priced = [o for o in options if o.price_paise is not None]
+        if not priced:
+            failed[order.order_id] = "No option has a readable price"
+            return None
+
+        price_cap = self.intent_detector.supermemory.get_price_cap()
+        affordable = [o for o in priced if o.price_paise <= price_cap * 100]
+        if not affordable:
+            failed[order.order_id] = f"Every option is over the ₹{price_cap} price cap"
+            return None
+
+        chosen = await self._choose_option(affordable, order.item)
+        if spent + chosen.price_paise > price_cap * 100:
+            await log_step("BlinkItAgent", StepType.DECIDE, f"Skipping '{chosen.name}', batch total would exceed price cap", f"spent=₹{spent / 100:g}, price={chosen.price}, cap=₹{price_cap}")
+            failed[order.order_id] = f"Order total would exceed the ₹{price_cap} price cap"
+            return None
+        return chosen
+
+    @staticmethod
+    def _dump(options: list[FoodOption]) -> str:
+        return json.dumps([o.model_dump(exclude_none=True) for o in options])
 
-            # Step 2: Search for the item
-            await self._search_item(item)
+    # ── API mode ──────────────────────────────────────────────
 
-            # Step 3: Extract available options
-            options = await self._extract_options()
+    async def _order_via_api(self, orders: list[OrderStatus], failed: dict[str, str]) -> dict[str, FoodOption]:
+        """Place the order over HTTP. Returns {order_id: chosen option} for the items ordered."""
+        client = self.api_client
+
+        if not client.is_logged_in:
+            await log_step("BlinkItAgent", StepType.SEND, "POST /api/user/login", f"email={config.BLINKIT_EMAIL}")
+            await client.login()
+            await self.log("api_login", client.base_url)
+
+        picked: dict[str, FoodOption] = {}
+        spent = 0
+        for order in orders:
+            if self._cancelled(order):
+                continue
+            options = await self._catalog_search(order.item) or await self._api_search(order.item)
 
             # Fallback: if no results, ask LLM for a specific product name and retry once
             if not options:
-                await log_step("BlinkItAgent", StepType.OBSERVE, f"No search results found for '{item}'")
-                await log_step("BlinkItAgent", StepType.REASON, "Asking LLM for alternative search term as fallback")
-                logger.warning(f"[BlinkItAgent] No results for '{item}', trying fallback search...")
-                fallback_term = await self._get_fallback_search_term(item)
-                if fallback_term and fallback_term.lower() != item.lower():
-                    await log_step("BlinkItAgent", StepType.DECIDE, f"LLM suggested fallback term", f"'{item}' → '{fallback_term}'")
-                    logger.info(f"[BlinkItAgent] Fallback: retrying with '{fallback_term}'")
-                    await self._search_item(fallback_term)
-                    options = await self._extract_options()
+                await log_step("BlinkItAgent", StepType.OBSERVE, f"No search results found for '{order.item}'")
+                fallback_term = await self._get_fallback_search_term(order.item)
+                if fallback_term and fallback_term.lower() != order.item.lower():
+                    await log_step("BlinkItAgent", StepType.DECIDE, "LLM suggested fallback term", f"'{order.item}' → '{fallback_term}'")
+                    options = await self._catalog_search(fallback_term) or await self._api_search(fallback_term)
+
+            chosen = await self._choose_within_budget(options, order, spent, failed)
+            if chosen:
+                picked[order.order_id] = chosen
+                spent += chosen.price_paise
+
+        async with self.cart_lock:
+            picked = {oid: c for oid, c in picked.items() if not self._is_cancelled(orders, oid)}
+            if picked:
+                await self._api_checkout(list(picked.values()))
+        return picked
+
+    async def _api_checkout(self, chosen: list[FoodOption]):
+        """
+        Add the chosen products to the cart and place one COD order for all of them.
+        A failure before the COD request removes the cart lines added here and
+        re-raises BlinkItAPIError, so the caller may redo the order in the browser
+        (a cart over the price cap at live prices raises BlinkItCheckoutError instead).
+        Anything that leaves the cart or the order in an unknown state raises
+        BlinkItCheckoutError instead: the COD request is never sent twice.
+        """
+        client = self.api_client
+        added: list[str] = []  # cart line ids created by this checkout
 
-            if not options:
-                await log_step("BlinkItAgent", StepType.EVENT, f"No products found for '{item}' even after fallback, aborting order")
-                logger.warning(f"[BlinkItAgent] No options found for: {item} (even after fallback)")
-                await self.event_bus.publish("ORDER_FAILED", {"item": item, "error": "No products found"})
-                return
-
-            # Step 4: Pick the best option using LLM
-            options_summary = ", ".join(f"{o.get('name','?')} ({o.get('price','?')})" for o in options[:5])
-            await log_step("BlinkItAgent", StepType.REASON, f"Evaluating {len(options)} product options via LLM", f"options=[{options_summary}]")
-            decision = await self.intent_detector.decide_food_option(options, item)
-            chosen_index = decision.get("chosen_index", 0)
-            chosen_name = options[chosen_index].get("name", item) if chosen_index < len(options) else item
-            chosen_price = options[chosen_index].get("price", "N/A") if chosen_index < len(options) else "N/A"
-
-            await log_step("BlinkItAgent", StepType.DECIDE, f"Selected '{chosen_name}' at {chosen_price}", f"reason={decision.get('reason', 'N/A')}")
-            logger.info(f"[BlinkItAgent] Chose: {chosen_name} (index {chosen_index})")
-            await self.log("decision", json.dumps(options), json.dumps(decision))
-
-            # Step 5: Add to cart (stay on same page)
-            await self._add_to_cart(chosen_name)
-
-            # Step 6: Open cart and checkout
-            await self._checkout()
-
-            # Step 7: Publish success
-            await log_step("BlinkItAgent", StepType.EVENT, f"Order placed successfully for '{chosen_name}'", f"original_request='{item}', price={chosen_price}")
-            await self.event_bus.publish("ORDER_COMPLETED", {
-                "item": item,
-                "chosen": chosen_name,
-                "status": "success",
-            })
-            self.set_status("idle", None)
-            logger.info(f"[BlinkItAgent] Order completed for: {item}")
+        try:
+            for option in chosen:
+                await log_step("BlinkItAgent", StepType.SEND, "POST /api/cart/create", f"productId={option.product_id}")
+                line = await client.add_to_cart(option.product_id)
+                if line.get("_id"):
+                    added.append(line["_id"])
+                await self.log("add_to_cart", option.name)
+
+            wanted = {option.product_id for option in chosen}
+            cart = await client.get_cart()
+            list_items = [c for c in cart if (c.get("productId") or {}).get("_id") in wanted]
+            missing = wanted - {c["productId"]["_id"] for c in list_items}
+            if missing:
+                names = ", ".join(o.name for o in chosen if o.product_id in missing)
+                raise BlinkItAPIError(f"{names} missing from cart after add")
+            total = sum(
+                client.price_with_discount(c["productId"].get("price"), c["productId"].get("discount")) * c.get("quantity", 1)
+                for c in list_items
+            )
+            # Search / catalog prices can be stale and the cart may hold extra quantity:
+            # the budget is checked again against what the order will actually charge
+            self._check_cart_budget(list_items, total)
+
+            addresses = await client.get_addresses()
+            if not addresses:
+                raise BlinkItAPIError("No delivery address saved on the account")
+        except BlinkItAPIError as e:
+            await self._undo_cart_adds(added, e)
+            raise
+
+        await log_step("BlinkItAgent", StepType.SUBMIT, "POST /api/order/cash-on-delivery", f"items={len(list_items)}, total=₹{total}, address={addresses[0].get('_id')}")
+        try:
+            await client.cash_on_delivery(list_items, addresses[0]["_id"], total)
+        except BlinkItAPIError as e:
+            await self.log("checkout_unknown", ", ".join(o.name for o in chosen), str(e), status="error", durable=True)
+            raise BlinkItCheckoutError(f"COD order sent but not confirmed, it may or may not have been placed: {e}", stage="submitted") from e
+        names = ", ".join(o.name for o in chosen)
+        await self.log("checkout", f"COD order placed via API for {names} (₹{total})", durable=True)
+        logger.info(f"[BlinkItAgent] COD order placed via API for {names} (₹{total})")
+
+    def _check_cart_budget(self, list_items: list[dict], total: int):
+        """Raise BlinkItCheckoutError (stage "budget") if a cart line or the order total is over the price cap."""
+        price_cap = self.intent_detector.supermemory.get_price_cap()
+        for c in list_items:
+            product = c["productId"]
+            price = self.api_client.price_with_discount(product.get("price"), product.get("discount"))
+            if price > price_cap:
+                raise BlinkItCheckoutError(f"{product.get('name', product['_id'])} costs ₹{price} in the cart, over the ₹{price_cap} price cap", stage="budget")
+        if total > price_cap:
+            raise BlinkItCheckoutError(f"Cart total ₹{total} is over the ₹{price_cap} price cap", stage="budget")
+
+    async def _undo_cart_adds(self, cart_item_ids: list[str], cause: BlinkItAPIError):
+        """Remove the cart lines a failed API checkout added. Raises BlinkItCheckoutError if any stay behind."""
+        left: list[str] = []
+        for cart_item_id in cart_item_ids:
+            await log_step("BlinkItAgent", StepType.SEND, "DELETE /api/cart/delete-cart-item", f"_id={cart_item_id}")
+            try:
+                await self.api_client.remove_from_cart(cart_item_id)
+            except BlinkItAPIError as e:
+                logger.warning(f"[BlinkItAgent] Could not remove cart line {cart_item_id}: {e}")
+                left.append(cart_item_id)
+        if left:
+            raise BlinkItCheckoutError(f"{cause} (and {len(left)} item(s) added to the cart could not be removed)", stage="cart") from cause
+
+    @staticmethod
+    def _cancelled(order: OrderStatus) -> bool:
+        return order.status == "cancelled" or order.cancel_requested
+
+    @classmethod
+    def _is_cancelled(cls, orders: list[OrderStatus], order_id: str) -> bool:
+        return any(o.order_id == order_id and cls._cancelled(o) for o in orders)
+
+    async def _api_search(self, term: str) -> list[FoodOption]:
+        """Search products over HTTP and shape them like the browser-extracted options."""
+        await log_step("BlinkItAgent", StepType.SEARCH, "POST /api/product/search-product", f"search='{term}'")
+        products = await self.api_client.search_products(term)
+        if self.catalog is not None:
+            self.catalog.merge(products)
+        orderable = [p for p in products if p.get("_id") and p.get("stock") != 0 and p.get("publish", True)]
+        options = []
+        for index, p in enumerate(orderable):
+            price = self.api_client.price_with_discount(p.get("price"), p.get("discount"))
+            options.append(FoodOption(
+                name=p.get("name", ""),
+                price=f"₹{price}",
+                price_paise=price * 100,
+                description=p.get("unit") or None,
+                element_index=index,
+                product_id=p["_id"],
+            ))
+        options_detail = ", ".join(f"{o.name} ({o.price})" for o in options[:5])
+        await log_step("BlinkItAgent", StepType.EXTRACT, f"API returned {len(options)} orderable products", f"products=[{options_detail}]")
+        await self.log("search", term, self._dump(options))
+        return options
 
-        except Exception as e:
-            await log_step("BlinkItAgent", StepType.EVENT, f"Order FAILED for '{item}'", f"error={str(e)}")
-            logger.error(f"[BlinkItAgent] Order failed for {item}: {e}")
-            await self.log("order_failed", item, str(e), status="error")
-            await self.event_bus.publish("ORDER_FAILED", {"item": item, "error": str(e)})
-            self.set_status("error", str(e))
+    async def _catalog_search(self, term: str) -> list[FoodOption]:
+        """Ranked matches from the local catalog, shaped like the API/browser options. [] if no catalog."""
+        if self.catalog is None:
+            return []
+        await self.catalog.ensure_fresh()
+
+        started = time.perf_counter()
+        matches = self.catalog.search(term)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        options = [
+            FoodOption(
+                name=p.name,
+                price=f"₹{p.price}",
+                price_paise=p.price * 100,
+                description=p.unit or None,
+                element_index=index,
+                product_id=p.product_id,
+            )
+            for index, (_, p) in enumerate(matches)
+        ]
+
+        options_detail = ", ".join(f"{o.name} ({o.price})" for o in options[:5])
+        await log_step("BlinkItAgent", StepType.SEARCH, f"Local catalog matched {len(options)} products for '{term}'", f"lookup={elapsed_us:.0f}µs, products=[{options_detail}]")
+        if options:
+            await self.log("catalog_search", term, self._dump(options))
+        return options
+
+    # ── Browser mode ──────────────────────────────────────────
+
+    async def _order_via_browser(self, orders: list[OrderStatus], failed: dict[str, str]) -> dict[str, FoodOption]:
+        """Drive the BlinkeyIt UI with browser-use agents. Returns {order_id: chosen option}."""
+        # Step 1: Navigate to BlinkeyIt and login (skipped for warm pooled sessions)
+        if not self.logged_in:
+            await self._navigate_and_login()
+            self.logged_in = True
+        else:
+            await log_step("BlinkItAgent", StepType.OBSERVE, "Using warm pooled session, already logged in")
+
+        picked: dict[str, FoodOption] = {}
+        spent = 0
+        # Items are added straight from their search results page, so the cart is
+        # held from the first search until checkout
+        async with self.cart_lock:
+            for order in orders:
+                if self._cancelled(order):
+                    continue
+                item = order.item
+
+                # Known products: pick from the local catalog, the browser only has to add it
+                options = await self._catalog_search(item)
+                if options:
+                    chosen = await self._choose_within_budget(options, order, spent, failed)
+                    if not chosen or self._cancelled(order):
+                        continue
+                    await self._search_item(chosen.name)
+                    await self._add_to_cart(chosen)
+                    picked[order.order_id] = chosen
+                    spent += chosen.price_paise
+                    continue
+
+                # Step 2: Search for the item
+                await self._search_item(item)
+
+                # Step 3: Extract available options
+                options = await self._extract_options()
+
+                # Fallback: if no results, ask LLM for a specific product name and retry once
+                if not options:
+                    await log_step("BlinkItAgent", StepType.OBSERVE, f"No search results found for '{item}'")
+                    await log_step("BlinkItAgent", StepType.REASON, "Asking LLM for alternative search term as fallback")
+                    logger.warning(f"[BlinkItAgent] No results for '{item}', trying fallback search...")
+                    fallback_term = await self._get_fallback_search_term(item)
+                    if fallback_term and fallback_term.lower() != item.lower():
+                        await log_step("BlinkItAgent", StepType.DECIDE, f"LLM suggested fallback term", f"'{item}' → '{fallback_term}'")
+                        logger.info(f"[BlinkItAgent] Fallback: retrying with '{fallback_term}'")
+                        await self._search_item(fallback_term)
+                        options = await self._extract_options()
+
+                # Step 4: Pick the best option using LLM, within the price cap
+                chosen = await self._choose_within_budget(options, order, spent, failed)
+                if not chosen or self._cancelled(order):
+                    continue
+
+                # Step 5: Add to cart (stay on same page)
+                await self._add_to_cart(chosen)
+                picked[order.order_id] = chosen
+                spent += chosen.price_paise
+
+            # Step 6: Open cart and checkout once for everything added
+            if picked:
+                await self._checkout()
+        return picked
 
     async def _navigate_and_login(self):
         """Go to BlinkeyIt and login first — always login before anything else."""
         await log_step("BlinkItAgent", StepType.NAVIGATE, f"Opening BlinkeyIt at {config.BLINKIT_URL}")
         await log_step("BlinkItAgent", StepType.OBSERVE, "Looking for 'Login' button in header")
 
-        login_agent = Agent(
-            task=f"""
+        async def login_by_selector() -> bool:
+            await self.actions.goto(self._blinkit_url("/login"))
+            if not await self.actions.wait_for_selector("#email"):
+                return False
+            if not (await self.actions.type("#email", config.BLINKIT_EMAIL)
+                    and await self.actions.type("#password", config.BLINKIT_PASSWORD)):
+                return False
+            if not await self.actions.click("form button", "Login"):
+                return False
+            # Successful login redirects home and the header shows the Account menu
+            return await self.actions.wait_for_selector("header", "Account", timeout=10)
+
+        await self.actions.run_step(
+            "login",
+            login_by_selector,
+            f"""
             Go to {config.BLINKIT_URL}
 
             IMPORTANT: You MUST login first before doing anything else.
@@ -125,11 +545,7 @@ class BlinkItAgent(BaseAgent):
 
             If you are already logged in (you can see products or an "Account" dropdown), skip login.
             """,
-            llm=self.llm,
-            browser_session=self.browser_session,
-            use_judge=False,
         )
-        await login_agent.run()
 
         await log_step("BlinkItAgent", StepType.CLICK, "Clicked 'Login' button in header")
         await log_step("BlinkItAgent", StepType.OBSERVE, "Found email and password input fields on login page")
@@ -143,9 +559,25 @@ class BlinkItAgent(BaseAgent):
     async def _search_item(self, item: str):
         """Type the full search term in the search bar and wait for results."""
         await log_step("BlinkItAgent", StepType.OBSERVE, "Looking for search bar at top of page", "placeholder='Search for atta dal and more.'")
-
-        search_agent = Agent(
-            task=f"""
+        before = None
+
+        async def search_by_selector() -> bool:
+            nonlocal before
+            # The header search box only becomes a real input on /search
+            await self.actions.goto(self._blinkit_url("/search"))
+            if not await self.actions.wait_for_selector(SEARCH_INPUT):
+                return False
+            # Typing already routes to /search?q=<item>, so take the listing first
+            before = await self.actions.evaluate(_RESULT_HREFS_JS)
+            if not await self.actions.type(SEARCH_INPUT, item):
+                return False
+            await self.actions.press_enter()
+            return True
+
+        await self.actions.run_step(
+            "search",
+            search_by_selector,
+            f"""
             You are on the BlinkeyIt homepage or any page on the site.
 
             1. Find the search bar at the top of the page. It has placeholder text like "Search for atta dal and more."
@@ -159,28 +591,68 @@ class BlinkItAgent(BaseAgent):
                Or look for "Search Results:" text followed by a count number.
             6. Do NOT click on any product. Just wait for results to fully appear.
             """,
-            llm=self.llm,
-            browser_session=self.browser_session,
-            use_judge=False,
         )
-        await search_agent.run()
 
         await log_step("BlinkItAgent", StepType.CLICK, "Clicked on search input field to focus it")
         await log_step("BlinkItAgent", StepType.TYPE, f"Typed '{item}' into search bar")
         await log_step("BlinkItAgent", StepType.SEARCH, f"Pressed Enter to search for '{item}'")
-        await log_step("BlinkItAgent", StepType.WAIT, "Waiting 5s for search results to render", "looking for product cards with images, names, prices, green 'Add' buttons")
+        await log_step("BlinkItAgent", StepType.WAIT, "Waiting for search results to render", "looking for 'Search Results:' count with product cards, or 'No Data found'")
 
         # Wait for search results to fully render
-        logger.info(f"[BlinkItAgent] Waiting 5s for search results to load...")
-        await asyncio.sleep(5)
+        await self.actions.wait_for_js(_SEARCH_READY_JS, f"search results for '{item}'", item, before)
 
         await self.log("search", item)
         logger.info(f"[BlinkItAgent] Searched for: {item}")
 
-    async def _extract_options(self) -> list[dict]:
-        """Extract product options from the search results page."""
+    async def _extract_options(self) -> list[FoodOption]:
+        """Read product cards off the search results page; LLM extraction only if that fails."""
         await log_step("BlinkItAgent", StepType.OBSERVE, "Scanning page for product listing cards in search results")
 
+        options = await self._extract_options_from_dom()
+        self.actions.record_step("extract_options", options is not None)
+        if options is None:
+            await log_step("BlinkItAgent", StepType.REASON, "Could not read product cards from the DOM, falling back to LLM extraction")
+            options = await self._extract_options_with_llm()
+
+        if options:
+            options_detail = ", ".join(f"{o.name} ({o.price})" for o in options[:5])
+            await log_step("BlinkItAgent", StepType.EXTRACT, f"Extracted {len(options)} product options from page", f"products=[{options_detail}]")
+        else:
+            await log_step("BlinkItAgent", StepType.EXTRACT, "No product options found on page")
+        logger.info(f"[BlinkItAgent] Found {len(options)} options")
+        await self.log("extract_options", "", self._dump(options))
+        return options
+
+    async def _extract_options_from_dom(self) -> list[FoodOption] | None:
+        """In-stock product cards as FoodOptions. [] for a no-results page, None if the cards couldn't be read."""
+        try:
+            page = json.loads(await self.actions.evaluate(_EXTRACT_CARDS_JS) or "{}")
+        except Exception as e:
+            logger.warning(f"[BlinkItAgent] DOM extraction failed: {e}")
+            return None
+
+        cards = page.get("cards") or []
+        if not cards:
+            return [] if page.get("empty") else None
+
+        options = [
+            FoodOption(
+                name=card["name"],
+                price=card["price"],
+                price_paise=text_match.parse_paise(card["price"]),
+                description=card.get("unit") or None,
+                element_index=card["index"],
+                product_id=card.get("product_id") or None,
+                add_selector=f'a[data-agent-card="{card["index"]}"] button' if card.get("has_add") else None,
+            )
+            for card in cards
+            if card.get("name") and card.get("in_stock", True)
+        ]
+        # Cards rendered but none readable: markup changed, let the LLM look
+        return options if options or all(not c.get("in_stock", True) for c in cards) else None
+
+    async def _extract_options_with_llm(self) -> list[FoodOption]:
+        """Fallback: have a browser-use agent read the results and parse its JSON answer."""
         extract_agent = Agent(
             task="""
             Look at the product listings / search results on the page.
@@ -197,18 +669,25 @@ class BlinkItAgent(BaseAgent):
         result_text = result.final_result() if hasattr(result, 'final_result') else str(result)
 
         # Parse options from result
-        options = self._parse_options(result_text)
-        if options:
-            options_detail = ", ".join(f"{o.get('name','?')} ({o.get('price','?')})" for o in options[:5])
-            await log_step("BlinkItAgent", StepType.EXTRACT, f"Extracted {len(options)} product options from page", f"products=[{options_detail}]")
-        else:
-            await log_step("BlinkItAgent", StepType.EXTRACT, "No product options found on page")
-        logger.info(f"[BlinkItAgent] Found {len(options)} options")
-        await self.log("extract_options", "", json.dumps(options))
-        return options
+        return [
+            FoodOption(
+                name=str(o.get("name", "")),
+                price=str(o.get("price", "")),
+                price_paise=text_match.parse_paise(o.get("price", "")),
+                element_index=index,
+            )
+            for index, o in enumerate(self._parse_options(result_text))
+            if isinstance(o, dict) and o.get("name")
+        ]
 
     async def _get_fallback_search_term(self, original_item: str) -> str | None:
-        """Ask LLM for a specific, common product name to search on Blinkit."""
+        """Ask LLM for a specific, common product name to search on Blinkit (cached per item)."""
+        if self.llm_cache:
+            cached = await self.llm_cache.get_fallback_term(original_item)
+            if cached:
+                await log_step("BlinkItAgent", StepType.REASON, "Using cached fallback search term", f"'{original_item}' → '{cached}'")
+                return cached
+
         try:
             response = await self.openai_client.chat.completions.create(
                 model=config.LLM_MODEL,
@@ -228,6 +707,8 @@ class BlinkItAgent(BaseAgent):
             fallback = response.choices[0].message.content.strip().strip('"').strip("'")
             logger.info(f"[BlinkItAgent] LLM fallback suggestion: '{original_item}' → '{fallback}'")
             await self.log("fallback_search", original_item, fallback)
+            if self.llm_cache and fallback:
+                await self.llm_cache.set_fallback_term(original_item, fallback)
             return fallback
         except Exception as e:
             logger.error(f"[BlinkItAgent] Fallback LLM call failed: {e}")
@@ -258,12 +739,21 @@ class BlinkItAgent(BaseAgent):
         logger.warning(f"[BlinkItAgent] Could not parse options from: {text[:200]}")
         return []
 
-    async def _add_to_cart(self, product_name: str):
+    async def _add_to_cart(self, option: FoodOption):
         """Find the product in search results and click its Add button."""
+        product_name = option.name
         await log_step("BlinkItAgent", StepType.OBSERVE, f"Scanning product grid for card matching '{product_name}'", "each card has image, name, price, green 'Add' button")
 
-        cart_agent = Agent(
-            task=f"""
+        async def add_by_selector() -> bool:
+            # The card tagged during extraction first, then whichever card matches by name
+            if option.add_selector and await self.actions.click(option.add_selector, "Add"):
+                return True
+            return (await self.actions.evaluate(_CLICK_ADD_JS, product_name)) == "True"
+
+        await self.actions.run_step(
+            "add_to_cart",
+            add_by_selector,
+            f"""
             You are on a search results page showing product cards in a grid.
             Each card has a product image, name, price, and a green "Add" button at the bottom.
 
@@ -276,11 +766,7 @@ class BlinkItAgent(BaseAgent):
             - After clicking, the "Add" button will change to show quantity controls (- 1 +). That means it worked.
             - Stay on this page. Do NOT navigate anywhere else.
             """,
-            llm=self.llm,
-            browser_session=self.browser_session,
-            use_judge=False,
         )
-        await cart_agent.run()
 
         await log_step("BlinkItAgent", StepType.OBSERVE, f"Found product card for '{product_name}' in grid")
         await log_step("BlinkItAgent", StepType.CLICK, f"Clicked green 'Add' button on '{product_name}' card")
@@ -289,16 +775,25 @@ class BlinkItAgent(BaseAgent):
         logger.info(f"[BlinkItAgent] Added to cart: {product_name}")
 
         # Wait for cart state to update
-        await log_step("BlinkItAgent", StepType.WAIT, "Waiting 2s for cart state to update")
-        await asyncio.sleep(2)
+        await log_step("BlinkItAgent", StepType.WAIT, "Waiting for quantity controls (- 1 +) on the card")
+        await self.actions.wait_for_js(_IN_CART_JS, f"'{product_name}' quantity controls", product_name)
 
     async def _checkout(self):
         """Open the cart sidebar, proceed to checkout, and place order via COD."""
         # Step A: Open the cart sidebar and proceed
         await log_step("BlinkItAgent", StepType.OBSERVE, "Looking for green cart button in top-right header", "shows item count and total price")
 
-        cart_open_agent = Agent(
-            task=f"""
+        async def open_cart_by_selector() -> bool:
+            if not await self.actions.click("header button", "Items"):
+                return False
+            if not await self.actions.wait_for_selector("button", "Proceed"):
+                return False
+            return await self.actions.click("button", "Proceed")
+
+        await self.actions.run_step(
+            "open_cart",
+            open_cart_by_selector,
+            f"""
             You are on the search results page. An item has already been added to the cart.
 
             Look at the top-right header area. There should be a green cart button that shows the item count and total price (e.g. "1 Item ₹120" or "My Cart").
@@ -310,11 +805,7 @@ class BlinkItAgent(BaseAgent):
 
             You will be taken to the checkout page at /checkout.
             """,
-            llm=self.llm,
-            browser_session=self.browser_session,
-            use_judge=False,
         )
-        await cart_open_agent.run()
 
         await log_step("BlinkItAgent", StepType.CLICK, "Clicked green cart button in header to open cart sidebar")
         await log_step("BlinkItAgent", StepType.OBSERVE, "Cart sidebar opened, showing items and bill summary")
@@ -322,13 +813,22 @@ class BlinkItAgent(BaseAgent):
         await log_step("BlinkItAgent", StepType.NAVIGATE, "Navigated to checkout page at /checkout")
         logger.info("[BlinkItAgent] Cart opened and proceeded to checkout")
 
-        await asyncio.sleep(2)
+        await self.actions.wait_for_url("/checkout", "checkout page")
 
         # Step B: Complete checkout with COD
         await log_step("BlinkItAgent", StepType.OBSERVE, "On checkout page, checking delivery address section on left", "looking for pre-selected radio button")
 
-        checkout_agent = Agent(
-            task=f"""
+        async def cod_by_selector() -> bool:
+            if not await self.actions.wait_for_selector("button", "Cash on Delivery"):
+                return False
+            if not await self.actions.exists('input[name="address"]:checked'):
+                await self.actions.click('input[name="address"]')
+            return await self.actions.click("button", "Cash on Delivery")
+
+        await self.actions.run_step(
+            "checkout_cod",
+            cod_by_selector,
+            f"""
             You are now on the checkout page. It has two sections:
             - Left side: delivery address (one or more addresses with radio buttons)
             - Right side: order summary with payment options
@@ -345,20 +845,20 @@ class BlinkItAgent(BaseAgent):
             IMPORTANT: Do NOT click "Online Payment". Only use "Cash on Delivery".
             IMPORTANT: Do NOT try to add a new address.
             """,
-            llm=self.llm,
-            browser_session=self.browser_session,
-            use_judge=False,
         )
-        await checkout_agent.run()
 
         await log_step("BlinkItAgent", StepType.OBSERVE, "Delivery address confirmed (pre-selected or first option chosen)")
         await log_step("BlinkItAgent", StepType.OBSERVE, "Found payment options: 'Online Payment' and 'Cash on Delivery'")
         await log_step("BlinkItAgent", StepType.CLICK, "Clicked 'Cash on Delivery' button to place order")
         await log_step("BlinkItAgent", StepType.WAIT, "Waiting for order confirmation page")
         await log_step("BlinkItAgent", StepType.SUBMIT, "Order placed via Cash on Delivery")
-        await self.log("checkout", "COD order placed")
+        await self.log("checkout", "COD order placed", durable=True)
         logger.info("[BlinkItAgent] Checkout completed via Cash on Delivery")
 
+    @staticmethod
+    def _blinkit_url(path: str) -> str:
+        return config.BLINKIT_URL.rstrip("/") + path
+
     async def teardown(self):
         """Cleanup."""
         self.set_status("idle", None)
@@ -0,0 +1,143 @@
+"""
+Conversation Worker — one asyncio task per active chat.
+
+Each worker owns its conversation's context window and a list of rows
+not yet handled. Rows pushed while the handler is busy (waiting on the
+LLM or the browser) pile up and are handled together on the next turn,
+so a slow reply in one chat never holds up another.
+
+With a `debounce` window a turn waits until the chat has been quiet that
+long (but never more than `max_wait` after the first unhandled row), so
+a burst of quick messages is handled in one turn. Handlers can watch
+`interrupted()` to drop work that newer rows have made stale. Rows sent
+by `own_id` (the echo of our own replies) only join the context window:
+they never start a turn or interrupt one.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationWorker:
+    def __init__(
+        self,
+        name: str,
+        conversation_id: str,
+        handler: Callable[["ConversationWorker", list[dict]], Awaitable[None]],
+        window: int = 5,
+        debounce: float = 0.0,
+        max_wait: float = 0.0,
+        own_id: str = "",
+    ):
+        self.name = name
+        self.conversation_id = conversation_id
+        self.handler = handler
+        self.debounce = debounce
+        self.max_wait = max(max_wait, debounce)
+        self.own_id = own_id
+        self.context: deque[dict] = deque(maxlen=window)
+        self._pending: list[dict] = []
+        self._first_pending_at = 0.0
+        self._wake = asyncio.Event()
+        self._arrived = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.busy = False
+
+        # Stats for /status
+        self.turns = 0
+        self.errors = 0
+        self.rows_handled = 0
+        self.superseded = 0
+
+    def push(self, rows: list[dict]):
+        """New rows for this conversation (oldest first)."""
+        self.context.extend(rows)
+        incoming = [row for row in rows if row.get("sender_id") != self.own_id]
+        if not incoming:
+            return
+        if not self._pending:
+            self._first_pending_at = asyncio.get_running_loop().time()
+        self._pending.extend(incoming)
+        self._arrived.set()
+        self._wake.set()
+
+    @property
+    def has_pending(self) -> bool:
+        """Rows arrived since the current turn started."""
+        return bool(self._pending)
+
+    @property
+    def pending(self) -> list[dict]:
+        """Rows pushed but not yet handed to a turn."""
+        return list(self._pending)
+
+    async def interrupted(self):
+        """Returns once new rows arrive during the current turn."""
+        await self._arrived.wait()
+
+    def preload(self, rows: list[dict]):
+        """History for the context window only — nothing to handle."""
+        self.context.extend(rows)
+
+    def wake(self):
+        """Run a turn even without new rows (e.g. to flush queued notifications)."""
+        self._wake.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"conversation:{self.name}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "busy": self.busy,
+            "pending": len(self._pending),
+            "turns": self.turns,
+            "rows_per_turn": round(self.rows_handled / self.turns, 2) if self.turns else None,
+            "superseded": self.superseded,
+            "errors": self.errors,
+        }
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            if self._pending and self.debounce > 0:
+                await self._settle()
+            self._wake.clear()
+            self._arrived.clear()
+            rows, self._pending = self._pending, []
+            self.busy = True
+            try:
+                await self.handler(self, rows)
+                self.turns += 1
+                self.rows_handled += len(rows)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"[ConversationWorker] {self.name}: {e}")
+            finally:
+                self.busy = False
+
+    async def _settle(self):
+        """Wait for `debounce` seconds without new rows, capped at `max_wait` after the first pending row."""
+        loop = asyncio.get_running_loop()
+        deadline = self._first_pending_at + self.max_wait
+        while (remaining := deadline - loop.time()) > 0:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), min(self.debounce, remaining))
+            except asyncio.TimeoutError:
+                return
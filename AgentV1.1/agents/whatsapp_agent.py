@@ -1,55 +1,153 @@
 import asyncio
 import json
 import logging
-
-from supabase import create_client
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
 
 from browser_use import Agent, BrowserSession
 from browser_use.llm.models import ChatOpenAI
 
 from agents.base_agent import BaseAgent
+from agents.conversation_worker import ConversationWorker
 from config import config
+from core.chat_feed import ChatFeed
+from core.chat_store import ChatStore
+from core.context_cache import MessageRecord
+from core.dom_actions import DOMActions
 from core.intent import IntentDetector
 from core.memory import Memory
+from core.poll_scheduler import PollScheduler
+from core.processed_ids import ProcessedIds
+from core.priority_gate import PRIORITY_OTHER, PRIORITY_TARGET, PriorityGate
 from core.step_logger import log_step, StepType
+from core.waits import WaitPolicy
 from events.bus import EventBus
-from models.schemas import ChatMessage
+from models.schemas import IntentResult
 
 logger = logging.getLogger(__name__)
 
+MESSAGE_INPUT = 'input[placeholder="Type a message"]'
+CONTACT_ROW = ".users .user .name p"
+
+# The clone opens a chat from #chat=<contact id> and tags sidebar rows and the open
+# chat's header with data-contact-id; builds without those tags are matched by name
+_ROUTE_TO_CHAT_JS = """(id) => {
+    const hash = '#chat=' + encodeURIComponent(id);
+    if (location.hash === hash) window.dispatchEvent(new HashChangeEvent('hashchange'));
+    else location.hash = hash;
+    return true;
+}"""
+_CHAT_OPEN_JS = """(id, name) => {
+    const header = document.querySelector('.profileInformation');
+    if (!header) return false;
+    if (header.dataset.contactId) return header.dataset.contactId === id;
+    return (header.querySelector('h4')?.textContent || '').trim() === name;
+}"""
+# {contact id: selector of its sidebar row}, given {contact id: name}
+_CONTACT_ROWS_JS = """(names) => {
+    const rows = {};
+    document.querySelectorAll('.users .user').forEach((row, i) => {
+        const name = (row.querySelector('.name p')?.textContent || '').trim();
+        const id = row.dataset.contactId || Object.keys(names).find((key) => names[key] === name);
+        if (id) rows[id] = row.dataset.contactId
+            ? '.users .user[data-contact-id="' + id + '"]'
+            : '.users .user:nth-child(' + (i + 1) + ')';
+    });
+    return JSON.stringify(rows);
+}"""
+_ROUTE_WAIT = WaitPolicy(timeout=2.0)
+_MESSAGE_SHOWN_JS = """(text) => document.body.innerText.includes(text)"""
+
+WATERMARKS_KEY = "chat_watermarks"  # user_state key: {conversation_id: created_at of newest row seen}
+POLL_PAGE_SIZE = 100
+CONTEXT_WINDOW = 5  # messages kept per other-contact conversation for replies
+
 
 class WhatsAppAgent(BaseAgent):
     """
     WhatsApp chat agent. Runs continuously:
-    - Polls Supabase directly for new messages (no browser scraping)
-    - Sends messages to LLM for intent detection
-    - Replies by inserting into Supabase (instant, no browser agent)
+    - Gets new messages pushed over Supabase Realtime, polling Supabase
+      directly while the feed is down or INGEST_MODE=poll (no browser scraping)
+    - Hands each chat's messages to its own ConversationWorker; the target's
+      worker runs LLM intent detection, other contacts' workers reply in
+      parallel (bounded LLM concurrency, target first)
+    - Replies by inserting into Supabase (instant, no browser agent); queued
+      replies go out in one insert
     - Publishes ORDER_REQUESTED when food craving detected
-    - Browser is only used for initial setup (login + open chat) so user can watch
+    - Browser is only used for initial setup (login + open chat) and, off the
+      reply path, to mirror other chats so user can watch (SEND_MODE=ui types instead)
     """
 
-    def __init__(self, browser_session: BrowserSession, event_bus: EventBus, memory: Memory, intent_detector: IntentDetector):
+    def __init__(
+        self,
+        browser_session: BrowserSession,
+        event_bus: EventBus,
+        memory: Memory,
+        intent_detector: IntentDetector,
+        chat_store: ChatStore,
+    ):
         super().__init__("WhatsAppAgent", browser_session, event_bus, memory)
         self.intent_detector = intent_detector
         self.llm = ChatOpenAI(model=config.LLM_MODEL, api_key=config.OPENAI_API_KEY)
+        self.actions = DOMActions("WhatsAppAgent", browser_session, self.llm)
         self._running = False
-        self._ordering = False
+        self._ordering_items: set[str] = set()  # items with an order in flight (lowercased)
         self._pending_notifications: list[str] = []
+        self._unanswered: list[str] = []  # target messages in memory still awaiting a reply
+        self._catch_up_order: list[str] = []  # conversations to reply to first after startup
+        self.catch_up_stats: dict = {}
 
-        # Idle-time one-shot replies to other contacts (only if instruction says so)
-        self._idle_seconds: int = 0
-        self._handled_contacts: set[str] = set()
+        # Replies to other contacts (only if instruction says so)
         self._reply_other_chats: bool = self._should_reply_other_chats()
 
-        # Supabase client for direct DB access
-        self.supabase = create_client(config.SUPABASE_URL, config.SUPABASE_ANON_KEY)
-
-        # Conversation ID: sorted user IDs + "-chat"
-        ids = sorted([config.WHATSAPP_USER_ID, config.WHATSAPP_TARGET_ID])
-        self.conversation_id = f"{ids[0]}-{ids[1]}-chat"
-
-        # Track the last message timestamp we've seen to detect new ones
-        self._last_seen_ts: str | None = None
+        # Async Supabase (PostgREST) access for chats reads/writes
+        self.chat_store = chat_store
+
+        self.conversation_id = self.conversation_id_for(config.WHATSAPP_TARGET_ID)
+
+        # Watched conversations (conversation_id → contact_id): the target, plus every
+        # other contact when replying to other chats. One poll / one feed covers them all.
+        self._conversations: dict[str, str] = {self.conversation_id: config.WHATSAPP_TARGET_ID}
+        if self._reply_other_chats:
+            for contact_id in config.CONTACTS:
+                self._conversations[self.conversation_id_for(contact_id)] = contact_id
+
+        # Per-conversation watermark (created_at of the newest row seen), persisted in user_state.
+        # Reads are inclusive of the watermark and deduped by chats.id: handled ids are
+        # remembered in `processed`, dispatched-but-unhandled ones in `_inflight`, and the
+        # saved watermark never passes an unhandled row, so a restart re-reads it.
+        self._watermarks: dict[str, str | None] = dict.fromkeys(self._conversations)
+        self._saved_watermarks: dict[str, str | None] = {}
+        self.processed = ProcessedIds(memory, config.PROCESSED_IDS_MAX)
+        self._inflight: dict[str, dict[str, str]] = defaultdict(dict)  # conversation → {chats.id: created_at}
+        self._outbox_retry = False  # replies left in the outbox by a failed send
+        self._delivering: set[str] = set()  # outbox message ids being sent right now
+        self._publish_lock = asyncio.Lock()  # one publisher of pending_events at a time
+
+        # Fan-out: every watched conversation's new rows go to its own worker task
+        self._workers: dict[str, ConversationWorker] = {}
+
+        # Bounded LLM concurrency across workers, and the one shared browser page;
+        # both serve the target first (the LLM gate keeps a slot just for her)
+        self._llm_gate = PriorityGate(config.LLM_CONCURRENCY, reserved=1)
+        self._ui_gate = PriorityGate(1)
+
+        # Browser chat switching, keyed on contact ID
+        self._contact_names = {config.WHATSAPP_TARGET_ID: config.WHATSAPP_TARGET_CONTACT, **config.CONTACTS}
+        self._contact_rows: dict[str, str] = {}  # contact id → sidebar row selector
+        self.chat_switches = 0
+        self.chat_switches_skipped = 0
+
+        # Background browser mirror of direct sends: contact name → latest reply to show
+        self._mirror_queue: dict[str, str] = {}
+        self._mirror_task: asyncio.Task | None = None
+
+        # Realtime push feed for the watched conversations (None → poll only)
+        self.feed: ChatFeed | None = (
+            ChatFeed(list(self._conversations)) if config.INGEST_MODE == "realtime" and config.SUPABASE_URL else None
+        )
+        # Polling pace: tight after activity, backing off while every chat is quiet
+        self.poll_schedule = PollScheduler(config.POLL_MIN_INTERVAL, config.POLL_MAX_INTERVAL, config.POLL_BACKOFF)
 
         # Subscribe to order events
         self.event_bus.subscribe("ORDER_COMPLETED", self._on_order_completed)
@@ -57,21 +155,28 @@ class WhatsAppAgent(BaseAgent):
 
     async def _on_order_completed(self, payload: dict):
         """Queue a confirmation message to send in WhatsApp."""
-        self._ordering = False
         item = payload.get("item", "your order")
+        self._ordering_items.discard(item.lower())
         msg = f"done meri jaan, {item} aa raha hai tere liye"
         self._pending_notifications.append(msg)
+        self._worker(self.conversation_id).wake()
+        self.poll_schedule.wake()
         await log_step("WhatsAppAgent", StepType.EVENT, f"Order completed for '{item}', queued confirmation message")
         logger.info(f"[WhatsAppAgent] Queued order completion notification for: {item}")
 
     async def _on_order_failed(self, payload: dict):
         """Queue a failure message to send in WhatsApp."""
-        self._ordering = False
         item = payload.get("item", "that")
+        self._ordering_items.discard(item.lower())
         error = payload.get("error", "something went wrong")
-        self._pending_notifications.append(
-            f"ummm {item} nahi mil raha abhi, baad mein try karta hoon"
-        )
+        if payload.get("outcome") == "unknown":
+            # The order may have gone through; don't promise a retry that could double it
+            msg = f"{item} ka order gaya ya nahi pata nahi chal raha, check karke batata hoon"
+        else:
+            msg = f"ummm {item} nahi mil raha abhi, baad mein try karta hoon"
+        self._pending_notifications.append(msg)
+        self._worker(self.conversation_id).wake()
+        self.poll_schedule.wake()
         await log_step("WhatsAppAgent", StepType.EVENT, f"Order failed for '{item}', queued failure notification", f"error={error}")
         logger.info(f"[WhatsAppAgent] Queued order failure notification for: {item}")
 
@@ -102,214 +207,666 @@ class WhatsAppAgent(BaseAgent):
         await log_step("WhatsAppAgent", StepType.CLICK, f"Clicked on contact '{config.WHATSAPP_TARGET_CONTACT}' to open chat")
         await self.log("setup", f"Navigated to WhatsApp and opened chat with {config.WHATSAPP_TARGET_CONTACT}")
 
-        # Load last 5 messages into memory for context, and reply if latest is from Ananya
-        await self._bootstrap_conversation()
+        # Resume from saved watermarks: pull in everything missed while down and
+        # queue replies for whoever is still waiting
+        await self._load_watermarks()
+        await self.processed.load()
+        await self.memory.warm_context([self.conversation_id])
+        await self._catch_up()
+        await self._save_watermarks()
+        await self._flush_outbox()
 
         logger.info(f"[WhatsAppAgent] Setup complete. Chatting as {config.WHATSAPP_AGENT_USER} with {config.WHATSAPP_TARGET_CONTACT}")
         logger.info(f"[WhatsAppAgent] Conversation ID: {self.conversation_id}")
         logger.info(f"[WhatsAppAgent] Using Supabase for message read/write (no browser scraping)")
 
-    async def _bootstrap_conversation(self):
-        """Load last 5 messages into memory. If the latest is from the target, reply immediately."""
-        await log_step("WhatsAppAgent", StepType.EXTRACT, "Fetching last 5 messages from Supabase for conversation context")
-
-        result = (
-            self.supabase.table("chats")
-            .select("sender_id, content, created_at")
-            .eq("conversation_id", self.conversation_id)
-            .order("created_at", desc=True)
-            .limit(5)
-            .execute()
-        )
-
-        if not result.data:
-            self._last_seen_ts = None
-            await log_step("WhatsAppAgent", StepType.OBSERVE, "No existing messages found in conversation")
-            logger.info("[WhatsAppAgent] No existing messages in conversation")
+    async def _catch_up(self):
+        """
+        Startup catch-up across every watched chat. Reads what each chat got
+        since its saved watermark (the last few messages for chats never
+        seen before), paging through a long backlog, writes Ananya's backlog into
+        memory in one transaction, preloads the other chats' context windows
+        and schedules a turn for each chat still waiting on a reply: Ananya
+        first, then the others by how long they've been waiting.
+        """
+        started = asyncio.get_running_loop().time()
+        columns = "id,conversation_id,sender_id,content,created_at"
+        resumed = [cid for cid, mark in self._watermarks.items() if mark]
+        fresh = [cid for cid, mark in self._watermarks.items() if not mark]
+        await log_step("WhatsAppAgent", StepType.EXTRACT, "Catching up on chats from Supabase", f"resumed={len(resumed)}, new={len(fresh)}")
+
+        backlog: dict[str, list[dict]] = defaultdict(list)
+        fresh_newest: dict[str, str] = {}  # newest created_at read per new chat, handled or not
+        complete = None
+        truncated = False
+        try:
+            if resumed:
+                floor = min((self._watermarks[cid] for cid in resumed), key=self._parse_ts)
+                since = self._lookback(floor)
+                seen: set[str] = set()
+                while True:
+                    rows = await self.chat_store.messages_since(
+                        resumed, since=since, limit=config.CATCHUP_MAX_ROWS, columns=columns, inclusive=True
+                    )
+                    # A full page is only complete up to its last full timestamp; the next page starts there
+                    full = len(rows) >= config.CATCHUP_MAX_ROWS
+                    page_complete = self._complete_until(rows, full=full)
+                    for row in rows:
+                        ts = self._parse_ts(row["created_at"])
+                        row_id = self._row_id(row)
+                        if row_id in self.processed or row_id in seen:
+                            continue
+                        if ts >= self._parse_ts(self._lookback(self._watermarks[row["conversation_id"]])) and page_complete and ts <= page_complete:
+                            seen.add(row_id)
+                            backlog[row["conversation_id"]].append(row)
+                    complete = page_complete or complete
+                    if not full:
+                        break
+                    if page_complete is None or page_complete <= self._parse_ts(since):
+                        # One timestamp fills the whole page; polling pages past it
+                        truncated = True
+                        break
+                    since = page_complete.isoformat()
+            if fresh:
+                rows = await self.chat_store.recent_messages(fresh, limit=CONTEXT_WINDOW * len(fresh), columns=columns)
+                if len(rows) >= CONTEXT_WINDOW * len(fresh):
+                    # Busy chats can crowd quiet ones out of the shared read; fetch those on their own
+                    counts = Counter(row["conversation_id"] for row in rows)
+                    short = [cid for cid in fresh if counts[cid] < CONTEXT_WINDOW]
+                    rows = [row for row in rows if row["conversation_id"] not in short]
+                    for chat_rows in await asyncio.gather(*(
+                        self.chat_store.recent_messages(cid, limit=CONTEXT_WINDOW, columns=columns) for cid in short
+                    )):
+                        rows.extend(chat_rows)
+                    rows.sort(key=lambda row: self._parse_ts(row["created_at"]))
+                for row in rows:
+                    fresh_newest[row["conversation_id"]] = row["created_at"]
+                    if self._row_id(row) not in self.processed:
+                        backlog[row["conversation_id"]].append(row)
+                for cid in fresh:
+                    if cid in backlog:
+                        backlog[cid] = backlog[cid][-CONTEXT_WINDOW:]
+        except Exception as e:
+            await log_step("WhatsAppAgent", StepType.EVENT, "Catch-up query failed, leaving it to polling", f"error={str(e)}")
+            logger.error(f"[WhatsAppAgent] Catch-up failed: {e}")
             return
 
-        # Messages come newest-first, reverse for chronological order
-        messages = list(reversed(result.data))
-
-        # Save all 5 into memory for LLM context
-        for msg in messages:
-            sender_id = msg["sender_id"]
-            if sender_id == config.WHATSAPP_TARGET_ID:
-                role = "user"
-                name = config.WHATSAPP_TARGET_CONTACT
+        # Ananya's backlog → memory, one transaction
+        target_rows = backlog.get(self.conversation_id, [])
+        await self.memory.save_messages([
+            ("user", row["content"], config.WHATSAPP_TARGET_CONTACT)
+            if row["sender_id"] == config.WHATSAPP_TARGET_ID
+            else ("agent", row["content"], config.WHATSAPP_AGENT_USER)
+            for row in target_rows
+        ], self.conversation_id)
+
+        # Unanswered = trailing messages after our last one; schedule by priority, then age
+        waiting: list[tuple[int, datetime, str]] = []
+        for cid, rows in backlog.items():
+            if cid != self.conversation_id:
+                self._worker(cid).preload(rows)
+            unanswered = []
+            for row in reversed(rows):
+                if row["sender_id"] == config.WHATSAPP_USER_ID:
+                    break
+                unanswered.append(row)
+            if cid == self.conversation_id:
+                self._unanswered = [row["content"] for row in reversed(unanswered) if row["sender_id"] == config.WHATSAPP_TARGET_ID]
+                unanswered = unanswered if self._unanswered else []
+            if unanswered:
+                priority = PRIORITY_TARGET if cid == self.conversation_id else PRIORITY_OTHER
+                waiting.append((priority, self._parse_ts(unanswered[-1]["created_at"]), cid))
+        waiting.sort()
+        self._catch_up_order = [cid for *_, cid in waiting]
+        for cid in self._catch_up_order:
+            self._worker(cid).wake()
+
+        # Backlog of chats waiting on us is handled by their first turn; the rest is done with
+        for cid, rows in backlog.items():
+            if cid in self._catch_up_order:
+                self._inflight[cid].update((self._row_id(row), row["created_at"]) for row in rows)
             else:
-                role = "agent"
-                name = config.WHATSAPP_AGENT_USER
-            await self.memory.save_message(role, msg["content"], name)
-
-        # Set last_seen_ts to the latest message timestamp
-        self._last_seen_ts = messages[-1]["created_at"]
-        await log_step("WhatsAppAgent", StepType.EXTRACT, f"Loaded {len(messages)} messages into memory for context")
-        logger.info(f"[WhatsAppAgent] Loaded {len(messages)} messages into memory")
-        logger.info(f"[WhatsAppAgent] Last message timestamp: {self._last_seen_ts}")
-
-        # If the latest message is from the target contact, reply now
-        latest = messages[-1]
-        if latest["sender_id"] == config.WHATSAPP_TARGET_ID:
-            await log_step("WhatsAppAgent", StepType.RECEIVE, f"Latest message is from {config.WHATSAPP_TARGET_CONTACT}", f"content=\"{latest['content']}\"")
-            logger.info(f"[WhatsAppAgent] Latest message is from {config.WHATSAPP_TARGET_CONTACT}: \"{latest['content']}\" — replying immediately")
-
-            recent = await self.memory.get_recent_messages(limit=20)
-            await log_step("WhatsAppAgent", StepType.REASON, "Sending conversation to LLM for intent detection")
-            intent_result = await self.intent_detector.detect(recent)
-
-            await log_step("WhatsAppAgent", StepType.DECIDE, f"Intent classified as '{intent_result.intent}'", f"confidence={intent_result.confidence}, item={intent_result.item}")
-
-            await self.log(
-                "intent_detected",
-                json.dumps({"messages": [latest["content"]]}),
-                json.dumps({"intent": intent_result.intent, "reply": intent_result.reply, "item": intent_result.item}),
-            )
-
-            if intent_result.reply:
-                reply_text = intent_result.reply.replace("\n", " ").strip()
-                await self._send_message(reply_text)
-                await self.memory.save_message("agent", reply_text, config.WHATSAPP_AGENT_USER)
-
-            if intent_result.intent == "order_food" and intent_result.item and not self._ordering:
-                self._ordering = True
-                await log_step("WhatsAppAgent", StepType.EVENT, f"Food craving detected, triggering order for '{intent_result.item}'")
-                await self.event_bus.publish("ORDER_REQUESTED", {"item": intent_result.item})
-                logger.info(f"[WhatsAppAgent] Published ORDER_REQUESTED for: {intent_result.item}")
-        else:
-            await log_step("WhatsAppAgent", StepType.OBSERVE, f"Latest message is from us, waiting for {config.WHATSAPP_TARGET_CONTACT} to reply")
-            logger.info(f"[WhatsAppAgent] Latest message is from us — waiting for {config.WHATSAPP_TARGET_CONTACT}")
+                await self.processed.add(cid, [self._row_id(row) for row in rows])
+
+        # Watermarks: resumed chats are complete up to the read; new chats start at their newest message
+        for cid in resumed:
+            if complete and self._parse_ts(self._watermarks[cid]) < complete:
+                self._watermarks[cid] = complete.isoformat()
+        for cid in fresh:
+            if cid in fresh_newest:
+                self._watermarks[cid] = fresh_newest[cid]
+        # Still unset only for chats with no messages at all, so there is nothing before the newest read to miss
+        known = [mark for mark in self._watermarks.values() if mark]
+        newest = max(known, key=self._parse_ts) if known else None
+        for cid in fresh:
+            if self._watermarks[cid] is None:
+                self._watermarks[cid] = newest
+
+        rows_read = sum(len(rows) for rows in backlog.values())
+        self.catch_up_stats = {
+            "rows": rows_read,
+            "target_rows_saved": len(target_rows),
+            "replies_scheduled": len(self._catch_up_order),
+            "truncated": truncated,
+            "seconds": round(asyncio.get_running_loop().time() - started, 3),
+        }
+        await log_step("WhatsAppAgent", StepType.EXTRACT, f"Caught up on {len(backlog)} chat(s)", f"rows={rows_read}, awaiting_reply={len(self._catch_up_order)}")
+        logger.info(f"[WhatsAppAgent] Catch-up: {rows_read} rows across {len(backlog)} chat(s), {len(self._catch_up_order)} awaiting a reply")
 
     async def run(self):
-        """Main polling loop: check Supabase for new messages, detect intent, reply."""
+        """Main loop: take in new messages (pushed, or polled as fallback) and fan them out to conversation workers."""
         self._running = True
-        self.set_status("running", "Polling for messages via Supabase")
-        await log_step("WhatsAppAgent", StepType.EVENT, f"Starting message polling loop", f"interval={config.POLL_INTERVAL}s")
+        if self.feed:
+            self.feed.start()
+            await self.feed.wait_connected(config.REALTIME_JOIN_TIMEOUT)
+        # Start the chats caught up as waiting on a reply first, in schedule order
+        self._worker(self.conversation_id)
+        for cid in [*self._catch_up_order, *self._workers]:
+            self._workers[cid].start()
+        self.set_status("running", f"Listening for messages via Supabase ({self._ingest_mode()})")
+        await log_step("WhatsAppAgent", StepType.EVENT, f"Starting message loop", f"mode={self._ingest_mode()}, poll_interval={config.POLL_MIN_INTERVAL}-{config.POLL_MAX_INTERVAL}s, conversations={len(self._conversations)}")
 
         while self._running:
             try:
-                # Send any pending notifications first
-                await self._send_pending_notifications()
-
-                # Check Supabase for new messages from target contact
-                new_messages = await self._check_for_new_messages()
-
-                if new_messages:
-                    self._idle_seconds = 0  # GF messaged, reset idle timer
-                    for msg_text in new_messages:
-                        await log_step("WhatsAppAgent", StepType.RECEIVE, f"New message from {config.WHATSAPP_TARGET_CONTACT}", f"content=\"{msg_text}\"")
-                    logger.info(f"[WhatsAppAgent] Found {len(new_messages)} new message(s) from {config.WHATSAPP_TARGET_CONTACT}")
+                await self._ingest()
+            except Exception as e:
+                await log_step("WhatsAppAgent", StepType.EVENT, f"Error in polling loop", f"error={str(e)}")
+                logger.error(f"[WhatsAppAgent] Error in polling loop: {e}")
+                await self.log("error", str(e), status="error")
 
-                    # Save new messages to memory
-                    for msg_text in new_messages:
-                        await self.memory.save_message("user", msg_text, config.WHATSAPP_TARGET_CONTACT)
+            # A live feed already waited for pushes inside _ingest
+            if not (self.feed and self.feed.connected):
+                await self.poll_schedule.sleep()
 
-                    # Get full conversation context and detect intent
-                    recent = await self.memory.get_recent_messages(limit=20)
-                    await log_step("WhatsAppAgent", StepType.REASON, "Analyzing conversation for intent detection", f"context_messages={len(recent)}")
-                    intent_result = await self.intent_detector.detect(recent)
+    # ── conversation workers ──────────────────────────────────
 
-                    await log_step("WhatsAppAgent", StepType.DECIDE, f"Intent: '{intent_result.intent}'", f"confidence={intent_result.confidence}, item={intent_result.item}, reply_length={len(intent_result.reply or '')}")
+    def _worker(self, conversation_id: str) -> ConversationWorker:
+        """The conversation's worker, created (and started, once running) on first use."""
+        worker = self._workers.get(conversation_id)
+        if worker is None:
+            if conversation_id == self.conversation_id:
+                name, handler = config.WHATSAPP_TARGET_CONTACT, self._handle_target_turn
+            else:
+                name, handler = config.CONTACTS[self._conversations[conversation_id]], self._handle_contact_turn
+            worker = ConversationWorker(
+                name,
+                conversation_id,
+                handler,
+                window=CONTEXT_WINDOW,
+                debounce=config.DEBOUNCE_WINDOW,
+                max_wait=config.DEBOUNCE_MAX_WAIT,
+                own_id=config.WHATSAPP_USER_ID,
+            )
+            self._workers[conversation_id] = worker
+            if self._running:
+                worker.start()
+        return worker
+
+    async def _handle_target_turn(self, worker: ConversationWorker, rows: list[dict]):
+        """
+        Target's turn: detect intent on her new messages (a whole burst,
+        thanks to the worker's debounce), reply, then flush order
+        notifications. If she writes again before the reply goes out, the
+        detection is dropped and the next turn covers all of it with fresh
+        context.
+        """
+        new_messages = [row["content"] for row in rows if row["sender_id"] == config.WHATSAPP_TARGET_ID]
+        if not new_messages and not self._unanswered:
+            await self._mark_handled(worker)
+            await self._send_pending_notifications()
+            return
 
-                    await self.log(
-                        "intent_detected",
-                        json.dumps({"messages": new_messages}),
-                        json.dumps({"intent": intent_result.intent, "reply": intent_result.reply, "item": intent_result.item}),
-                    )
+        for msg_text in new_messages:
+            await log_step("WhatsAppAgent", StepType.RECEIVE, f"New message from {config.WHATSAPP_TARGET_CONTACT}", f"content=\"{msg_text}\"")
+        logger.info(f"[WhatsAppAgent] Found {len(new_messages)} new message(s) from {config.WHATSAPP_TARGET_CONTACT}")
 
-                    # Send reply via Supabase insert
-                    if intent_result.reply:
-                        reply_text = intent_result.reply.replace("\n", " ").strip()
-                        await self._send_message(reply_text)
-                        await self.memory.save_message("agent", reply_text, config.WHATSAPP_AGENT_USER)
-
-                    # If food intent and no order already running, publish order event
-                    if intent_result.intent == "order_food" and intent_result.item and not self._ordering:
-                        self._ordering = True
-                        await log_step("WhatsAppAgent", StepType.EVENT, f"Food craving detected, publishing ORDER_REQUESTED", f"item='{intent_result.item}'")
-                        await self.event_bus.publish("ORDER_REQUESTED", {"item": intent_result.item})
-                        logger.info(f"[WhatsAppAgent] Published ORDER_REQUESTED for: {intent_result.item}")
-                else:
-                    # GF is quiet — track idle time and reply to other contacts if enabled
-                    if self._reply_other_chats:
-                        self._idle_seconds += config.POLL_INTERVAL
-
-                        # After 30s idle, reply to one other contact (one-shot)
-                        if self._idle_seconds >= 30:
-                            await log_step("WhatsAppAgent", StepType.REASON, f"Idle for {self._idle_seconds}s, switching to reply to another contact")
-                            await self._reply_to_next_contact()
-                            self._idle_seconds = 0
+        # Save new messages to memory
+        for msg_text in new_messages:
+            await self.memory.save_message("user", msg_text, config.WHATSAPP_TARGET_CONTACT, self.conversation_id)
 
-            except Exception as e:
-                await log_step("WhatsAppAgent", StepType.EVENT, f"Error in polling loop", f"error={str(e)}")
-                logger.error(f"[WhatsAppAgent] Error in polling loop: {e}")
-                await self.log("error", str(e), status="error")
+        new_messages = self._unanswered + new_messages
 
-            await asyncio.sleep(config.POLL_INTERVAL)
+        # Get full conversation context and detect intent (priority lane: never queues behind other chats)
+        recent = await self.memory.get_recent_messages(limit=20, conversation_id=self.conversation_id)
+        await log_step("WhatsAppAgent", StepType.REASON, "Analyzing conversation for intent detection", f"context_messages={len(recent)}")
+        intent_result = await self._unless_interrupted(worker, self._detect_intent(recent))
+        if intent_result is None or worker.has_pending:
+            worker.superseded += 1
+            self._unanswered = new_messages
+            await log_step("WhatsAppAgent", StepType.EVENT, "Newer messages arrived, dropping stale intent detection", f"messages={len(new_messages)}")
+            return
+        self._unanswered = []
 
-    async def _check_for_new_messages(self) -> list[str]:
-        """Query Supabase for new messages from the target contact since last check."""
-        try:
-            query = (
-                self.supabase.table("chats")
-                .select("content, created_at")
-                .eq("conversation_id", self.conversation_id)
-                .eq("sender_id", config.WHATSAPP_TARGET_ID)
-                .order("created_at", desc=False)
-                .limit(10)
-            )
+        await log_step("WhatsAppAgent", StepType.DECIDE, f"Intent: '{intent_result.intent}'", f"confidence={intent_result.confidence}, item={intent_result.item}, reply_length={len(intent_result.reply or '')}")
 
-            # Only get messages newer than our last snapshot
-            if self._last_seen_ts:
-                query = query.gt("created_at", self._last_seen_ts)
+        await self.log(
+            "intent_detected",
+            json.dumps({"messages": new_messages}),
+            json.dumps({"intent": intent_result.intent, "reply": intent_result.reply, "item": intent_result.item}),
+        )
 
-            result = query.execute()
+        # If food intent and this item isn't already being ordered, the order event is
+        # stored with the reply (and the rows it answers) and published from there
+        events = []
+        if intent_result.intent == "order_food" and intent_result.item and intent_result.item.lower() not in self._ordering_items:
+            self._ordering_items.add(intent_result.item.lower())
+            await log_step("WhatsAppAgent", StepType.EVENT, f"Food craving detected, publishing ORDER_REQUESTED", f"item='{intent_result.item}'")
+            events.append(("ORDER_REQUESTED", {"item": intent_result.item}))
 
-            if not result.data:
-                return []
+        reply_text = (intent_result.reply or "").replace("\n", " ").strip()
+        await self._send_messages(self.conversation_id, [reply_text], answering=worker, events=events)
+        if reply_text:
+            await self.memory.save_message("agent", reply_text, config.WHATSAPP_AGENT_USER, self.conversation_id)
 
-            # Update timestamp to the latest message we just fetched
-            self._last_seen_ts = result.data[-1]["created_at"]
+        await self._send_pending_notifications()
 
-            new_messages = [row["content"] for row in result.data]
-            return new_messages
+    async def _detect_intent(self, recent: list[MessageRecord]) -> IntentResult:
+        async with self._llm_gate.slot(PRIORITY_TARGET):
+            return await self.intent_detector.detect(recent)
 
+    @staticmethod
+    async def _unless_interrupted(worker: ConversationWorker, coro):
+        """Await `coro`, but cancel it and return None if new rows reach `worker` first."""
+        task = asyncio.create_task(coro)
+        interrupt = asyncio.create_task(worker.interrupted())
+        try:
+            await asyncio.wait({task, interrupt}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            interrupt.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        return None if task.cancelled() else task.result()
+
+    async def _handle_contact_turn(self, worker: ConversationWorker, rows: list[dict]):
+        """Another contact's turn: reply if their message is the latest in the chat."""
+        if worker.context and worker.context[-1]["sender_id"] == config.WHATSAPP_USER_ID:
+            await self._mark_handled(worker)
+            return
+        await self._reply_to_contact(worker)
+
+    def _ingest_mode(self) -> str:
+        return "realtime" if self.feed and self.feed.connected else "poll"
+
+    def ingest_stats(self) -> dict:
+        return {
+            "mode": self._ingest_mode(),
+            "conversations": len(self._conversations),
+            "poll": self.poll_schedule.stats(),
+            "feed": self.feed.stats() if self.feed else None,
+            "workers": {w.name: w.stats() for w in self._workers.values()},
+            "llm_gate": self._llm_gate.stats(),
+            "catch_up": self.catch_up_stats,
+            "processed_ids": self.processed.stats(),
+            "unhandled_rows": sum(len(ids) for ids in self._inflight.values()),
+            "chat_switches": {"done": self.chat_switches, "skipped": self.chat_switches_skipped},
+        }
+
+    async def _ingest(self):
+        """
+        One ingest cycle. With the feed up, hand pushed rows to the workers as
+        they arrive for up to POLL_INTERVAL. Right after a (re)subscribe, or
+        while the feed is down, poll instead — that also picks up anything
+        inserted while nobody was listening. The gap-fill pages through those
+        one poll per cycle; pushed rows wait in the feed's queue until a page
+        comes back short.
+        """
+        feed = self.feed
+        if feed is None or not feed.connected or feed.gap_fill_pending:
+            connects = feed.connects if feed else 0
+            caught_up = await self._poll_conversations()
+            if feed is not None and feed.connected:
+                if caught_up:
+                    feed.finish_gap_fill(connects)
+                elif caught_up is None:
+                    # The main loop doesn't sleep while the feed is up; don't spin on a failing query
+                    await self.poll_schedule.sleep()
+        else:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + config.POLL_INTERVAL
+            while feed.connected and (remaining := deadline - loop.time()) > 0:
+                self._dispatch_rows(await feed.next_rows(remaining))
+                await self._save_watermarks()
+
+        await self._save_watermarks()
+        if self._outbox_retry:
+            await self._flush_outbox()
+
+    async def _poll_conversations(self) -> bool | None:
+        """
+        One query for every watched conversation since the oldest watermark, fanned out per conversation.
+        Returns True when the page came back short (nothing left to read), False when it was
+        cut off at POLL_PAGE_SIZE, None when the query failed or the page moved nothing forward.
+        """
+        marks = list(self._watermarks.values())
+        floor = None if None in marks else min(marks, key=self._parse_ts)
+        try:
+            self.poll_schedule.record_query()
+            rows = await self.chat_store.messages_since(
+                list(self._conversations),
+                since=self._lookback(floor),
+                limit=POLL_PAGE_SIZE,
+                columns="id,conversation_id,sender_id,content,created_at",
+                inclusive=True,
+            )
         except Exception as e:
             logger.error(f"[WhatsAppAgent] Supabase query failed: {e}")
-            return []
+            self.poll_schedule.idle()
+            return None
 
-    async def _send_message(self, text: str):
-        """Type and send message via the browser UI so the user can watch it happen."""
+        new_rows = self._dispatch_rows(rows)
+        if new_rows:
+            self.poll_schedule.activity()
+        else:
+            self.poll_schedule.idle()
+
+        # Rows come oldest first, so every watched conversation is complete up to the
+        # page's last timestamp (one before it if the page was cut off at the limit)
+        full = len(rows) >= POLL_PAGE_SIZE
+        complete = self._complete_until(rows, full=full)
+        advanced = False
+        if complete:
+            for cid, mark in self._watermarks.items():
+                if mark is None or self._parse_ts(mark) < complete:
+                    self._watermarks[cid] = complete.isoformat()
+                    advanced = True
+        if not full:
+            return True
+        return False if new_rows or advanced else None
+
+    def _complete_until(self, rows: list[dict], full: bool) -> datetime | None:
+        if not rows:
+            return None
+        last = self._parse_ts(rows[-1]["created_at"])
+        if not full:
+            return last
+        for row in reversed(rows):
+            ts = self._parse_ts(row["created_at"])
+            if ts < last:
+                return ts
+        return None
+
+    def _dispatch_rows(self, rows: list[dict]) -> int:
+        """
+        Send each conversation's rows not seen before (by chats.id, at or past
+        its watermark) to its worker, oldest first. Returns how many were new.
+        """
+        fresh: dict[str, list[tuple[datetime, dict]]] = defaultdict(list)
+        for row in rows:
+            cid = row.get("conversation_id")
+            if cid not in self._conversations or not row.get("created_at"):
+                continue
+            row_id = self._row_id(row)
+            if row_id in self.processed or row_id in self._inflight[cid]:
+                self.processed.duplicates += 1
+                continue
+            ts = self._parse_ts(row["created_at"])
+            mark = self._watermarks.get(cid)
+            if mark is None or ts >= self._parse_ts(self._lookback(mark)):
+                fresh[cid].append((ts, row))
+
+        for cid, items in fresh.items():
+            items.sort(key=lambda item: item[0])
+            mark = self._watermarks[cid]
+            if mark is None or items[-1][0] > self._parse_ts(mark):
+                self._watermarks[cid] = items[-1][0].isoformat()
+            self._inflight[cid].update((self._row_id(row), row["created_at"]) for _, row in items)
+            self._worker(cid).push([row for _, row in items])
+        return sum(len(items) for items in fresh.values())
+
+    def _lookback(self, mark: str | None) -> str | None:
+        """
+        Read floor for a watermark. created_at is stamped when a transaction
+        starts, so a row can commit after a newer one was already read;
+        reading POLL_LOOKBACK seconds back (deduped by id) still catches it.
+        """
+        if mark is None:
+            return None
+        return (self._parse_ts(mark) - timedelta(seconds=config.POLL_LOOKBACK)).isoformat()
+
+    @staticmethod
+    def _row_id(row: dict) -> str:
+        """chats.id, or a stand-in for rows read without it."""
+        return row.get("id") or f"{row['conversation_id']}|{row['created_at']}|{row['sender_id']}"
+
+    def _turn_ids(self, worker: ConversationWorker) -> list[str]:
+        """Ids dispatched to a worker and covered by its current turn (not the rows still pending)."""
+        pending = {self._row_id(row) for row in worker.pending}
+        return [row_id for row_id in self._inflight[worker.conversation_id] if row_id not in pending]
+
+    def _forget_inflight(self, conversation_id: str, row_ids: list[str]):
+        inflight = self._inflight[conversation_id]
+        for row_id in row_ids:
+            inflight.pop(row_id, None)
+
+    async def _mark_handled(self, worker: ConversationWorker):
+        """The worker's turn needed no reply: record its rows as handled."""
+        handled = self._turn_ids(worker)
+        await self.processed.add(worker.conversation_id, handled)
+        self._forget_inflight(worker.conversation_id, handled)
+
+    @staticmethod
+    def _parse_ts(value: str) -> datetime:
+        """Postgres / Realtime timestamptz string → aware datetime (naive values are UTC)."""
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00").replace(" ", "T", 1))
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+    async def _load_watermarks(self):
+        raw = await self.memory.get_state(WATERMARKS_KEY)
+        self._saved_watermarks = json.loads(raw) if raw else {}
+        for cid in self._watermarks:
+            self._watermarks[cid] = self._saved_watermarks.get(cid)
+
+    async def _save_watermarks(self):
+        """
+        Persist watermarks that moved (entries for conversations no longer
+        watched are kept). A conversation with unhandled rows is saved at its
+        oldest one, so a restart reads those rows again.
+        """
+        durable = {
+            cid: min(self._inflight[cid].values(), key=self._parse_ts) if self._inflight[cid] else mark
+            for cid, mark in self._watermarks.items()
+        }
+        changed = {cid: mark for cid, mark in durable.items() if mark and self._saved_watermarks.get(cid) != mark}
+        if not changed:
+            return
+        self._saved_watermarks.update(changed)
+        await self.memory.set_state(WATERMARKS_KEY, json.dumps(self._saved_watermarks))
+
+    async def _send_messages(
+        self,
+        conversation_id: str,
+        texts: list[str],
+        answering: ConversationWorker | None = None,
+        events: list[tuple[str, dict]] | None = None,
+    ):
+        """
+        Reply to one chat. The replies, and any events the turn raised, go
+        into the outbox in the same SQLite transaction that marks the
+        messages they answer (`answering`'s turn) as handled, and are
+        delivered / published from there: a crash before that point handles
+        the messages again, a crash after it re-sends from the outbox on
+        restart — never both.
+        """
+        texts = [text for text in texts if text]
+        if not texts and not events:
+            if answering:
+                await self._mark_handled(answering)
+            return
+        handled = self._turn_ids(answering) if answering else []
+        message_ids = await self.memory.outbox_add(conversation_id, texts, handled, keep=self.processed.capacity, events=events)
+        self._forget_inflight(conversation_id, handled)
+        self.processed.remember(handled)
+        if events:
+            await self._publish_events()
+        if texts:
+            await self._deliver(conversation_id, list(zip(message_ids, texts)))
+
+    async def _publish_events(self):
+        """
+        Publish the events stored by outbox_add, oldest first, dropping each
+        once it is on the bus. A crash in between publishes it again on restart.
+        """
+        async with self._publish_lock:
+            for event in await self.memory.pending_events():
+                payload = event["payload"]
+                if event["event_type"] == "ORDER_REQUESTED":
+                    self._ordering_items.add(payload.get("item", "").lower())
+                await self.event_bus.publish(event["event_type"], payload)
+                await self.memory.event_published(event["event_id"])
+                logger.info(f"[WhatsAppAgent] Published {event['event_type']}: {payload}")
+
+    async def _flush_outbox(self):
+        """Publish events and deliver replies left pending in the outbox (by a crash or a failed send), oldest first."""
+        self._outbox_retry = False
+        await self._publish_events()
+        by_chat: dict[str, list[tuple[str, str]]] = defaultdict(list)
+        for entry in await self.memory.outbox_pending():
+            if entry["conversation_id"] in self._conversations and entry["message_id"] not in self._delivering:
+                by_chat[entry["conversation_id"]].append((entry["message_id"], entry["content"]))
+        if not by_chat:
+            return
+        await log_step("WhatsAppAgent", StepType.EVENT, "Re-sending replies pending in the outbox", f"messages={sum(len(e) for e in by_chat.values())}")
+        for conversation_id, entries in by_chat.items():
+            await self._deliver(conversation_id, entries)
+
+    async def _deliver(self, conversation_id: str, entries: list[tuple[str, str]]):
+        """
+        Send outbox entries (message_id, text) to one chat and mark them sent.
+        Direct mode inserts them into chats under their outbox ids in a single
+        request — a replay or retry can't write one twice — and, for other
+        contacts, queues a background browser mirror. A failed insert stays
+        in the outbox for the next ingest cycle. UI mode types them into the
+        browser, holding the UI for the whole navigate/type/return, and marks
+        sent only the ones seen rendered in that contact's chat.
+        """
+        message_ids = [message_id for message_id, _ in entries]
+        texts = [text for _, text in entries]
+        is_target = conversation_id == self.conversation_id
+        contact_id = config.WHATSAPP_TARGET_ID if is_target else self._conversations[conversation_id]
+        contact_name = self._contact_names[contact_id]
+
+        self._delivering.update(message_ids)
+        try:
+            if config.SEND_MODE == "direct":
+                try:
+                    await self.chat_store.insert_messages(conversation_id, config.WHATSAPP_USER_ID, texts, ids=message_ids)
+                except Exception as e:
+                    self._outbox_retry = True
+                    await log_step("WhatsAppAgent", StepType.EVENT, f"Direct send to '{contact_name}' failed, kept in outbox", f"error={str(e)}")
+                    logger.error(f"[WhatsAppAgent] Direct send to {contact_name} failed, will retry from outbox: {e}")
+                    return
+                await self.memory.outbox_mark_sent(message_ids)
+                for text in texts:
+                    await log_step("WhatsAppAgent", StepType.SEND, f"Message sent to {contact_name} via Supabase", f"content=\"{text}\"")
+                    await self.log("send_message", text)
+                logger.info(f"[WhatsAppAgent] Sent {len(texts)} message(s) to {contact_name} via Supabase")
+                if not is_target:
+                    self._mirror(contact_id, texts[-1])
+                return
+
+            sent = await self._type_messages(contact_id, texts, PRIORITY_TARGET if is_target else PRIORITY_OTHER)
+            if sent:
+                await self.memory.outbox_mark_sent(message_ids[:sent])
+            if sent < len(texts):
+                self._outbox_retry = True
+                await log_step("WhatsAppAgent", StepType.EVENT, f"UI send to '{contact_name}' not confirmed, kept in outbox", f"unsent={len(texts) - sent}")
+                logger.error(f"[WhatsAppAgent] UI send to {contact_name} not confirmed after {sent}/{len(texts)} message(s), will retry from outbox")
+        finally:
+            self._delivering.difference_update(message_ids)
+
+    async def _type_messages(self, contact_id: str, texts: list[str], priority: int) -> int:
+        """
+        UI send: open the contact's chat, type each message, return to Ananya's
+        chat. Stops at the first message not confirmed sent; returns how many were.
+        """
+        sent = 0
+        async with self._ui_gate.slot(priority):
+            if await self._navigate_to_contact(contact_id):
+                for text in texts:
+                    if not await self._type_message(contact_id, text):
+                        break
+                    sent += 1
+            if contact_id != config.WHATSAPP_TARGET_ID:
+                await self._navigate_to_contact(config.WHATSAPP_TARGET_ID)
+        return sent
+
+    def _mirror(self, contact_id: str, text: str):
+        """Queue a look at a directly-sent reply in the browser; never awaited by the sender."""
+        if not config.SEND_UI_MIRROR or self.browser_session is None:
+            return
+        self._mirror_queue[contact_id] = text
+        if self._mirror_task is None or self._mirror_task.done():
+            self._mirror_task = asyncio.create_task(self._run_mirror())
+
+    async def _run_mirror(self):
+        """Open each mirrored chat, wait for the reply to render, then return to Ananya's chat once the queue is empty."""
+        while self._mirror_queue:
+            contact_id = next(iter(self._mirror_queue))
+            text = self._mirror_queue.pop(contact_id)
+            try:
+                async with self._ui_gate.slot(PRIORITY_OTHER):
+                    await self._navigate_to_contact(contact_id)
+                    await self.actions.wait_for_js(_MESSAGE_SHOWN_JS, f"reply to '{self._contact_names[contact_id]}' to render", text)
+                    if not self._mirror_queue:
+                        await self._navigate_to_contact(config.WHATSAPP_TARGET_ID)
+            except Exception as e:
+                logger.warning(f"[WhatsAppAgent] UI mirror for {contact_id} failed: {e}")
+
+    async def _type_message(self, contact_id: str, text: str) -> bool:
+        """
+        Type and send message via the browser UI so the user can watch it happen.
+        Returns True only once it shows up in contact_id's chat, which must be
+        the one open before typing.
+        """
+        contact_name = self._contact_names[contact_id]
         try:
+            if await self.actions.evaluate(_CHAT_OPEN_JS, contact_id, contact_name) != "True":
+                logger.error(f"[WhatsAppAgent] Not typing into the wrong chat: {contact_name}'s is not open")
+                return False
             await log_step("WhatsAppAgent", StepType.OBSERVE, "Looking for message input field at bottom of chat area")
-            send_agent = Agent(
-                task=f"""
+
+            async def send_by_selector() -> bool:
+                if not await self.actions.type(MESSAGE_INPUT, text):
+                    return False
+                await self.actions.press_enter()
+                return True
+
+            await self.actions.run_step(
+                "send_message",
+                send_by_selector,
+                f"""
                 In the chat area, find the message input field (usually at the bottom of the chat).
                 Click on it, type the following message exactly:
                 {text}
                 Then press Enter or click the Send button to send the message.
                 """,
-                llm=self.llm,
-                browser_session=self.browser_session,
-                use_judge=False,
             )
-            await send_agent.run()
             await log_step("WhatsAppAgent", StepType.CLICK, "Clicked on message input field to focus it")
             await log_step("WhatsAppAgent", StepType.TYPE, f"Typed message into input field", f"text=\"{text}\"")
             await log_step("WhatsAppAgent", StepType.SUBMIT, "Pressed Enter to send the message")
-            await log_step("WhatsAppAgent", StepType.SEND, f"Message sent to {config.WHATSAPP_TARGET_CONTACT}", f"content=\"{text}\"")
+            shown = await self.actions.wait_for_js(_MESSAGE_SHOWN_JS, f"message to '{contact_name}' to render", text)
+            if not shown or await self.actions.evaluate(_CHAT_OPEN_JS, contact_id, contact_name) != "True":
+                await log_step("WhatsAppAgent", StepType.EVENT, f"Message to '{contact_name}' not seen in their chat", f"content=\"{text}\"")
+                logger.error(f"[WhatsAppAgent] Message to {contact_name} not seen in their chat: {text}")
+                return False
+            await log_step("WhatsAppAgent", StepType.SEND, f"Message sent to {contact_name}", f"content=\"{text}\"")
             logger.info(f"[WhatsAppAgent] Sent via UI: {text}")
             await self.log("send_message", text)
+            return True
         except Exception as e:
             await log_step("WhatsAppAgent", StepType.EVENT, f"Failed to send message via browser UI", f"error={str(e)}")
             logger.error(f"[WhatsAppAgent] Failed to send message: {e}")
+            return False
 
     async def _send_pending_notifications(self):
-        """Send any queued notification messages."""
-        while self._pending_notifications:
-            msg = self._pending_notifications.pop(0)
-            await self._send_message(msg)
-            await self.memory.save_message("agent", msg, config.WHATSAPP_AGENT_USER)
+        """Send all queued notification messages in one go."""
+        messages, self._pending_notifications = self._pending_notifications, []
+        if not messages:
+            return
+        await self._send_messages(self.conversation_id, messages)
+        for msg in messages:
+            await self.memory.save_message("agent", msg, config.WHATSAPP_AGENT_USER, self.conversation_id)
 
     @staticmethod
     def _should_reply_other_chats() -> bool:
@@ -325,113 +882,139 @@ class WhatsAppAgent(BaseAgent):
             logger.info("[WhatsAppAgent] Instruction is GF-only — multi-contact replies DISABLED")
         return match
 
-    def _get_conversation_id(self, contact_id: str) -> str:
-        """Generate conversation_id for a contact (same logic as frontend)."""
+    @staticmethod
+    def conversation_id_for(contact_id: str) -> str:
+        """Generate conversation_id for a contact: sorted user IDs + "-chat" (same logic as frontend)."""
         ids = sorted([config.WHATSAPP_USER_ID, contact_id])
         return f"{ids[0]}-{ids[1]}-chat"
 
-    async def _reply_to_next_contact(self):
-        """Pick the next un-handled contact, read last 5 msgs via API, then
-        navigate to their chat in the browser, type & send the reply, and
-        navigate back to Ananya's chat."""
-        for contact_id, contact_name in config.CONTACTS.items():
-            if contact_id in self._handled_contacts:
-                continue
-
-            conv_id = self._get_conversation_id(contact_id)
-
-            await log_step("WhatsAppAgent", StepType.NAVIGATE, f"Switching to contact '{contact_name}' for idle-time reply")
-
-            # Step 1: Navigate to this contact's chat first
-            await self._navigate_to_contact(contact_name)
-
-            # Step 2: Read last 5 messages from Supabase API
-            await log_step("WhatsAppAgent", StepType.EXTRACT, f"Fetching last 5 messages for '{contact_name}' from Supabase")
+    async def _generate_contact_reply(self, messages: list[dict], contact_name: str) -> str:
+        async with self._llm_gate.slot(PRIORITY_OTHER):
+            return await self.intent_detector.generate_generic_reply(messages, contact_name)
+
+    async def _reply_to_contact(self, worker: ConversationWorker):
+        """Reply to one other contact from their worker: take their last 5 msgs
+        from the worker's context window, generate a reply (bounded LLM slot),
+        then — holding the browser — navigate to their chat, type & send the
+        reply, and navigate back to Ananya's chat."""
+        contact_id = self._conversations[worker.conversation_id]
+        contact_name = config.CONTACTS[contact_id]
+
+        # Step 1: Last 5 messages — already in the context window unless the chat was
+        # crowded out of the startup query, then read them from Supabase once
+        if len(worker.context) < CONTEXT_WINDOW:
+            await log_step("WhatsAppAgent", StepType.EXTRACT, f"Fetching last {CONTEXT_WINDOW} messages for '{contact_name}' from Supabase")
             try:
-                result = (
-                    self.supabase.table("chats")
-                    .select("sender_id, content, created_at")
-                    .eq("conversation_id", conv_id)
-                    .order("created_at", desc=True)
-                    .limit(5)
-                    .execute()
-                )
+                history = await self.chat_store.recent_messages(worker.conversation_id, limit=CONTEXT_WINDOW)
             except Exception as e:
                 await log_step("WhatsAppAgent", StepType.EVENT, f"Failed to fetch messages for '{contact_name}'", f"error={str(e)}")
                 logger.error(f"[WhatsAppAgent] Failed to fetch messages for {contact_name}: {e}")
-                self._handled_contacts.add(contact_id)
-                await self._navigate_to_contact(config.WHATSAPP_TARGET_CONTACT)
-                continue
-
-            if not result.data:
-                await log_step("WhatsAppAgent", StepType.OBSERVE, f"No messages found with '{contact_name}', skipping")
-                self._handled_contacts.add(contact_id)
-                logger.info(f"[WhatsAppAgent] No messages with {contact_name}, skipping")
-                await self._navigate_to_contact(config.WHATSAPP_TARGET_CONTACT)
-                continue
-
-            messages = list(reversed(result.data))
-
-            # If last message is from us, no reply needed
-            if messages[-1]["sender_id"] == config.WHATSAPP_USER_ID:
-                await log_step("WhatsAppAgent", StepType.OBSERVE, f"Last message to '{contact_name}' is from us, no reply needed")
-                self._handled_contacts.add(contact_id)
-                logger.info(f"[WhatsAppAgent] Last msg to {contact_name} is from us, skipping")
-                await self._navigate_to_contact(config.WHATSAPP_TARGET_CONTACT)
-                continue
-
-            # Add sender names for LLM context
-            for msg in messages:
-                if msg["sender_id"] == config.WHATSAPP_USER_ID:
-                    msg["sender_name"] = config.WHATSAPP_AGENT_USER
-                else:
-                    msg["sender_name"] = contact_name
-
-            # Step 3: Generate reply text via LLM
-            await log_step("WhatsAppAgent", StepType.REASON, f"Generating casual reply for '{contact_name}' via LLM", f"context_messages={len(messages)}")
-            reply = await self.intent_detector.generate_generic_reply(messages, contact_name)
-            reply = reply.replace("\n", " ").strip()
-            await log_step("WhatsAppAgent", StepType.DECIDE, f"Generated reply for '{contact_name}'", f"reply=\"{reply}\"")
-
-            # Step 4: Type and send via browser UI
-            await self._send_message(reply)
-
-            # Step 5: Navigate back to Ananya's chat
-            await log_step("WhatsAppAgent", StepType.NAVIGATE, f"Navigating back to {config.WHATSAPP_TARGET_CONTACT}'s chat")
-            await self._navigate_to_contact(config.WHATSAPP_TARGET_CONTACT)
-
-            self._handled_contacts.add(contact_id)
-            await self.log("one_shot_reply", contact_name, reply)
-            logger.info(f"[WhatsAppAgent] One-shot reply to {contact_name}: {reply}")
-            return  # Only one contact per idle cycle
+                return
+            worker.context.clear()
+            worker.context.extend(history)
+        messages = [dict(row) for row in worker.context]
+
+        if not messages:
+            await log_step("WhatsAppAgent", StepType.OBSERVE, f"No messages found with '{contact_name}', skipping")
+            logger.info(f"[WhatsAppAgent] No messages with {contact_name}, skipping")
+            await self._mark_handled(worker)
+            return
 
-        # If we get here, all contacts are handled
-        logger.debug("[WhatsAppAgent] All contacts replied to, back to Ananya-only mode")
+        # If last message is from us, no reply needed
+        if messages[-1]["sender_id"] == config.WHATSAPP_USER_ID:
+            await log_step("WhatsAppAgent", StepType.OBSERVE, f"Last message to '{contact_name}' is from us, no reply needed")
+            logger.info(f"[WhatsAppAgent] Last msg to {contact_name} is from us, skipping")
+            await self._mark_handled(worker)
+            return
 
-    async def _navigate_to_contact(self, contact_name: str):
-        """Click on a contact in the sidebar to open their chat."""
+        # Add sender names for LLM context
+        for msg in messages:
+            if msg["sender_id"] == config.WHATSAPP_USER_ID:
+                msg["sender_name"] = config.WHATSAPP_AGENT_USER
+            else:
+                msg["sender_name"] = contact_name
+
+        # Step 2: Generate reply text via LLM
+        await log_step("WhatsAppAgent", StepType.REASON, f"Generating casual reply for '{contact_name}' via LLM", f"context_messages={len(messages)}")
+        reply = await self._unless_interrupted(worker, self._generate_contact_reply(messages, contact_name))
+        if reply is None or worker.has_pending:
+            worker.superseded += 1
+            await log_step("WhatsAppAgent", StepType.EVENT, f"'{contact_name}' wrote again, dropping stale reply")
+            return
+        reply = reply.replace("\n", " ").strip()
+        await log_step("WhatsAppAgent", StepType.DECIDE, f"Generated reply for '{contact_name}'", f"reply=\"{reply}\"")
+
+        # Step 3: Send it (direct insert, or typed into their chat in the browser)
+        await self._send_messages(worker.conversation_id, [reply], answering=worker)
+
+        await self.log("contact_reply", contact_name, reply)
+        logger.info(f"[WhatsAppAgent] Replied to {contact_name}: {reply}")
+
+    async def _navigate_to_contact(self, contact_id: str) -> bool:
+        """
+        Open a contact's chat. Skipped if it's already open; otherwise route
+        via #chat=<id>, then click their (cached) sidebar row, and only run
+        the LLM browser agent if both miss. Returns whether the chat is open.
+        """
+        contact_name = self._contact_names[contact_id]
         try:
-            await log_step("WhatsAppAgent", StepType.OBSERVE, f"Scanning contacts sidebar for '{contact_name}'")
-            nav_agent = Agent(
-                task=f"""
-                Look at the contacts list on the left side of the page.
-                Find the contact named "{contact_name}" and click on it to open their chat.
-                Wait for the chat to load.
-                """,
-                llm=self.llm,
-                browser_session=self.browser_session,
-                use_judge=False,
+            if await self.actions.evaluate(_CHAT_OPEN_JS, contact_id, contact_name) == "True":
+                self.chat_switches_skipped += 1
+                return True
+            self.chat_switches += 1
+            await log_step("WhatsAppAgent", StepType.NAVIGATE, f"Switching to '{contact_name}' chat", f"route=#chat={contact_id}")
+            await self.actions.evaluate(_ROUTE_TO_CHAT_JS, contact_id)
+            opened = await self.actions.wait_for_js(
+                _CHAT_OPEN_JS, f"chat header showing '{contact_name}'", contact_id, contact_name, policy=_ROUTE_WAIT
             )
-            await nav_agent.run()
-            await log_step("WhatsAppAgent", StepType.CLICK, f"Clicked on '{contact_name}' in contacts sidebar")
-            await log_step("WhatsAppAgent", StepType.WAIT, f"Waiting for {contact_name}'s chat to load")
-            logger.info(f"[WhatsAppAgent] Navigated to {contact_name}'s chat")
-            await asyncio.sleep(1)
+            self.actions.record_step("route_to_contact", opened)
+
+            if not opened:
+
+                async def click_contact_row() -> bool:
+                    selector = await self._contact_row(contact_id)
+                    if selector and await self.actions.click(selector):
+                        return True
+                    self._contact_rows.clear()  # sidebar changed under us; rebuild next time
+                    return await self.actions.click(CONTACT_ROW, contact_name)
+
+                await self.actions.run_step(
+                    "navigate_to_contact",
+                    click_contact_row,
+                    f"""
+                    Look at the contacts list on the left side of the page.
+                    Find the contact named "{contact_name}" and click on it to open their chat.
+                    Wait for the chat to load.
+                    """,
+                )
+                await log_step("WhatsAppAgent", StepType.CLICK, f"Clicked on '{contact_name}' in contacts sidebar")
+                opened = await self.actions.wait_for_js(_CHAT_OPEN_JS, f"chat header showing '{contact_name}'", contact_id, contact_name)
+
+            if opened:
+                logger.info(f"[WhatsAppAgent] Navigated to {contact_name}'s chat")
+            else:
+                await log_step("WhatsAppAgent", StepType.EVENT, f"'{contact_name}' chat did not open")
+                logger.error(f"[WhatsAppAgent] {contact_name}'s chat did not open")
+            return opened
         except Exception as e:
             await log_step("WhatsAppAgent", StepType.EVENT, f"Failed to navigate to '{contact_name}'", f"error={str(e)}")
             logger.error(f"[WhatsAppAgent] Failed to navigate to {contact_name}: {e}")
+            return False
+
+    async def _contact_row(self, contact_id: str) -> str | None:
+        """Selector for a contact's sidebar row, from one scan of the sidebar cached per ID."""
+        if contact_id not in self._contact_rows:
+            raw = await self.actions.evaluate(_CONTACT_ROWS_JS, self._contact_names)
+            self._contact_rows = json.loads(raw or "{}")
+        return self._contact_rows.get(contact_id)
 
     async def teardown(self):
-        """Stop the polling loop."""
+        """Stop the message loop, the conversation workers and the realtime feed."""
         self._running = False
+        for worker in self._workers.values():
+            await worker.stop()
+        if self._mirror_task:
+            self._mirror_task.cancel()
+        if self.feed:
+            await self.feed.close()
         await super().teardown()
@@ -14,6 +14,14 @@ class Config:
     # Supabase (WhatsApp clone DB)
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY", "")
+    SUPABASE_TIMEOUT: float = float(os.getenv("SUPABASE_TIMEOUT", "5"))  # per request, seconds
+    SUPABASE_RETRIES: int = int(os.getenv("SUPABASE_RETRIES", "2"))  # extra attempts on timeouts / 5xx
+
+    # How new chat messages reach the agent: "realtime" (pushed over the Supabase
+    # Realtime websocket, polling only while it is down) or "poll"
+    INGEST_MODE: str = os.getenv("INGEST_MODE", "realtime").lower()
+    REALTIME_JOIN_TIMEOUT: float = float(os.getenv("REALTIME_JOIN_TIMEOUT", "10"))
+    REALTIME_MAX_BACKOFF: float = float(os.getenv("REALTIME_MAX_BACKOFF", "60"))  # seconds between reconnect attempts
 
     # Deployed app URLs
     WHATSAPP_URL: str = os.getenv("WHATSAPP_URL", "https://whatsapp-rl-clone.vercel.app/")
@@ -29,12 +37,80 @@ class Config:
     BLINKIT_EMAIL: str = os.getenv("BLINKIT_EMAIL", "agent@test.com")
     BLINKIT_PASSWORD: str = os.getenv("BLINKIT_PASSWORD", "password123")
 
+    # BlinkeyIt ordering mode: "api" places orders over HTTP against the server,
+    # "browser" drives the UI with browser-use (also used as fallback when the API fails)
+    BLINKIT_MODE: str = os.getenv("BLINKIT_MODE", "api").lower()
+    BLINKIT_API_URL: str = os.getenv("BLINKIT_API_URL", "http://localhost:8080")
+    BLINKIT_API_TIMEOUT: float = float(os.getenv("BLINKIT_API_TIMEOUT", "10"))
+
+    # Local product catalog (fuzzy search without the browser); refreshed incrementally
+    # every CATALOG_TTL seconds and rebuilt from scratch every CATALOG_FULL_REFRESH
+    CATALOG_ENABLED: bool = os.getenv("CATALOG_ENABLED", "true").lower() == "true"
+    CATALOG_TTL: float = float(os.getenv("CATALOG_TTL", "300"))
+    CATALOG_FULL_REFRESH: float = float(os.getenv("CATALOG_FULL_REFRESH", "3600"))
+    CATALOG_MIN_SCORE: float = float(os.getenv("CATALOG_MIN_SCORE", "0.3"))
+
+    # Orders placed in parallel, each with its own BlinkItAgent and browser session
+    # (keep BLINKIT_POOL_SIZE >= this so every running order gets a warm session)
+    MAX_CONCURRENT_ORDERS: int = int(os.getenv("MAX_CONCURRENT_ORDERS", "2"))
+    # Orders arriving within this many seconds of each other share one cart and checkout (0 disables)
+    ORDER_BATCH_WINDOW: float = float(os.getenv("ORDER_BATCH_WINDOW", "2"))
+    ORDER_BATCH_MAX: int = int(os.getenv("ORDER_BATCH_MAX", "5"))
+
+    # Warm pool of logged-in BlinkeyIt browser sessions (browser mode only; 0 disables).
+    # Sessions idle past BLINKIT_POOL_IDLE_TIMEOUT are closed, but the pool always keeps
+    # BLINKIT_POOL_MIN_WARM of them alive, relaunching any that were evicted or discarded
+    BLINKIT_POOL_SIZE: int = int(os.getenv("BLINKIT_POOL_SIZE", "2"))
+    BLINKIT_POOL_IDLE_TIMEOUT: float = float(os.getenv("BLINKIT_POOL_IDLE_TIMEOUT", "600"))
+    BLINKIT_POOL_MIN_WARM: int = int(os.getenv("BLINKIT_POOL_MIN_WARM", "1"))
+    BLINKIT_STORAGE_STATE_PATH: str = os.getenv(
+        "BLINKIT_STORAGE_STATE_PATH", os.path.join(os.path.dirname(__file__), "data", "blinkit_state.json")
+    )
+
     # Agent settings
     POLL_INTERVAL: int = int(os.getenv("POLL_INTERVAL", "5"))
+    # Adaptive polling (when realtime is off or down): POLL_MIN_INTERVAL right after
+    # activity, multiplied by POLL_BACKOFF per empty poll up to POLL_MAX_INTERVAL
+    POLL_MIN_INTERVAL: float = float(os.getenv("POLL_MIN_INTERVAL", "1"))
+    POLL_MAX_INTERVAL: float = float(os.getenv("POLL_MAX_INTERVAL", "60"))
+    POLL_BACKOFF: float = float(os.getenv("POLL_BACKOFF", "2"))
+    # Reads start this many seconds before the watermark (deduped by chats.id) to catch late commits
+    POLL_LOOKBACK: float = float(os.getenv("POLL_LOOKBACK", "2"))
+    # How replies go out: "direct" inserts into Supabase chats (the clone shows them on
+    # its next refresh), "ui" types them into the browser. SEND_UI_MIRROR opens other
+    # contacts' chats in the background so you can watch direct replies land.
+    SEND_MODE: str = os.getenv("SEND_MODE", "direct").lower()
+    SEND_UI_MIRROR: bool = os.getenv("SEND_UI_MIRROR", "true").lower() == "true"
+    # Burst coalescing: wait for DEBOUNCE_WINDOW seconds of quiet before replying,
+    # but never longer than DEBOUNCE_MAX_WAIT after the first unanswered message
+    DEBOUNCE_WINDOW: float = float(os.getenv("DEBOUNCE_WINDOW", "1.5"))
+    DEBOUNCE_MAX_WAIT: float = float(os.getenv("DEBOUNCE_MAX_WAIT", "6"))
+    # Startup catch-up: most chat rows read in one go since the saved watermarks
+    CATCHUP_MAX_ROWS: int = int(os.getenv("CATCHUP_MAX_ROWS", "1000"))
+    # Handled chat message ids remembered (in memory and SQLite) to never handle one twice
+    PROCESSED_IDS_MAX: int = int(os.getenv("PROCESSED_IDS_MAX", "5000"))
+    # LLM calls in flight across all chat workers (one slot is kept for the target contact)
+    LLM_CONCURRENCY: int = int(os.getenv("LLM_CONCURRENCY", "3"))
     HEADLESS: bool = os.getenv("HEADLESS", "false").lower() == "true"
+    WAIT_TIMEOUT: float = float(os.getenv("WAIT_TIMEOUT", "10"))  # max seconds to wait for a page condition
+
+    # Cached LLM results (fallback search terms, food decisions); invalidated when supermemory.md changes
+    LLM_CACHE_TTL: float = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
 
     # Database
     DB_PATH: str = os.getenv("DB_PATH", os.path.join(os.path.dirname(__file__), "data", "memory.db"))
+    # Write-behind for conversation/log inserts: buffered rows are committed together every
+    # WRITE_BEHIND_INTERVAL seconds, once WRITE_BEHIND_MAX_ROWS are pending, or on shutdown
+    WRITE_BEHIND_INTERVAL: float = float(os.getenv("WRITE_BEHIND_INTERVAL", "0.5"))
+    WRITE_BEHIND_MAX_ROWS: int = int(os.getenv("WRITE_BEHIND_MAX_ROWS", "200"))
+    # Retention: every MEMORY_COMPACT_INTERVAL seconds, messages and agent logs older than
+    # MEMORY_RETENTION_DAYS move to archive tables (each chat keeps its newest MEMORY_KEEP_PER_CONVERSATION)
+    MEMORY_RETENTION_DAYS: float = float(os.getenv("MEMORY_RETENTION_DAYS", "30"))
+    MEMORY_KEEP_PER_CONVERSATION: int = int(os.getenv("MEMORY_KEEP_PER_CONVERSATION", "200"))
+    MEMORY_COMPACT_INTERVAL: float = float(os.getenv("MEMORY_COMPACT_INTERVAL", "3600"))
+    # Newest messages per conversation kept in memory for recent-context reads
+    CONTEXT_CACHE_SIZE: int = int(os.getenv("CONTEXT_CACHE_SIZE", "50"))
 
     # SuperMemory path
     SUPERMEMORY_PATH: str = os.getenv(
@@ -0,0 +1,157 @@
+import logging
+import math
+
+import httpx
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class BlinkItAPIError(Exception):
+    """Raised when the BlinkeyIt server rejects a request or is unreachable."""
+
+
+class BlinkItCheckoutError(BlinkItAPIError):
+    """
+    Raised when a checkout fails after it changed server state, so it must not
+    be retried or redone through the browser. stage is "budget" when the live
+    cart came to more than the price cap (the added items were removed again),
+    "cart" when items this checkout added could not be removed again,
+    "submitted" when the COD order was sent and its outcome is unknown.
+    """
+
+    def __init__(self, message: str, stage: str):
+        super().__init__(message)
+        self.stage = stage
+
+
+class BlinkItClient:
+    """
+    Async HTTP client for the BlinkeyIt server API.
+    Talks to the same endpoints the React frontend uses, so an order can be
+    placed without driving the UI. One instance (and one connection pool)
+    is shared by every order in the process.
+    """
+
+    def __init__(self, base_url: str | None = None, timeout: float | None = None):
+        self.base_url = (base_url or config.BLINKIT_API_URL).rstrip("/")
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout or config.BLINKIT_API_TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+        self._access_token: str | None = None
+
+    @property
+    def is_logged_in(self) -> bool:
+        return self._access_token is not None
+
+    async def _request(self, method: str, path: str, payload: dict | None = None, auth: bool = True, retry_auth: bool = True) -> dict:
+        """Send a request and return the decoded body. Raises BlinkItAPIError on failure.
+        An expired token is refreshed by logging in again once."""
+        headers = {}
+        if auth:
+            await self.ensure_login()
+            headers["Authorization"] = f"Bearer {self._access_token}"
+
+        try:
+            response = await self._client.request(method, path, json=payload, headers=headers)
+        except httpx.HTTPError as e:
+            raise BlinkItAPIError(f"{method} {path} failed: {e}") from e
+
+        try:
+            body = response.json()
+        except ValueError:
+            raise BlinkItAPIError(f"{method} {path} returned non-JSON response (HTTP {response.status_code})")
+
+        # auth middleware answers 401 without a token and 500 "You have not login" on a bad one
+        if auth and retry_auth and (response.status_code == 401 or "not login" in str(body.get("message", ""))):
+            self._access_token = None
+            return await self._request(method, path, payload, auth=True, retry_auth=False)
+
+        if response.status_code >= 400 or body.get("error"):
+            raise BlinkItAPIError(f"{method} {path} → HTTP {response.status_code}: {body.get('message', 'unknown error')}")
+        return body
+
+    async def login(self, email: str | None = None, password: str | None = None) -> str:
+        """Login and keep the access token for subsequent calls."""
+        body = await self._request(
+            "POST",
+            "/api/user/login",
+            {"email": email or config.BLINKIT_EMAIL, "password": password or config.BLINKIT_PASSWORD},
+            auth=False,
+        )
+        token = (body.get("data") or {}).get("accesstoken")
+        if not token:
+            raise BlinkItAPIError("Login response did not contain an access token")
+        self._access_token = token
+        logger.info(f"[BlinkItClient] Logged in at {self.base_url}")
+        return token
+
+    async def ensure_login(self):
+        """Login only if we don't already hold a token."""
+        if not self._access_token:
+            await self.login()
+
+    async def search_products(self, query: str, limit: int = 10) -> list[dict]:
+        """Full-text product search (same endpoint as the /search page)."""
+        body = await self._request(
+            "POST", "/api/product/search-product", {"search": query, "page": 1, "limit": limit}, auth=False
+        )
+        return body.get("data") or []
+
+    async def list_products(self, page: int = 1, limit: int = 50) -> tuple[list[dict], int]:
+        """One page of the full catalog, newest first. Returns (products, total pages)."""
+        body = await self._request("POST", "/api/product/get", {"page": page, "limit": limit}, auth=False)
+        return body.get("data") or [], int(body.get("totalNoPage") or 0)
+
+    async def add_to_cart(self, product_id: str) -> dict:
+        """Add a product to the cart. An item that is already in the cart counts as added."""
+        try:
+            body = await self._request("POST", "/api/cart/create", {"productId": product_id})
+        except BlinkItAPIError as e:
+            if "already in cart" in str(e).lower():
+                return {}
+            raise
+        return body.get("data") or {}
+
+    async def get_cart(self) -> list[dict]:
+        """Cart items with productId populated."""
+        body = await self._request("GET", "/api/cart/get")
+        return body.get("data") or []
+
+    async def remove_from_cart(self, cart_item_id: str):
+        """Delete one cart line (the _id returned by add_to_cart, not the product id)."""
+        await self._request("DELETE", "/api/cart/delete-cart-item", {"_id": cart_item_id})
+
+    async def get_addresses(self) -> list[dict]:
+        """Saved delivery addresses, newest first."""
+        body = await self._request("GET", "/api/address/get")
+        return [a for a in (body.get("data") or []) if a.get("status", True)]
+
+    async def cash_on_delivery(self, list_items: list[dict], address_id: str, total: int) -> list[dict]:
+        """Place a COD order for the given cart items. Sent exactly once: no re-login and resend."""
+        body = await self._request(
+            "POST",
+            "/api/order/cash-on-delivery",
+            {
+                "list_items": list_items,
+                "addressId": address_id,
+                "subTotalAmt": total,
+                "totalAmt": total,
+            },
+            retry_auth=False,
+        )
+        return body.get("data") or []
+
+    async def close(self):
+        """Close the underlying connection pool."""
+        await self._client.aclose()
+
+    @staticmethod
+    def price_with_discount(price, discount) -> int:
+        """Same rounding as the frontend's pricewithDiscount helper."""
+        price = int(price or 0)
+        discount_amount = math.ceil(price * int(discount or 0) / 100)
+        return price - discount_amount
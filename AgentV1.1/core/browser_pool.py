@@ -0,0 +1,274 @@
+"""
+Browser Pool — warm, pre-logged-in BlinkeyIt browser sessions.
+
+Launching Chrome and logging in is the slowest part of a browser-mode
+order. The pool keeps N sessions already open on BlinkeyIt with a valid
+login, hands them out with lease()/release(), health-checks a session
+before every lease, and evicts sessions that sit idle past the timeout —
+down to `min_warm`, which it keeps alive (and relaunches) at all times.
+
+The login (cookies + the frontend's localStorage tokens) is saved as a
+Playwright-style storage state file, so a freshly launched session starts
+logged in and only falls back to the full login flow if that fails.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+from urllib.parse import urlparse
+
+from browser_use import BrowserSession
+
+from config import config
+from core.dom_actions import DOMActions
+from core.step_logger import log_step, StepType
+
+logger = logging.getLogger(__name__)
+
+# Tokens the BlinkeyIt frontend keeps in localStorage after login
+_READ_TOKENS_JS = """() => JSON.stringify({
+    accesstoken: localStorage.getItem('accesstoken'),
+    refreshToken: localStorage.getItem('refreshToken'),
+})"""
+_HAS_TOKEN_JS = """() => Boolean(localStorage.getItem('accesstoken'))"""
+
+
+@dataclass
+class PooledSession:
+    session: BrowserSession
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    leases: int = 0
+
+
+class BlinkItBrowserPool:
+    """Fixed-size pool of logged-in BlinkeyIt BrowserSessions."""
+
+    def __init__(
+        self,
+        login: Callable[[BrowserSession], Awaitable[None]],
+        size: int = config.BLINKIT_POOL_SIZE,
+        idle_timeout: float = config.BLINKIT_POOL_IDLE_TIMEOUT,
+        storage_path: str = config.BLINKIT_STORAGE_STATE_PATH,
+        min_warm: int = config.BLINKIT_POOL_MIN_WARM,
+    ):
+        self._login = login
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.min_warm = max(0, min(min_warm, size))
+        self.storage_path = storage_path
+
+        self._idle: deque[PooledSession] = deque()
+        self._total = 0  # live sessions + slots reserved for sessions being created
+        self._cond = asyncio.Condition()
+        self._evict_task: asyncio.Task | None = None
+
+        # Stats for /status
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.replenished = 0
+        self._lease_wait_total = 0.0
+        self._lease_wait_max = 0.0
+
+    async def start(self):
+        """Pre-launch and log in all sessions, then start the idle evictor."""
+        async with self._cond:
+            self._total += self.size
+        results = await asyncio.gather(*(self._create() for _ in range(self.size)), return_exceptions=True)
+
+        async with self._cond:
+            for result in results:
+                if isinstance(result, PooledSession):
+                    self._idle.append(result)
+                else:
+                    self._total -= 1
+                    logger.error(f"[BrowserPool] Failed to warm session: {result}")
+            self._cond.notify_all()
+
+        self._evict_task = asyncio.create_task(self._evict_loop())
+        await log_step("BrowserPool", StepType.EVENT, f"Warmed {len(self._idle)}/{self.size} BlinkeyIt sessions")
+        logger.info(f"[BrowserPool] {len(self._idle)}/{self.size} warm sessions ready")
+
+    async def lease(self) -> PooledSession:
+        """Take a healthy logged-in session, waiting if all are in use."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        async with self._cond:
+            while not self._idle and self._total >= self.size:
+                await self._cond.wait()
+            pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                self._total += 1  # reserve a slot for a cold session
+
+        waited = loop.time() - started
+        self._lease_wait_total += waited
+        self._lease_wait_max = max(self._lease_wait_max, waited)
+
+        if pooled is not None and not await self._is_healthy(pooled):
+            logger.warning("[BrowserPool] Leased session failed health check, replacing it")
+            await self._kill(pooled)
+            pooled = None  # keep the slot, replace in place
+
+        if pooled is None:
+            self.misses += 1
+            try:
+                pooled = await self._create()
+            except Exception:
+                async with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+        else:
+            self.hits += 1
+
+        pooled.leases += 1
+        return pooled
+
+    async def release(self, pooled: PooledSession, healthy: bool = True):
+        """Return a session to the pool, or discard it if the caller saw it break."""
+        if not healthy:
+            await self._kill(pooled)
+            async with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            return
+
+        pooled.last_used = time.monotonic()
+        async with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    async def close(self):
+        """Kill all idle sessions and stop eviction. Leased sessions die with their owner."""
+        if self._evict_task:
+            self._evict_task.cancel()
+            try:
+                await self._evict_task
+            except asyncio.CancelledError:
+                pass
+        async with self._cond:
+            sessions = list(self._idle)
+            self._idle.clear()
+            self._total -= len(sessions)
+        for pooled in sessions:
+            await self._kill(pooled)
+
+    def stats(self) -> dict:
+        leases = self.hits + self.misses
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": self._total - len(self._idle),
+            "leases": leases,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / leases, 3) if leases else None,
+            "avg_lease_wait_ms": round(self._lease_wait_total / leases * 1000, 1) if leases else None,
+            "max_lease_wait_ms": round(self._lease_wait_max * 1000, 1),
+            "evictions": self.evictions,
+            "min_warm": self.min_warm,
+            "replenished": self.replenished,
+        }
+
+    # ── internals ─────────────────────────────────────────────
+
+    async def _create(self) -> PooledSession:
+        """Launch a session, restore the saved login, and log in from scratch only if needed."""
+        has_state = os.path.exists(self.storage_path)
+        session = BrowserSession(
+            headless=config.HEADLESS,
+            keep_alive=True,
+            storage_state=self.storage_path if has_state else None,
+        )
+        actions = DOMActions("BrowserPool", session, llm=None)
+        try:
+            await actions.goto(config.BLINKIT_URL)
+            if not (has_state and await actions.wait_for_selector("header", "Account", timeout=5)):
+                logger.info("[BrowserPool] No valid saved login, running login flow")
+                await self._login(session)
+                await self._save_storage_state(session, actions)
+        except Exception:
+            await session.kill()
+            raise
+        return PooledSession(session)
+
+    async def _is_healthy(self, pooled: PooledSession) -> bool:
+        """Browser still connected and the login token is still in localStorage."""
+        try:
+            if not pooled.session.is_cdp_connected:
+                return False
+            page = await pooled.session.must_get_current_page()
+            return (await page.evaluate(_HAS_TOKEN_JS)) == "True"
+        except Exception as e:
+            logger.debug(f"[BrowserPool] Health check error: {e}")
+            return False
+
+    async def _save_storage_state(self, session: BrowserSession, actions: DOMActions):
+        """Persist cookies plus the BlinkeyIt localStorage tokens."""
+        try:
+            state = await session.export_storage_state()
+            tokens = json.loads(await actions.evaluate(_READ_TOKENS_JS) or "{}")
+            parsed = urlparse(config.BLINKIT_URL)
+            state["origins"] = [{
+                "origin": f"{parsed.scheme}://{parsed.netloc}",
+                "localStorage": [{"name": k, "value": v} for k, v in tokens.items() if v],
+            }]
+            os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
+            with open(self.storage_path, "w") as f:
+                json.dump(state, f)
+            logger.info(f"[BrowserPool] Saved BlinkeyIt login state to {self.storage_path}")
+        except Exception as e:
+            logger.warning(f"[BrowserPool] Could not save storage state: {e}")
+
+    async def _evict_loop(self):
+        """Kill sessions idle longer than idle_timeout, keeping min_warm alive, then top back up to min_warm."""
+        while True:
+            await asyncio.sleep(min(self.idle_timeout / 2, 30))
+            now = time.monotonic()
+            async with self._cond:
+                expired = [p for p in self._idle if now - p.last_used > self.idle_timeout]
+                expired.sort(key=lambda p: p.last_used)
+                expired = expired[:max(0, self._total - self.min_warm)]
+                for pooled in expired:
+                    self._idle.remove(pooled)
+                self._total -= len(expired)
+                self.evictions += len(expired)
+                if expired:
+                    self._cond.notify(len(expired))
+            for pooled in expired:
+                logger.info(f"[BrowserPool] Evicting session idle for {now - pooled.last_used:.0f}s")
+                await self._kill(pooled)
+            await self._replenish()
+
+    async def _replenish(self):
+        """Relaunch sessions lost to eviction, failed health checks or broken runs, up to min_warm."""
+        async with self._cond:
+            missing = max(0, self.min_warm - self._total)
+            self._total += missing
+        if not missing:
+            return
+        results = await asyncio.gather(*(self._create() for _ in range(missing)), return_exceptions=True)
+        async with self._cond:
+            for result in results:
+                if isinstance(result, PooledSession):
+                    self._idle.append(result)
+                    self.replenished += 1
+                else:
+                    self._total -= 1
+                    logger.error(f"[BrowserPool] Failed to replenish session: {result}")
+            self._cond.notify_all()
+        logger.info(f"[BrowserPool] Replenished {missing} warm session(s), {len(self._idle)} idle")
+
+    @staticmethod
+    async def _kill(pooled: PooledSession):
+        try:
+            await pooled.session.kill()
+        except Exception:
+            pass
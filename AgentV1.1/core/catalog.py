@@ -0,0 +1,245 @@
+"""
+Product Catalog — local, in-memory index of the BlinkeyIt catalog.
+
+Built from /api/product/get (paged, newest first) and kept fresh with a
+cheap incremental refresh every CATALOG_TTL seconds (stop paging at the
+first page with nothing new or changed) plus a full rebuild every
+CATALOG_FULL_REFRESH seconds to drop deleted products. Products seen in
+/api/product/search-product results are merged in as they come.
+
+Pages come newest first, so the incremental refresh only sees new
+products: a price or stock edit to an older one shows up at the next full
+rebuild (or when it turns up in search-product results). Until then the
+catalog may offer it at its old price; that's only safe because checkout
+re-prices every line from the live cart against the price cap
+(BlinkItAgent._check_cart_budget) before placing the order.
+
+search() ranks products by exact token overlap (inverted index) blended
+with trigram similarity, so "hot chocolates" or "kitkat" still find
+"Cadbury Bournvita Hot Chocolate Drink" / "Nestle KitKat 4 Finger
+Chocolate" without a round trip or a browser.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from config import config
+from core import text_match
+from core.blinkit_client import BlinkItAPIError, BlinkItClient
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class CatalogProduct:
+    product_id: str
+    name: str
+    price: int  # after discount, in rupees
+    stock: int | None
+    unit: str
+    updated_at: str
+    tokens: frozenset[str]
+    trigrams: frozenset[str]
+
+
+class ProductCatalog:
+    """Inverted-index + trigram search over the BlinkeyIt product catalog."""
+
+    def __init__(
+        self,
+        client: BlinkItClient,
+        ttl: float = config.CATALOG_TTL,
+        full_refresh: float = config.CATALOG_FULL_REFRESH,
+        min_score: float = config.CATALOG_MIN_SCORE,
+        page_size: int = 100,
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.full_refresh = full_refresh
+        self.min_score = min_score
+        self.page_size = page_size
+
+        self._products: dict[str, CatalogProduct] = {}
+        self._token_index: dict[str, set[str]] = defaultdict(set)
+        self._trigram_index: dict[str, set[str]] = defaultdict(set)
+
+        self._lock = asyncio.Lock()
+        self._built_at: float | None = None
+        self._refreshed_at: float | None = None
+        self._failed_at: float | None = None  # last failed refresh; no retry until ttl has passed
+
+        # Stats for /status
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.searches = 0
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    # ── freshness ─────────────────────────────────────────────
+
+    async def ensure_fresh(self):
+        """Refresh if the TTL has expired. A failed refresh keeps serving the stale index."""
+        if not self._needs_refresh():
+            return
+        async with self._lock:
+            if not self._needs_refresh():
+                return  # another caller refreshed (or failed to) while we waited
+            try:
+                await self.refresh(full=self._needs_full_refresh())
+            except BlinkItAPIError as e:
+                logger.warning(f"[Catalog] Refresh failed, serving {len(self._products)} cached products: {e}")
+                self._failed_at = time.monotonic()  # don't retry on every lookup
+                self.refresh_failures += 1
+
+    def _needs_full_refresh(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.full_refresh
+
+    def _needs_refresh(self) -> bool:
+        now = time.monotonic()
+        if self._failed_at is not None and now - self._failed_at < self.ttl:
+            return False
+        return self._needs_full_refresh() or now - self._refreshed_at > self.ttl
+
+    async def refresh(self, full: bool = False):
+        """
+        Page through /api/product/get. A full refresh reads every page and drops
+        products that are gone; an incremental one stops at the first page with
+        no new or changed products, so it misses edits to older products (see
+        the module docstring).
+        """
+        started = time.monotonic()
+        seen: set[str] = set()
+        changed = 0
+        page = 1
+        while True:
+            products, total_pages = await self.client.list_products(page, self.page_size)
+            page_changed = sum(self._upsert(p) for p in products)
+            changed += page_changed
+            seen.update(p["_id"] for p in products if p.get("_id"))
+            if page >= total_pages or not products or (not full and page_changed == 0):
+                break
+            page += 1
+
+        removed = 0
+        if full:
+            for product_id in [pid for pid in self._products if pid not in seen]:
+                self._remove(product_id)
+                removed += 1
+            self._built_at = time.monotonic()
+        self._refreshed_at = time.monotonic()
+        self._failed_at = None
+        self.refreshes += 1
+        logger.info(
+            f"[Catalog] {'Full' if full else 'Incremental'} refresh: {page} page(s), {changed} new/changed, "
+            f"{removed} removed, {len(self._products)} products in {time.monotonic() - started:.2f}s"
+        )
+
+    def merge(self, products: list[dict]):
+        """Fold products from another endpoint (e.g. search-product results) into the index."""
+        for product in products:
+            self._upsert(product)
+
+    # ── search ────────────────────────────────────────────────
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[float, CatalogProduct]]:
+        """Rank orderable products for a free-text query. Returns [(score, product)], best first."""
+        self.searches += 1
+        q_tokens = set(text_match.tokens(query))
+        if not q_tokens:
+            return []
+        q_trigrams = text_match.trigrams(q_tokens)
+
+        # Candidates: any exact token hit, or enough shared trigrams to be a fuzzy match
+        token_hits: Counter[str] = Counter()
+        for token in q_tokens:
+            token_hits.update(self._token_index.get(token, ()))
+        trigram_hits: Counter[str] = Counter()
+        for gram in q_trigrams:
+            trigram_hits.update(self._trigram_index.get(gram, ()))
+        min_shared = max(1, int(len(q_trigrams) * self.min_score))
+        candidates = set(token_hits) | {pid for pid, n in trigram_hits.items() if n >= min_shared}
+
+        results = []
+        for product_id in candidates:
+            score = text_match.score(
+                token_hits.get(product_id, 0), len(q_tokens),
+                trigram_hits.get(product_id, 0), len(q_trigrams),
+            )
+            if score >= self.min_score:
+                results.append((score, self._products[product_id]))
+
+        results.sort(key=lambda r: (-r[0], r[1].price))
+        return results[:limit]
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "products": len(self._products),
+            "tokens": len(self._token_index),
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "searches": self.searches,
+            "age_s": round(now - self._refreshed_at, 1) if self._refreshed_at else None,
+        }
+
+    # ── index maintenance ─────────────────────────────────────
+
+    def _upsert(self, raw: dict) -> bool:
+        """Add or update one product. Returns True if anything changed."""
+        product_id = raw.get("_id")
+        if not product_id:
+            return False
+        if raw.get("stock") == 0 or not raw.get("publish", True):
+            # Out of stock / unpublished products can't be ordered
+            return self._remove(product_id)
+
+        name = raw.get("name", "")
+        price = BlinkItClient.price_with_discount(raw.get("price"), raw.get("discount"))
+        updated_at = raw.get("updatedAt") or raw.get("createdAt") or ""
+        existing = self._products.get(product_id)
+        if existing and (existing.name, existing.price, existing.stock, existing.updated_at) == (
+            name, price, raw.get("stock"), updated_at
+        ):
+            return False
+
+        if existing:
+            self._remove(product_id)
+        tokens = text_match.tokens(name)
+        product = CatalogProduct(
+            product_id=product_id,
+            name=name,
+            price=price,
+            stock=raw.get("stock"),
+            unit=raw.get("unit", ""),
+            updated_at=updated_at,
+            tokens=frozenset(tokens),
+            trigrams=frozenset(text_match.trigrams(tokens)),
+        )
+        self._products[product_id] = product
+        for token in product.tokens:
+            self._token_index[token].add(product_id)
+        for gram in product.trigrams:
+            self._trigram_index[gram].add(product_id)
+        return True
+
+    def _remove(self, product_id: str) -> bool:
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return False
+        for token in product.tokens:
+            self._discard(self._token_index, token, product_id)
+        for gram in product.trigrams:
+            self._discard(self._trigram_index, gram, product_id)
+        return True
+
+    @staticmethod
+    def _discard(index: dict[str, set[str]], key: str, product_id: str):
+        postings = index.get(key)
+        if postings is not None:
+            postings.discard(product_id)
+            if not postings:
+                del index[key]
@@ -0,0 +1,226 @@
+"""
+Chat Feed — push delivery of new `public.chats` rows over Supabase Realtime.
+
+Speaks the Phoenix channel protocol (vsn 1.0.0) that Supabase Realtime
+uses: one websocket, one `phx_join` with a postgres_changes binding for
+INSERTs on public.chats filtered to the watched conversation(s), and a
+heartbeat every 25s. Inserted rows are pushed onto a queue the moment
+Postgres commits them, so the agent no longer has to query every
+POLL_INTERVAL while nothing is happening.
+
+The feed reconnects by itself with exponential backoff. While it is down
+`connected` is False and the caller falls back to polling; after every
+(re)subscribe `gap_fill_pending` stays True so the caller can page through
+rows inserted while nobody was listening, until it calls `finish_gap_fill()`.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import random
+import time
+
+import websockets
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VSN = "1.0.0"
+HEARTBEAT_INTERVAL = 25.0
+
+
+class ChatFeedError(Exception):
+    """Raised when the realtime server refuses the channel join."""
+
+
+class ChatFeed:
+    """Realtime INSERT subscription on public.chats for a set of conversations."""
+
+    def __init__(
+        self,
+        conversation_ids: list[str],
+        url: str | None = None,
+        key: str | None = None,
+        join_timeout: float = config.REALTIME_JOIN_TIMEOUT,
+        max_backoff: float = config.REALTIME_MAX_BACKOFF,
+    ):
+        self.conversation_ids = list(conversation_ids)
+        self.url = (url or config.SUPABASE_URL).rstrip("/")
+        self.key = key if key is not None else config.SUPABASE_ANON_KEY
+        self.join_timeout = join_timeout
+        self.max_backoff = max_backoff
+
+        self.rows: asyncio.Queue[dict] = asyncio.Queue()
+        self._connected = asyncio.Event()
+        self._gap_fill = False
+        self._task: asyncio.Task | None = None
+        self._ws = None
+        self._refs = itertools.count(1)
+        self._topic = f"realtime:chats-{hashlib.sha1('|'.join(sorted(self.conversation_ids)).encode()).hexdigest()[:12]}"
+
+        # Stats for /status
+        self.connects = 0
+        self.disconnects = 0
+        self.pushed = 0
+        self.connected_since: float | None = None
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    @property
+    def websocket_url(self) -> str:
+        base = self.url.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        return f"{base}/realtime/v1/websocket?apikey={self.key}&vsn={PROTOCOL_VSN}"
+
+    def start(self):
+        """Start the connect / listen / reconnect loop in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._set_disconnected()
+
+    async def wait_connected(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.connected
+
+    @property
+    def gap_fill_pending(self) -> bool:
+        """True from each successful (re)subscribe until finish_gap_fill()."""
+        return self._gap_fill
+
+    def finish_gap_fill(self, connects: int):
+        """
+        Mark the gap since the subscribe numbered `connects` as read. Ignored if
+        the feed has resubscribed since, since that opened a new gap.
+        """
+        if connects == self.connects:
+            self._gap_fill = False
+
+    async def next_rows(self, timeout: float) -> list[dict]:
+        """Wait up to `timeout` for at least one pushed row, then drain whatever else is queued."""
+        try:
+            first = await asyncio.wait_for(self.rows.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        rows = [first]
+        while not self.rows.empty():
+            rows.append(self.rows.get_nowait())
+        return rows
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "pushed_rows": self.pushed,
+            "uptime_s": round(time.monotonic() - self.connected_since, 1) if self.connected_since else None,
+        }
+
+    # ── connection loop ───────────────────────────────────────
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.websocket_url, open_timeout=self.join_timeout) as ws:
+                    self._ws = ws
+                    await self._join(ws)
+                    self.connects += 1
+                    self.connected_since = time.monotonic()
+                    self._gap_fill = True
+                    self._connected.set()
+                    backoff = 1.0
+                    logger.info(f"[ChatFeed] Subscribed to chats INSERTs for {len(self.conversation_ids)} conversation(s)")
+
+                    heartbeat = asyncio.create_task(self._heartbeat(ws))
+                    try:
+                        await self._listen(ws)
+                    finally:
+                        heartbeat.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[ChatFeed] Realtime connection lost: {e}")
+
+            if self.connected:
+                self.disconnects += 1
+            self._set_disconnected()
+            delay = backoff * random.uniform(0.8, 1.2)
+            logger.info(f"[ChatFeed] Reconnecting in {delay:.1f}s (polling meanwhile)")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _set_disconnected(self):
+        self._connected.clear()
+        self._ws = None
+        self.connected_since = None
+
+    async def _join(self, ws):
+        """Join the channel and check the server echoed our postgres_changes binding."""
+        if len(self.conversation_ids) == 1:
+            row_filter = f"conversation_id=eq.{self.conversation_ids[0]}"
+        else:
+            row_filter = f"conversation_id=in.({','.join(self.conversation_ids)})"
+        ref = str(next(self._refs))
+        await ws.send(json.dumps({
+            "topic": self._topic,
+            "event": "phx_join",
+            "payload": {
+                "config": {
+                    "broadcast": {"ack": False, "self": False},
+                    "presence": {"key": ""},
+                    "postgres_changes": [
+                        {"event": "INSERT", "schema": "public", "table": "chats", "filter": row_filter}
+                    ],
+                },
+                "access_token": self.key,
+            },
+            "ref": ref,
+            "join_ref": ref,
+        }))
+
+        deadline = time.monotonic() + self.join_timeout
+        while True:
+            raw = await asyncio.wait_for(ws.recv(), max(0.0, deadline - time.monotonic()))
+            message = json.loads(raw)
+            if message.get("event") != "phx_reply" or message.get("ref") != ref:
+                continue
+            payload = message.get("payload") or {}
+            if payload.get("status") != "ok":
+                raise ChatFeedError(f"join rejected: {payload.get('response')}")
+            bindings = (payload.get("response") or {}).get("postgres_changes") or []
+            if not any(b.get("table") == "chats" and b.get("event") == "INSERT" for b in bindings):
+                raise ChatFeedError("server did not confirm the chats INSERT binding")
+            return
+
+    async def _listen(self, ws):
+        async for raw in ws:
+            message = json.loads(raw)
+            event = message.get("event")
+            if event == "postgres_changes":
+                data = (message.get("payload") or {}).get("data") or {}
+                if data.get("type") == "INSERT" and data.get("record"):
+                    self.pushed += 1
+                    self.rows.put_nowait(data["record"])
+            elif event in ("phx_error", "phx_close") and message.get("topic") == self._topic:
+                raise ChatFeedError(f"channel {event}")
+
+    async def _heartbeat(self, ws):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await ws.send(json.dumps({"topic": "phoenix", "event": "heartbeat", "payload": {}, "ref": str(next(self._refs))}))
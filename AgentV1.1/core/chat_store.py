@@ -0,0 +1,214 @@
+"""
+Chat Store — async access to the WhatsApp clone's `chats` table.
+
+Talks PostgREST (Supabase's /rest/v1) over one pooled httpx client, so
+queries never block the event loop the way the sync supabase client's
+.execute() did. Every call has a timeout; reads are retried on timeouts,
+transport errors and 429/5xx with jittered exponential backoff. Inserts
+are retried only when the request never reached the server, so a slow
+insert can't be written twice — unless they carry their own ids, which
+makes them idempotent.
+"""
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# Failures where the request is known not to have been sent — safe to retry a write
+_UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class ChatStoreError(Exception):
+    """Raised when Supabase rejects a request or stays unreachable after retries."""
+
+
+class ChatStore:
+    """Async PostgREST client for public.chats. One instance (one connection pool) per process."""
+
+    def __init__(
+        self,
+        url: str | None = None,
+        key: str | None = None,
+        timeout: float = config.SUPABASE_TIMEOUT,
+        retries: int = config.SUPABASE_RETRIES,
+    ):
+        self.url = (url or config.SUPABASE_URL).rstrip("/")
+        key = key if key is not None else config.SUPABASE_ANON_KEY
+        self.retries = retries
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.url}/rest/v1",
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        )
+
+        # Stats for /status
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+
+    # ── chats ─────────────────────────────────────────────────
+
+    async def recent_messages(
+        self,
+        conversation_id: str | list[str],
+        limit: int = 5,
+        columns: str = "sender_id,content,created_at",
+        timeout: float | None = None,
+    ) -> list[dict]:
+        """Last `limit` messages of a conversation (or, given a list, across those conversations), oldest first."""
+        rows = await self._request(
+            "GET",
+            "/chats",
+            params={
+                "select": columns,
+                "conversation_id": self._conversation_filter(conversation_id),
+                "order": "created_at.desc",
+                "limit": str(limit),
+            },
+            timeout=timeout,
+        )
+        return list(reversed(rows))
+
+    async def messages_since(
+        self,
+        conversation_id: str | list[str],
+        since: str | None = None,
+        sender_id: str | None = None,
+        limit: int = 10,
+        columns: str = "sender_id,content,created_at",
+        timeout: float | None = None,
+        inclusive: bool = False,
+    ) -> list[dict]:
+        """
+        Messages newer than `since` (all of them if None) in one or many
+        conversations, oldest first. `inclusive` also returns rows stamped
+        exactly `since`, for callers that dedupe by id.
+        """
+        params = [
+            ("select", columns),
+            ("conversation_id", self._conversation_filter(conversation_id)),
+            ("order", "created_at.asc"),
+            ("limit", str(limit)),
+        ]
+        if sender_id:
+            params.append(("sender_id", f"eq.{sender_id}"))
+        if since:
+            params.append(("created_at", f"{'gte' if inclusive else 'gt'}.{since}"))
+        return await self._request("GET", "/chats", params=params, timeout=timeout)
+
+    async def insert_messages(
+        self,
+        conversation_id: str,
+        sender_id: str,
+        contents: list[str],
+        timeout: float | None = None,
+        ids: list[str] | None = None,
+    ) -> list[dict]:
+        """
+        Insert several messages to one conversation in a single request, in
+        order. A multi-row insert shares one transaction timestamp, so the
+        rows get explicit created_at values 1ms apart to keep their order
+        in the chat.
+
+        With client-generated `ids` the insert ignores rows that already
+        exist, so it is safe to retry or replay: a message is written at
+        most once. Only newly written rows are returned.
+        """
+        if not contents:
+            return []
+        rows = [{"conversation_id": conversation_id, "sender_id": sender_id, "content": c} for c in contents]
+        if ids:
+            for row, row_id in zip(rows, ids, strict=True):
+                row["id"] = row_id
+        if len(rows) > 1:
+            now = datetime.now(timezone.utc)
+            for i, row in enumerate(rows):
+                row["created_at"] = (now + timedelta(milliseconds=i)).isoformat()
+        return await self._request(
+            "POST",
+            "/chats",
+            params={"on_conflict": "id"} if ids else None,
+            json=rows if len(rows) > 1 else rows[0],
+            headers={"Prefer": "return=representation,resolution=ignore-duplicates" if ids else "return=representation"},
+            timeout=timeout,
+            idempotent=bool(ids),
+        )
+
+    # ── plumbing ──────────────────────────────────────────────
+
+    @staticmethod
+    def _conversation_filter(conversation_id: str | list[str]) -> str:
+        if isinstance(conversation_id, str):
+            return f"eq.{conversation_id}"
+        return f"in.({','.join(conversation_id)})"
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params=None,
+        json=None,
+        headers: dict | None = None,
+        timeout: float | None = None,
+        idempotent: bool = True,
+    ) -> list[dict]:
+        """Send a PostgREST request with retries. Returns the decoded row list."""
+        kwargs = {"params": params, "json": json, "headers": headers}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        last_error = "no attempt made"
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(min(0.25 * 2 ** (attempt - 1), 4.0) * random.uniform(0.5, 1.5))
+            self.requests += 1
+            try:
+                response = await self._client.request(method, path, **kwargs)
+            except httpx.HTTPError as e:
+                last_error = f"{type(e).__name__}: {e}"
+                if idempotent or isinstance(e, _UNSENT_ERRORS):
+                    logger.debug(f"[ChatStore] {method} {path} attempt {attempt + 1} failed: {last_error}")
+                    continue
+                break
+
+            if response.status_code in RETRY_STATUSES and idempotent:
+                last_error = f"HTTP {response.status_code}"
+                continue
+            if response.status_code >= 400:
+                self.failures += 1
+                raise ChatStoreError(f"{method} {path} → HTTP {response.status_code}: {self._error_message(response)}")
+            if not response.content:
+                return []
+            try:
+                body = response.json()
+            except ValueError as e:
+                self.failures += 1
+                raise ChatStoreError(f"{method} {path} returned non-JSON response (HTTP {response.status_code})") from e
+            return body if isinstance(body, list) else [body]
+
+        self.failures += 1
+        raise ChatStoreError(f"{method} {path} failed after {attempt + 1} attempt(s): {last_error}")
+
+    @staticmethod
+    def _error_message(response: httpx.Response) -> str:
+        try:
+            return response.json().get("message", response.text)
+        except ValueError:
+            return response.text
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "retried": self.retried, "failures": self.failures}
+
+    async def close(self):
+        """Close the underlying connection pool."""
+        await self._client.aclose()
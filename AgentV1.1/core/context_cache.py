@@ -0,0 +1,84 @@
+"""
+Context Cache — the newest messages of each conversation, kept in memory.
+
+Every incoming message asks Memory for the last ~20 messages of its chat,
+almost all of which the process wrote itself moments earlier. The cache
+holds a bounded ring (deque) of plain `__slots__` records per conversation:
+writes go through to it, recent-context reads are answered from it, and
+only a conversation it has never seen (or a read deeper than the ring)
+falls back to SQLite, which then refills the ring.
+"""
+
+from collections import deque
+
+
+class MessageRecord:
+    """One stored conversation message. Same fields as ChatMessage, without pydantic's per-instance cost."""
+
+    __slots__ = ("role", "content", "sender_name", "timestamp")
+
+    def __init__(self, role: str, content: str, sender_name: str = "", timestamp: str = ""):
+        self.role = role
+        self.content = content
+        self.sender_name = sender_name
+        self.timestamp = timestamp
+
+    def to_dict(self) -> dict:
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp, "sender_name": self.sender_name}
+
+    def __repr__(self) -> str:
+        return f"MessageRecord(role={self.role!r}, content={self.content!r}, sender_name={self.sender_name!r})"
+
+
+class ContextCache:
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._rings: dict[str, deque[MessageRecord]] = {}
+        # Conversations whose ring holds their whole history (fewer rows than capacity)
+        self._complete: set[str] = set()
+
+        # Stats for /status
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self._rings
+
+    def load(self, conversation_id: str, records: list[MessageRecord], complete: bool):
+        """Replace a conversation's ring with its newest records from SQLite, oldest first."""
+        self._rings[conversation_id] = deque(records, maxlen=self.capacity)
+        if complete:
+            self._complete.add(conversation_id)
+        else:
+            self._complete.discard(conversation_id)
+
+    def append(self, conversation_id: str, records: list[MessageRecord]):
+        """Write-through for new messages. Conversations not yet loaded are left to their first read."""
+        ring = self._rings.get(conversation_id)
+        if ring is not None:
+            ring.extend(records)
+
+    def recent(self, conversation_id: str, limit: int) -> list[MessageRecord] | None:
+        """The last `limit` records, oldest first, or None if the ring can't answer."""
+        ring = self._rings.get(conversation_id)
+        if ring is None or (limit > len(ring) and not self._holds_all(conversation_id, ring)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if limit >= len(ring):
+            return list(ring)
+        return [ring[i] for i in range(len(ring) - limit, len(ring))]
+
+    def _holds_all(self, conversation_id: str, ring: deque) -> bool:
+        return conversation_id in self._complete and len(ring) < self.capacity
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "conversations": len(self._rings),
+            "records": sum(len(ring) for ring in self._rings.values()),
+            "capacity_per_conversation": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,158 @@
+"""
+DOM Actions — deterministic selector-based browser steps with LLM fallback.
+
+Most UI steps the agents take hit elements that are always in the same
+place (search box, Add button, message input). Instead of asking an LLM
+agent to find them, each step first tries a direct CDP action against a
+CSS selector and only falls back to a browser_use.Agent task when the
+selector misses. Hit/miss counts are kept per step for /status.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+from browser_use import Agent, BrowserSession
+
+from core.step_logger import log_step, StepType
+from core.waits import DEFAULT_WAIT, WaitPolicy, wait_until
+
+logger = logging.getLogger(__name__)
+
+# Per-step counters shared by every DOMActions instance: {"Agent.step": {"hit": n, "miss": n}}
+_step_stats: dict[str, dict[str, int]] = defaultdict(lambda: {"hit": 0, "miss": 0})
+
+
+def get_step_stats() -> dict[str, dict[str, int]]:
+    """Snapshot of selector hit/miss counts per step."""
+    return {step: dict(counts) for step, counts in _step_stats.items()}
+
+
+# Find the first element matching selector (optionally containing text), or null
+_FIND_JS = """(selector, text) => {
+    const wanted = (text || '').trim().toLowerCase();
+    for (const el of document.querySelectorAll(selector)) {
+        if (!wanted || (el.textContent || '').trim().toLowerCase().includes(wanted)) return el;
+    }
+    return null;
+}"""
+
+_CLICK_JS = f"""(selector, text) => {{
+    const el = ({_FIND_JS})(selector, text);
+    if (!el) return false;
+    el.scrollIntoView({{block: 'center'}});
+    el.click();
+    return true;
+}}"""
+
+_EXISTS_JS = f"""(selector, text) => Boolean(({_FIND_JS})(selector, text))"""
+
+# React controlled inputs ignore a plain .value assignment; go through the
+# native setter and fire an input event so onChange sees the new value.
+_TYPE_JS = """(selector, value) => {
+    const el = document.querySelector(selector);
+    if (!el) return false;
+    el.focus();
+    const proto = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, value);
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+    return true;
+}"""
+
+
+class DOMActions:
+    """Selector-based actions on the agent's current page, with browser_use.Agent fallback."""
+
+    def __init__(self, agent_name: str, browser_session: BrowserSession, llm):
+        self.agent_name = agent_name
+        self.browser_session = browser_session
+        self.llm = llm
+
+    async def _page(self):
+        """Current page, starting the browser on first use."""
+        if not self.browser_session.is_cdp_connected:
+            await self.browser_session.start()
+        return await self.browser_session.must_get_current_page()
+
+    async def goto(self, url: str):
+        """Navigate the current tab to url."""
+        if not self.browser_session.is_cdp_connected:
+            await self.browser_session.start()
+        await self.browser_session.navigate_to(url)
+
+    async def evaluate(self, js: str, *args) -> str:
+        """Run an arrow-function snippet on the current page; returns its string result."""
+        page = await self._page()
+        return await page.evaluate(js, *args)
+
+    async def exists(self, selector: str, text: str | None = None) -> bool:
+        return (await self.evaluate(_EXISTS_JS, selector, text or "")) == "True"
+
+    async def click(self, selector: str, text: str | None = None) -> bool:
+        """Click the first element matching selector (and containing text, if given)."""
+        return (await self.evaluate(_CLICK_JS, selector, text or "")) == "True"
+
+    async def type(self, selector: str, value: str) -> bool:
+        """Set an input's value the way a user typing it would."""
+        return (await self.evaluate(_TYPE_JS, selector, value)) == "True"
+
+    async def press_enter(self):
+        page = await self._page()
+        await page.press("Enter")
+
+    async def wait_for_selector(self, selector: str, text: str | None = None, timeout: float = 5.0) -> bool:
+        """Wait until an element matching selector (and text) exists."""
+        return await wait_until(
+            lambda: self.exists(selector, text),
+            f"{selector}" + (f" containing '{text}'" if text else ""),
+            policy=WaitPolicy(timeout=timeout),
+        )
+
+    async def wait_for_js(self, predicate_js: str, description: str, *args, policy: WaitPolicy = DEFAULT_WAIT) -> bool:
+        """Wait until a JS predicate on the page returns true; logs how long it took."""
+
+        async def check() -> bool:
+            return (await self.evaluate(predicate_js, *args)) == "True"
+
+        return await wait_until(check, description, agent=self.agent_name, policy=policy)
+
+    async def wait_for_url(self, fragment: str, description: str, policy: WaitPolicy = DEFAULT_WAIT) -> bool:
+        """Wait until the current URL contains fragment; logs how long it took."""
+
+        async def check() -> bool:
+            return fragment in await self.browser_session.get_current_page_url()
+
+        return await wait_until(check, description, agent=self.agent_name, policy=policy)
+
+    def record_step(self, step: str, hit: bool):
+        """Count a selector hit/miss for steps that handle their own fallback."""
+        _step_stats[f"{self.agent_name}.{step}"]["hit" if hit else "miss"] += 1
+
+    async def run_step(self, step: str, action: Callable[[], Awaitable[bool]], fallback_task: str) -> bool:
+        """
+        Run a deterministic action; if it misses (returns False or raises),
+        run fallback_task through a browser_use.Agent instead.
+
+        Returns True if the selector path handled the step.
+        """
+        try:
+            hit = await action()
+        except Exception as e:
+            logger.warning(f"[{self.agent_name}] Selector step '{step}' raised: {e}")
+            hit = False
+
+        self.record_step(step, hit)
+        if hit:
+            return True
+
+        await log_step(self.agent_name, StepType.REASON, f"Selector miss on step '{step}', falling back to LLM browser agent")
+        logger.info(f"[{self.agent_name}] Selector miss on '{step}', running LLM fallback")
+        fallback_agent = Agent(
+            task=fallback_task,
+            llm=self.llm,
+            browser_session=self.browser_session,
+            use_judge=False,
+        )
+        await fallback_agent.run()
+        return False
@@ -4,9 +4,12 @@ import logging
 from openai import AsyncOpenAI
 
 from config import config
+from core import text_match
+from core.context_cache import MessageRecord
+from core.llm_cache import LLMCache
 from core.step_logger import log_step, StepType
 from core.supermemory import SuperMemory
-from models.schemas import ChatMessage, IntentResult
+from models.schemas import IntentResult
 from prompts.girlfriend import build_system_prompt
 
 logger = logging.getLogger(__name__)
@@ -16,10 +19,24 @@ class IntentDetector:
     """Detects user intent from conversation history using LLM structured output.
     Incorporates SuperMemory for personality matching."""
 
-    def __init__(self, supermemory: SuperMemory):
+    # Food decision pre-filter: options scoring under MIN_MATCH don't count as a
+    # name match; skip the LLM when only one option matches, or the best scores at
+    # least CLEAR_WIN and beats the runner-up by CLEAR_MARGIN; otherwise only the
+    # top SHORTLIST candidates go to the LLM
+    MIN_MATCH = 0.3
+    CLEAR_WIN = 0.8
+    CLEAR_MARGIN = 0.2
+    SHORTLIST = 5
+
+    def __init__(self, supermemory: SuperMemory, cache: LLMCache | None = None):
         self.client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
         self.model = config.LLM_MODEL
         self.supermemory = supermemory
+        self.cache = cache  # memoized food decisions
+
+        # Food decision stats for /status
+        self.decisions = 0
+        self.llm_avoided = 0
 
         # Build the system prompt with supermemory + initial instruction
         self.system_prompt = build_system_prompt(
@@ -27,7 +44,7 @@ class IntentDetector:
             initial_instruction=config.INITIAL_INSTRUCTION,
         )
 
-    async def detect(self, messages: list[ChatMessage]) -> IntentResult:
+    async def detect(self, messages: list[MessageRecord]) -> IntentResult:
         """Analyze conversation and return structured intent + reply matching user's style."""
         conversation_text = "\n".join(
             f"{msg.sender_name or msg.role}: {msg.content}" for msg in messages
@@ -120,17 +137,51 @@ class IntentDetector:
             return "haan bro, baad mein baat karta hoon"
 
     async def decide_food_option(self, options: list[dict], requested_item: str) -> dict:
-        """Pick the best food option from a list using LLM. Respects price cap."""
+        """Pick the best food option from a list. Respects price cap.
+        Ranks options by price and name match first; the LLM only breaks close calls."""
         from prompts.decision import DECISION_SYSTEM_PROMPT
 
         price_cap = self.supermemory.get_price_cap()
-
+        self.decisions += 1
+
+        shortlist = self._rank_food_options(options, requested_item, price_cap)
+        matched = bool(shortlist)
+        if not matched:
+            # No name match ("coke" vs "Coca-Cola Soft Drink"): the LLM judges every affordable option
+            shortlist = self._rank_food_options(options, requested_item, price_cap, min_score=0.0)
+        if not shortlist:
+            await log_step("IntentDetector", StepType.DECIDE, f"All {len(options)} options are over budget or unpriced, defaulting to cheapest", f"budget=₹{price_cap}")
+            self.llm_avoided += 1
+            prices = [self._option_price(o) for o in options]
+            cheapest = min(range(len(options)), key=lambda i: (prices[i] is None, prices[i] or 0), default=0)
+            return {"chosen_index": cheapest, "reason": f"Everything is over ₹{price_cap}, picked the cheapest"}
+
+        best_score, best_index = shortlist[0]
+        runner_up = shortlist[1][0] if len(shortlist) > 1 else 0.0
+        if matched and (len(shortlist) == 1 or (best_score >= self.CLEAR_WIN and best_score - runner_up >= self.CLEAR_MARGIN)):
+            self.llm_avoided += 1
+            chosen_name = options[best_index].get("name", "Unknown")
+            reason = f"Best match for '{requested_item}' within ₹{price_cap} (score {best_score:.2f} vs {runner_up:.2f})"
+            await log_step("IntentDetector", StepType.DECIDE, f"Picked '{chosen_name}' (index {best_index}) without LLM", f"reason={reason}, llm_avoided={self.llm_avoided}/{self.decisions}")
+            return {"chosen_index": best_index, "reason": reason}
+
+        # Same craving, same options, same budget as before: reuse that answer
+        if self.cache:
+            cached = await self.cache.get_decision(requested_item, options, price_cap)
+            if cached:
+                self.llm_avoided += 1
+                chosen_name = options[cached["chosen_index"]].get("name", "Unknown")
+                await log_step("IntentDetector", StepType.DECIDE, f"Picked '{chosen_name}' (index {cached['chosen_index']}) from decision cache", f"reason={cached['reason']}, llm_avoided={self.llm_avoided}/{self.decisions}")
+                return cached
+
+        # LLM sees only the shortlist, best match first; map its answer back to the original index
+        candidates = [index for _, index in shortlist[:self.SHORTLIST]]
         options_text = "\n".join(
-            f"{i}. {opt.get('name', 'Unknown')} - {opt.get('price', 'N/A')}"
-            for i, opt in enumerate(options)
+            f"{i}. {options[index].get('name', 'Unknown')} - {options[index].get('price', 'N/A')}"
+            for i, index in enumerate(candidates)
         )
 
-        await log_step("IntentDetector", StepType.REASON, f"Evaluating {len(options)} food options for '{requested_item}'", f"budget=₹{price_cap}")
+        await log_step("IntentDetector", StepType.REASON, f"Evaluating {len(candidates)} of {len(options)} food options for '{requested_item}'", f"budget=₹{price_cap}, top_score={best_score:.2f}, runner_up={runner_up:.2f}")
 
         try:
             response = await self.client.chat.completions.create(
@@ -149,12 +200,52 @@ class IntentDetector:
             raw = response.choices[0].message.content
             logger.info(f"Decision LLM raw response: {raw}")
             decision = json.loads(raw)
-            chosen_idx = decision.get("chosen_index", 0)
-            chosen_name = options[chosen_idx].get("name", "Unknown") if chosen_idx < len(options) else "Unknown"
-            await log_step("IntentDetector", StepType.DECIDE, f"Picked '{chosen_name}' (index {chosen_idx})", f"reason={decision.get('reason', 'N/A')}")
+            picked = decision.get("chosen_index", 0)
+            if not isinstance(picked, int) or not 0 <= picked < len(candidates):
+                picked = 0
+            decision["chosen_index"] = candidates[picked]
+            chosen_name = options[candidates[picked]].get("name", "Unknown")
+            await log_step("IntentDetector", StepType.DECIDE, f"Picked '{chosen_name}' (index {candidates[picked]})", f"reason={decision.get('reason', 'N/A')}")
+            if self.cache:
+                await self.cache.set_decision(requested_item, options, price_cap, decision)
             return decision
 
         except Exception as e:
-            await log_step("IntentDetector", StepType.EVENT, "Food decision failed, defaulting to first option", f"error={str(e)}")
+            await log_step("IntentDetector", StepType.EVENT, "Food decision failed, defaulting to best ranked option", f"error={str(e)}")
             logger.error(f"Food decision failed: {e}")
-            return {"chosen_index": 0, "reason": "Defaulting to first option"}
+            return {"chosen_index": best_index, "reason": "Defaulting to best ranked option"}
+
+    def _rank_food_options(
+        self, options: list[dict], requested_item: str, price_cap: int, min_score: float | None = None
+    ) -> list[tuple[float, int]]:
+        """
+        [(score, index)] for priced options within the price cap scoring at least
+        min_score (MIN_MATCH by default), best name match first (cheaper wins
+        ties). Options without a readable price are left out.
+        """
+        if min_score is None:
+            min_score = self.MIN_MATCH
+        scores = text_match.rank(requested_item, [o.get("name", "") for o in options])
+        prices = [self._option_price(o) for o in options]
+        ranked = [
+            (score, index)
+            for index, (score, price) in enumerate(zip(scores, prices))
+            if price is not None and price <= price_cap and score >= min_score
+        ]
+        ranked.sort(key=lambda r: (-r[0], prices[r[1]]))
+        return ranked
+
+    @staticmethod
+    def _option_price(option: dict) -> float | None:
+        """Rupee price of an option: price_paise if present, else parsed from "₹1,299.00"."""
+        paise = option.get("price_paise")
+        if paise is None:
+            paise = text_match.parse_paise(option.get("price", ""))
+        return None if paise is None else paise / 100
+
+    def decision_stats(self) -> dict:
+        return {
+            "decisions": self.decisions,
+            "llm_avoided": self.llm_avoided,
+            "llm_avoided_rate": round(self.llm_avoided / self.decisions, 3) if self.decisions else None,
+        }
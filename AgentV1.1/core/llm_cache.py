@@ -0,0 +1,113 @@
+"""
+LLM Cache — memoized fallback search terms and food decisions.
+
+Both calls sit on the order path and give the same answer for the same
+craving, so their results are kept in SQLite (Memory.llm_cache) keyed on
+the normalized item text:
+
+    fallback:  item                                  → search term
+    decision:  (item, options fingerprint, price cap) → chosen product name
+
+Entries expire after LLM_CACHE_TTL, the least recently used are evicted
+past LLM_CACHE_MAX_ENTRIES per kind, and everything written under an
+older supermemory.md is ignored once the file changes.
+"""
+
+import hashlib
+import json
+import logging
+
+from config import config
+from core import text_match
+from core.memory import Memory
+from core.supermemory import SuperMemory
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCache:
+    """Persistent cache for BlinkItAgent / IntentDetector LLM answers."""
+
+    def __init__(
+        self,
+        memory: Memory,
+        supermemory: SuperMemory,
+        ttl: float = config.LLM_CACHE_TTL,
+        max_entries: int = config.LLM_CACHE_MAX_ENTRIES,
+    ):
+        self.memory = memory
+        self.supermemory = supermemory
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # Stats for /status
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(item: str) -> str:
+        """Word-level normal form, so "Chocolates!!" and "chocolate" share an entry."""
+        return " ".join(text_match.tokens(item))
+
+    @staticmethod
+    def options_fingerprint(options: list[dict]) -> str:
+        """Same products at the same prices → same fingerprint, regardless of order."""
+        listing = sorted((str(o.get("name", "")), str(o.get("price", ""))) for o in options)
+        return hashlib.sha1(json.dumps(listing).encode()).hexdigest()[:16]
+
+    async def get_fallback_term(self, item: str) -> str | None:
+        return await self._get("fallback", self.normalize(item))
+
+    async def set_fallback_term(self, item: str, term: str):
+        await self._set("fallback", self.normalize(item), term)
+
+    async def get_decision(self, item: str, options: list[dict], price_cap: int) -> dict | None:
+        """Cached decision re-pointed at the chosen product's index in this options list."""
+        raw = await self._get("decision", self._decision_key(item, options, price_cap))
+        if raw is None:
+            return None
+        decision = json.loads(raw)
+        for index, option in enumerate(options):
+            if option.get("name") == decision.get("chosen_name"):
+                return {"chosen_index": index, "reason": decision.get("reason", "")}
+        return None
+
+    async def set_decision(self, item: str, options: list[dict], price_cap: int, decision: dict):
+        index = decision.get("chosen_index")
+        if not isinstance(index, int) or not 0 <= index < len(options):
+            return
+        value = json.dumps({"chosen_name": options[index].get("name"), "reason": decision.get("reason", "")})
+        await self._set("decision", self._decision_key(item, options, price_cap), value)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+    # ── internals ─────────────────────────────────────────────
+
+    def _decision_key(self, item: str, options: list[dict], price_cap: int) -> str:
+        return f"{self.normalize(item)}|{self.options_fingerprint(options)}|{price_cap}"
+
+    async def _get(self, kind: str, key: str) -> str | None:
+        self.supermemory.reload_if_changed()
+        try:
+            value = await self.memory.cache_get(kind, key, self.supermemory.fingerprint, self.ttl)
+        except Exception as e:
+            logger.warning(f"[LLMCache] Lookup failed for {kind} '{key}': {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logger.info(f"[LLMCache] {kind} hit for '{key}'")
+        return value
+
+    async def _set(self, kind: str, key: str, value: str):
+        try:
+            await self.memory.cache_set(kind, key, value, self.supermemory.fingerprint, self.max_entries)
+        except Exception as e:
+            logger.warning(f"[LLMCache] Could not store {kind} '{key}': {e}")
@@ -1,26 +1,296 @@
+import asyncio
 import json
 import logging
 import os
-from datetime import datetime
+import re
+import sqlite3
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
 from typing import Optional
 
 import aiosqlite
 
-from models.schemas import ChatMessage
+from config import config
+from core.context_cache import ContextCache, MessageRecord
 
 logger = logging.getLogger(__name__)
 
+# Applied once when the shared connection opens. WAL lets reads run alongside a
+# write and turns each commit into an append; synchronous=NORMAL keeps commits
+# durable across app crashes (only power loss can drop the last few).
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",  # KiB of page cache
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept on the connection
+SCHEMA_VERSION = 2  # PRAGMA user_version once init_db's migrations have run
+SNIPPET_MARKS = ("<mark>", "</mark>")  # around matched terms in search snippets
+SNIPPET_TOKENS = 12  # words of context per snippet
+
+# Full-text indexes over conversations.message and agent_logs input/output. They are
+# external-content FTS5 tables (the text lives only in the base table) kept in sync by
+# triggers, so every write path — including write-behind flushes and compaction — updates them.
+_FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+        message, content='conversations', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_insert AFTER INSERT ON conversations BEGIN
+        INSERT INTO conversations_fts (rowid, message) VALUES (new.id, new.message);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_delete AFTER DELETE ON conversations BEGIN
+        INSERT INTO conversations_fts (conversations_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_update AFTER UPDATE OF message ON conversations BEGIN
+        INSERT INTO conversations_fts (conversations_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        INSERT INTO conversations_fts (rowid, message) VALUES (new.id, new.message);
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS agent_logs_fts USING fts5(
+        input_data, output_data, content='agent_logs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS agent_logs_fts_insert AFTER INSERT ON agent_logs BEGIN
+        INSERT INTO agent_logs_fts (rowid, input_data, output_data) VALUES (new.id, new.input_data, new.output_data);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS agent_logs_fts_delete AFTER DELETE ON agent_logs BEGIN
+        INSERT INTO agent_logs_fts (agent_logs_fts, rowid, input_data, output_data)
+            VALUES ('delete', old.id, old.input_data, old.output_data);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS agent_logs_fts_update AFTER UPDATE OF input_data, output_data ON agent_logs BEGIN
+        INSERT INTO agent_logs_fts (agent_logs_fts, rowid, input_data, output_data)
+            VALUES ('delete', old.id, old.input_data, old.output_data);
+        INSERT INTO agent_logs_fts (rowid, input_data, output_data) VALUES (new.id, new.input_data, new.output_data);
+    END""",
+)
+
+# Errors caused by a buffered row itself (constraint, bad binding): the batch is retried
+# one row at a time and those rows are dropped. Anything else keeps the batch queued,
+# for at most FLUSH_MAX_ATTEMPTS consecutive failed flushes.
+_ROW_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError)
+FLUSH_MAX_ATTEMPTS = 5
+
+# Inserts that may sit in the write-behind buffer
+_BUFFERED_INSERTS = {
+    "conversations": (
+        "INSERT INTO conversations (role, message, sender_name, timestamp, conversation_id)"
+        " VALUES (?, ?, ?, ?, ?)"
+    ),
+    "agent_logs": (
+        "INSERT INTO agent_logs (agent_name, action, input_data, output_data, status, timestamp)"
+        " VALUES (?, ?, ?, ?, ?, ?)"
+    ),
+}
+
 
 class Memory:
-    """SQLite-backed conversation history and user state."""
+    """
+    SQLite-backed conversation history and user state.
+
+    Keeps one long-lived connection (opened on first use, closed by close())
+    rather than connecting per call, so prepared statements are reused and
+    every write doesn't pay for an open + journal setup. Writes go through
+    _transaction(), which serializes them so multi-statement writes from
+    concurrent tasks never interleave.
+
+    Conversation messages and agent logs are write-behind: save_message /
+    log_action queue the row and return, and a background task commits the
+    queue in one transaction every `flush_interval` seconds or once
+    `flush_rows` are pending. Any other write, any read of those tables and
+    close() commit the queue first, in a transaction of its own, so reads
+    see their own writes while a row that can't be written (dropped, see
+    _ROW_ERRORS) never fails a critical write (say, marking a message
+    handled). Pass durable=True to commit before returning.
+
+    Messages are partitioned by conversation_id and indexed on
+    (conversation_id, id), so recent context stays an index range scan
+    however long the process runs. compact() moves rows past the retention
+    window into *_archive tables.
 
-    def __init__(self, db_path: str):
+    Recent context per conversation is served from a ContextCache (ring of
+    the newest `context_size` messages), written through by save_messages.
+
+    search() / search_logs() run ranked FTS5 queries over the live
+    (unarchived) messages and logs.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        flush_interval: float = config.WRITE_BEHIND_INTERVAL,
+        flush_rows: int = config.WRITE_BEHIND_MAX_ROWS,
+        context_size: int = config.CONTEXT_CACHE_SIZE,
+    ):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.flush_interval = flush_interval
+        self.flush_rows = max(1, flush_rows)
+        self._db: aiosqlite.Connection | None = None
+        self._open_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._pending: list[tuple[str, tuple]] = []  # (table, row) in arrival order
+        self._flush_now = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self.context = ContextCache(context_size)
+
+        # Stats for /status
+        self.rows_buffered = 0
+        self.flushes = 0
+        self.largest_flush = 0
+        self.flush_errors = 0
+        self.rows_dropped = 0
+        self._flush_failures = 0  # consecutive failed flushes of the current queue
+        self.last_compaction: dict = {}
+
+    async def _connection(self) -> aiosqlite.Connection:
+        """The shared connection, opened with PRAGMAS on first use."""
+        if self._db is None:
+            async with self._open_lock:
+                if self._db is None:
+                    db = await aiosqlite.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE)
+                    db.row_factory = aiosqlite.Row
+                    for pragma in PRAGMAS:
+                        await db.execute(pragma)
+                    self._db = db
+        return self._db
+
+    @asynccontextmanager
+    async def _transaction(self):
+        """
+        The shared connection under the write lock; commits on success, rolls
+        back on error. Buffered rows are committed first in their own
+        transaction; if that fails they stay queued and this write goes ahead.
+        """
+        db = await self._connection()
+        async with self._write_lock:
+            try:
+                await self._write_pending(db)
+            except Exception as e:
+                logger.error(f"[Memory] Write-behind flush before a write failed, {len(self._pending)} row(s) kept queued: {e}")
+            try:
+                yield db
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+
+    async def _write_pending(self, db: aiosqlite.Connection):
+        """
+        Commit the write-behind queue (caller holds the write lock). Rows that
+        can't be written are dropped; on any other failure the queue is kept
+        for the next flush and the error raised, until FLUSH_MAX_ATTEMPTS.
+        """
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            try:
+                for table, rows in groupby(pending, key=lambda entry: entry[0]):
+                    await db.executemany(_BUFFERED_INSERTS[table], [row for _, row in rows])
+            except _ROW_ERRORS as e:
+                await db.rollback()
+                logger.warning(f"[Memory] Write-behind batch of {len(pending)} row(s) rejected ({e}), retrying row by row")
+                pending = await self._insert_each(db, pending)
+            await db.commit()
+        except BaseException as e:
+            self.flush_errors += 1
+            self._flush_failures += 1
+            if self._flush_failures < FLUSH_MAX_ATTEMPTS or not isinstance(e, Exception):
+                self._pending[:0] = pending
+            else:
+                self.rows_dropped += len(pending)
+                self._flush_failures = 0
+                logger.error(f"[Memory] Dropping {len(pending)} buffered row(s) after {FLUSH_MAX_ATTEMPTS} failed flushes")
+            try:
+                await db.rollback()
+            except Exception:
+                pass
+            raise
+        self._flush_failures = 0
+        self.flushes += 1
+        self.largest_flush = max(self.largest_flush, len(pending))
+
+    async def _insert_each(self, db: aiosqlite.Connection, pending: list[tuple[str, tuple]]) -> list[tuple[str, tuple]]:
+        """Insert buffered rows one at a time, dropping the ones that fail on their own. Returns the rows written."""
+        written = []
+        for table, row in pending:
+            try:
+                await db.execute(_BUFFERED_INSERTS[table], row)
+            except _ROW_ERRORS as e:
+                self.rows_dropped += 1
+                logger.error(f"[Memory] Dropping buffered {table} row that can't be written ({e}): {str(row)[:200]}")
+                continue
+            written.append((table, row))
+        return written
+
+    def _buffer(self, table: str, rows: list[tuple]):
+        """Queue inserts for the next flush, starting the flush task if needed."""
+        self._pending.extend((table, row) for row in rows)
+        self.rows_buffered += len(rows)
+        if len(self._pending) >= self.flush_rows:
+            self._flush_now.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        # Runs while rows are queued; _buffer() starts it again after it drains
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"[Memory] Write-behind flush of {len(self._pending)} row(s) failed, will retry: {e}")
+
+    async def flush(self):
+        """Commit buffered conversation/log rows now."""
+        if self._pending:
+            db = await self._connection()
+            async with self._write_lock:
+                await self._write_pending(db)
+
+    @staticmethod
+    def _now() -> str:
+        """Current UTC time in SQLite's CURRENT_TIMESTAMP format (rows are stamped when queued, not flushed)."""
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    async def _fetchall(self, sql: str, params: tuple = ()) -> list[aiosqlite.Row]:
+        db = await self._connection()
+        return list(await db.execute_fetchall(sql, params))
 
-    async def init_db(self):
-        """Create tables if they don't exist."""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def close(self):
+        """Flush buffered rows and close the shared connection (checkpoints the WAL back into the database file)."""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"[Memory] Final flush failed, {len(self._pending)} buffered row(s) not written: {e}")
+        if self._db is None:
+            return
+        async with self._write_lock:
+            await self._db.close()
+            self._db = None
+        logger.info(f"Memory closed at {self.db_path}")
+
+    async def init_db(self, legacy_conversation_id: str = ""):
+        """
+        Create tables and indexes if they don't exist and migrate older
+        databases. Messages stored before conversations were partitioned
+        are assigned to `legacy_conversation_id`.
+        """
+        async with self._transaction() as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS conversations (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -48,41 +318,174 @@ class Memory:
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """)
-            await db.commit()
-        logger.info(f"Memory initialized at {self.db_path}")
-
-    async def save_message(self, role: str, message: str, sender_name: str = ""):
-        """Store a conversation message."""
-        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    version TEXT DEFAULT '',
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS processed_messages (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    conversation_id TEXT DEFAULT '',
+                    processed_at REAL NOT NULL
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    message_id TEXT NOT NULL UNIQUE,
+                    conversation_id TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    status TEXT DEFAULT 'pending',
+                    created_at REAL NOT NULL,
+                    sent_at REAL
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS pending_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_id TEXT NOT NULL UNIQUE,
+                    event_type TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS conversations_archive (
+                    id INTEGER PRIMARY KEY,
+                    conversation_id TEXT NOT NULL DEFAULT '',
+                    role TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    sender_name TEXT DEFAULT '',
+                    timestamp DATETIME,
+                    archived_at REAL NOT NULL
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS agent_logs_archive (
+                    id INTEGER PRIMARY KEY,
+                    agent_name TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    input_data TEXT DEFAULT '',
+                    output_data TEXT DEFAULT '',
+                    status TEXT DEFAULT 'ok',
+                    timestamp DATETIME,
+                    archived_at REAL NOT NULL
+                )
+            """)
+            for statement in _FTS_SCHEMA:
+                await db.execute(statement)
+            await self._migrate(db, legacy_conversation_id)
             await db.execute(
-                "INSERT INTO conversations (role, message, sender_name) VALUES (?, ?, ?)",
-                (role, message, sender_name),
+                "CREATE INDEX IF NOT EXISTS idx_conversations_conversation_id ON conversations (conversation_id, id)"
             )
-            await db.commit()
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_agent_logs_agent_name ON agent_logs (agent_name, timestamp)"
+            )
+        logger.info(f"Memory initialized at {self.db_path}")
 
-    async def get_recent_messages(self, limit: int = 20) -> list[ChatMessage]:
-        """Get the last N messages."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
+    @staticmethod
+    async def _migrate(db: aiosqlite.Connection, legacy_conversation_id: str):
+        """Bring an older database up to SCHEMA_VERSION (tracked in PRAGMA user_version)."""
+        async with db.execute("PRAGMA user_version") as cursor:
+            version = (await cursor.fetchone())[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        # 1: conversations partitioned by conversation_id
+        if version < 1:
+            async with db.execute("PRAGMA table_info(conversations)") as cursor:
+                columns = {row["name"] for row in await cursor.fetchall()}
+            if "conversation_id" not in columns:
+                await db.execute("ALTER TABLE conversations ADD COLUMN conversation_id TEXT NOT NULL DEFAULT ''")
+            if legacy_conversation_id:
+                await db.execute(
+                    "UPDATE conversations SET conversation_id = ? WHERE conversation_id = ''", (legacy_conversation_id,)
+                )
+
+        # 2: full-text indexes (the triggers only cover rows written from now on)
+        if version < 2:
+            await db.execute("INSERT INTO conversations_fts (conversations_fts) VALUES ('rebuild')")
+            await db.execute("INSERT INTO agent_logs_fts (agent_logs_fts) VALUES ('rebuild')")
+
+        await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        logger.info(f"[Memory] Migrated schema from version {version} to {SCHEMA_VERSION}")
+
+    async def save_message(
+        self, role: str, message: str, sender_name: str = "", conversation_id: str = "", durable: bool = False
+    ):
+        """Store a conversation message (write-behind unless durable)."""
+        await self.save_messages([(role, message, sender_name)], conversation_id, durable=durable)
+
+    async def save_messages(
+        self, messages: list[tuple[str, str, str]], conversation_id: str = "", durable: bool = False
+    ):
+        """Store several (role, message, sender_name) messages of one conversation, in order, in the same flush."""
+        if not messages:
+            return
+        now = self._now()
+        self._buffer("conversations", [(*message, now, conversation_id) for message in messages])
+        self.context.append(conversation_id, [MessageRecord(*message, now) for message in messages])
+        if durable:
+            await self.flush()
+
+    async def get_recent_messages(self, limit: int = 20, conversation_id: str | None = None) -> list[MessageRecord]:
+        """Get the last N messages of a conversation (across all of them if None), oldest first."""
+        if conversation_id is None:
+            await self.flush()
+            rows = await self._fetchall(
                 "SELECT role, message, sender_name, timestamp FROM conversations ORDER BY id DESC LIMIT ?",
                 (limit,),
             )
-            rows = await cursor.fetchall()
-            messages = [
-                ChatMessage(
-                    role=row["role"],
-                    content=row["message"],
-                    sender_name=row["sender_name"],
-                    timestamp=row["timestamp"] or "",
-                )
-                for row in reversed(rows)
+            return [self._record(row) for row in reversed(rows)]
+        cached = self.context.recent(conversation_id, limit)
+        if cached is not None:
+            return cached
+        records = await self._load_context(conversation_id, max(limit, self.context.capacity))
+        return records[-limit:] if limit > 0 else []
+
+    async def warm_context(self, conversation_ids: list[str]):
+        """Fill the context cache for these conversations from SQLite."""
+        for conversation_id in conversation_ids:
+            await self._load_context(conversation_id, self.context.capacity)
+        logger.info(f"[Memory] Context cache warmed for {len(conversation_ids)} conversation(s)")
+
+    async def _load_context(self, conversation_id: str, limit: int) -> list[MessageRecord]:
+        """
+        Read a conversation's newest `limit` messages into the context cache.
+        Runs under the write lock so no flush lands between the read and the
+        load; rows buffered meanwhile are newer than anything read, so they
+        go on the end.
+        """
+        async with self._transaction() as db:
+            rows = await db.execute_fetchall(
+                "SELECT role, message, sender_name, timestamp FROM conversations"
+                " WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+                (conversation_id, limit),
+            )
+            records = [self._record(row) for row in reversed(list(rows))]
+            records += [
+                MessageRecord(*row[:4])
+                for table, row in self._pending
+                if table == "conversations" and row[4] == conversation_id
             ]
-            return messages
+            self.context.load(conversation_id, records, complete=len(rows) < limit)
+        return records
 
-    async def get_conversation_context(self, limit: int = 10) -> str:
+    @staticmethod
+    def _record(row: aiosqlite.Row) -> MessageRecord:
+        return MessageRecord(row["role"], row["message"], row["sender_name"], row["timestamp"] or "")
+
+    async def get_conversation_context(self, limit: int = 10, conversation_id: str | None = None) -> str:
         """Get formatted conversation context string for LLM."""
-        messages = await self.get_recent_messages(limit)
+        messages = await self.get_recent_messages(limit, conversation_id)
         lines = []
         for msg in messages:
             name = msg.sender_name or msg.role
@@ -91,38 +494,285 @@ class Memory:
 
     async def get_state(self, key: str) -> Optional[str]:
         """Get a user state value."""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("SELECT value FROM user_state WHERE key = ?", (key,))
-            row = await cursor.fetchone()
-            return row[0] if row else None
+        rows = await self._fetchall("SELECT value FROM user_state WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
 
     async def set_state(self, key: str, value: str):
         """Set a user state value."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction() as db:
             await db.execute(
                 "INSERT OR REPLACE INTO user_state (key, value, updated_at) VALUES (?, ?, ?)",
                 (key, value, datetime.now().isoformat()),
             )
-            await db.commit()
 
     async def log_action(
-        self, agent_name: str, action: str, input_data: str = "", output_data: str = "", status: str = "ok"
+        self,
+        agent_name: str,
+        action: str,
+        input_data: str = "",
+        output_data: str = "",
+        status: str = "ok",
+        durable: bool = False,
     ):
-        """Log an agent action."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT INTO agent_logs (agent_name, action, input_data, output_data, status) VALUES (?, ?, ?, ?, ?)",
-                (agent_name, action, input_data, output_data, status),
-            )
-            await db.commit()
+        """Log an agent action (write-behind unless durable)."""
+        self._buffer("agent_logs", [(agent_name, action, input_data, output_data, status, self._now())])
+        if durable:
+            await self.flush()
 
-    async def get_recent_logs(self, limit: int = 50) -> list[dict]:
-        """Get recent agent logs."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
+    async def get_recent_logs(self, limit: int = 50, agent_name: str | None = None) -> list[dict]:
+        """Get recent agent logs (of one agent if given)."""
+        await self.flush()
+        if agent_name is None:
+            rows = await self._fetchall(
                 "SELECT agent_name, action, input_data, output_data, status, timestamp FROM agent_logs ORDER BY id DESC LIMIT ?",
                 (limit,),
             )
-            rows = await cursor.fetchall()
-            return [dict(row) for row in reversed(rows)]
+        else:
+            rows = await self._fetchall(
+                "SELECT agent_name, action, input_data, output_data, status, timestamp FROM agent_logs"
+                " WHERE agent_name = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+                (agent_name, limit),
+            )
+        return [dict(row) for row in reversed(rows)]
+
+    async def search(self, query: str, conversation_id: str | None = None, limit: int = 20) -> list[dict]:
+        """
+        Messages matching `query` (in one conversation if given), best match
+        first, each with a snippet that marks the matched terms. Every word
+        must match; a trailing * makes a word a prefix.
+        """
+        match = self._fts_query(query)
+        if not match:
+            return []
+        await self.flush()
+        sql = f"""
+            SELECT c.id, c.conversation_id, c.role, c.sender_name, c.timestamp, c.message,
+                   snippet(conversations_fts, 0, ?, ?, '…', {SNIPPET_TOKENS}) AS snippet,
+                   bm25(conversations_fts) AS rank
+            FROM conversations_fts JOIN conversations c ON c.id = conversations_fts.rowid
+            WHERE conversations_fts MATCH ?
+        """
+        params: list = [*SNIPPET_MARKS, match]
+        if conversation_id is not None:
+            sql += " AND c.conversation_id = ?"
+            params.append(conversation_id)
+        rows = await self._fetchall(sql + " ORDER BY rank LIMIT ?", (*params, limit))
+        return [self._search_hit(row) for row in rows]
+
+    async def search_logs(self, query: str, agent_name: str | None = None, limit: int = 20) -> list[dict]:
+        """Agent logs whose input or output matches `query`, best match first, with snippets of both."""
+        match = self._fts_query(query)
+        if not match:
+            return []
+        await self.flush()
+        sql = f"""
+            SELECT l.id, l.agent_name, l.action, l.status, l.timestamp,
+                   snippet(agent_logs_fts, 0, ?, ?, '…', {SNIPPET_TOKENS}) AS input_snippet,
+                   snippet(agent_logs_fts, 1, ?, ?, '…', {SNIPPET_TOKENS}) AS output_snippet,
+                   bm25(agent_logs_fts) AS rank
+            FROM agent_logs_fts JOIN agent_logs l ON l.id = agent_logs_fts.rowid
+            WHERE agent_logs_fts MATCH ?
+        """
+        params: list = [*SNIPPET_MARKS, *SNIPPET_MARKS, match]
+        if agent_name is not None:
+            sql += " AND l.agent_name = ?"
+            params.append(agent_name)
+        rows = await self._fetchall(sql + " ORDER BY rank LIMIT ?", (*params, limit))
+        return [self._search_hit(row) for row in rows]
+
+    @staticmethod
+    def _fts_query(text: str) -> str:
+        """Free text → FTS5 query: each word quoted (so punctuation can't break the syntax) and ANDed."""
+        return " ".join(f'"{word}"{prefix}' for word, prefix in re.findall(r"(\w+)(\*?)", text))
+
+    @staticmethod
+    def _search_hit(row: aiosqlite.Row) -> dict:
+        hit = dict(row)
+        hit["score"] = round(-hit.pop("rank"), 4)  # bm25 is lower-is-better; flip so higher = more relevant
+        return hit
+
+    async def compact(self, retention_days: float, keep_per_conversation: int) -> dict:
+        """
+        Move conversation messages and agent logs older than `retention_days`
+        into the archive tables, always keeping each conversation's newest
+        `keep_per_conversation` messages. Returns how many rows moved.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+        now = time.time()
+        started = time.perf_counter()
+        async with self._transaction() as db:
+            old_messages = """
+                SELECT id FROM (
+                    SELECT id, timestamp,
+                           ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY id DESC) AS newer
+                    FROM conversations
+                ) WHERE newer > ? AND timestamp < ?
+            """
+            cursor = await db.execute(
+                f"""INSERT INTO conversations_archive
+                        (id, conversation_id, role, message, sender_name, timestamp, archived_at)
+                    SELECT id, conversation_id, role, message, sender_name, timestamp, ?
+                    FROM conversations WHERE id IN ({old_messages})""",
+                (now, keep_per_conversation, cutoff),
+            )
+            messages = cursor.rowcount
+            await db.execute(
+                f"DELETE FROM conversations WHERE id IN ({old_messages})", (keep_per_conversation, cutoff)
+            )
+            cursor = await db.execute(
+                """INSERT INTO agent_logs_archive
+                        (id, agent_name, action, input_data, output_data, status, timestamp, archived_at)
+                    SELECT id, agent_name, action, input_data, output_data, status, timestamp, ?
+                    FROM agent_logs WHERE timestamp < ?""",
+                (now, cutoff),
+            )
+            logs = cursor.rowcount
+            await db.execute("DELETE FROM agent_logs WHERE timestamp < ?", (cutoff,))
+            await db.execute("PRAGMA optimize")
+        self.last_compaction = {
+            "messages_archived": messages,
+            "logs_archived": logs,
+            "cutoff": cutoff,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        if messages or logs:
+            logger.info(f"[Memory] Archived {messages} message(s) and {logs} log(s) older than {cutoff}")
+        return self.last_compaction
+
+    async def get_processed_ids(self, limit: int) -> list[str]:
+        """The most recently handled chat message ids, oldest first."""
+        rows = await self._fetchall("SELECT id FROM processed_messages ORDER BY seq DESC LIMIT ?", (limit,))
+        return [row[0] for row in reversed(rows)]
+
+    async def mark_processed(self, conversation_id: str, message_ids: list[str], keep: int):
+        """Record chat message ids as handled, keeping only the newest `keep`."""
+        if not message_ids:
+            return
+        async with self._transaction() as db:
+            await self._insert_processed(db, conversation_id, message_ids, keep)
+
+    async def outbox_add(
+        self,
+        conversation_id: str,
+        contents: list[str],
+        handled_ids: list[str] | None = None,
+        keep: int = 0,
+        events: list[tuple[str, dict]] | None = None,
+    ) -> list[str]:
+        """
+        Queue replies and the (event_type, payload) events a turn raised, and
+        mark the messages they answer as handled, in one transaction. Returns
+        the chats.id each reply is to be inserted with.
+        """
+        now = time.time()
+        message_ids = [str(uuid.uuid4()) for _ in contents]
+        async with self._transaction() as db:
+            await db.executemany(
+                "INSERT INTO outbox (message_id, conversation_id, content, created_at) VALUES (?, ?, ?, ?)",
+                [(message_id, conversation_id, content, now) for message_id, content in zip(message_ids, contents)],
+            )
+            if events:
+                await db.executemany(
+                    "INSERT INTO pending_events (event_id, event_type, payload, created_at) VALUES (?, ?, ?, ?)",
+                    [(str(uuid.uuid4()), event_type, json.dumps(payload), now) for event_type, payload in events],
+                )
+            if handled_ids:
+                await self._insert_processed(db, conversation_id, handled_ids, keep)
+        return message_ids
+
+    async def pending_events(self) -> list[dict]:
+        """Events queued by outbox_add and not yet published, oldest first."""
+        rows = await self._fetchall("SELECT event_id, event_type, payload FROM pending_events ORDER BY seq")
+        return [{**dict(row), "payload": json.loads(row["payload"])} for row in rows]
+
+    async def event_published(self, event_id: str):
+        """Drop an event once it has been handed to the event bus."""
+        async with self._transaction() as db:
+            await db.execute("DELETE FROM pending_events WHERE event_id = ?", (event_id,))
+
+    async def outbox_pending(self) -> list[dict]:
+        """Replies queued but not yet confirmed sent, oldest first."""
+        rows = await self._fetchall(
+            "SELECT message_id, conversation_id, content FROM outbox WHERE status = 'pending' ORDER BY seq"
+        )
+        return [dict(row) for row in rows]
+
+    async def outbox_mark_sent(self, message_ids: list[str], keep: int = 1000):
+        """Mark replies as sent, keeping the newest `keep` sent rows for reference."""
+        if not message_ids:
+            return
+        async with self._transaction() as db:
+            await db.executemany(
+                "UPDATE outbox SET status = 'sent', sent_at = ? WHERE message_id = ?",
+                [(time.time(), message_id) for message_id in message_ids],
+            )
+            await db.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND seq <= (SELECT MAX(seq) FROM outbox) - ?", (keep,)
+            )
+
+    @staticmethod
+    async def _insert_processed(db: aiosqlite.Connection, conversation_id: str, message_ids: list[str], keep: int):
+        now = time.time()
+        await db.executemany(
+            "INSERT OR IGNORE INTO processed_messages (id, conversation_id, processed_at) VALUES (?, ?, ?)",
+            [(message_id, conversation_id, now) for message_id in message_ids],
+        )
+        if keep:
+            await db.execute(
+                "DELETE FROM processed_messages WHERE seq <= (SELECT MAX(seq) FROM processed_messages) - ?", (keep,)
+            )
+
+    async def cache_get(self, kind: str, key: str, version: str = "", ttl: float | None = None) -> Optional[str]:
+        """Cached LLM result, or None if missing, older than ttl seconds, or from another version."""
+        now = time.time()
+        rows = await self._fetchall(
+            "SELECT value, version, created_at FROM llm_cache WHERE kind = ? AND key = ?", (kind, key)
+        )
+        if not rows:
+            return None
+        value, row_version, created_at = rows[0]
+        async with self._transaction() as db:
+            if row_version != version or (ttl is not None and now - created_at > ttl):
+                await db.execute("DELETE FROM llm_cache WHERE kind = ? AND key = ?", (kind, key))
+                return None
+            await db.execute("UPDATE llm_cache SET last_used = ? WHERE kind = ? AND key = ?", (now, kind, key))
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "write_behind": {
+                "pending": len(self._pending),
+                "rows_buffered": self.rows_buffered,
+                "flushes": self.flushes,
+                "avg_rows_per_flush": round((self.rows_buffered - len(self._pending) - self.rows_dropped) / self.flushes, 2) if self.flushes else 0.0,
+                "largest_flush": self.largest_flush,
+                "flush_errors": self.flush_errors,
+                "rows_dropped": self.rows_dropped,
+            },
+            "retention": self.last_compaction,
+            "context_cache": self.context.stats(),
+        }
+
+    async def cache_set(self, kind: str, key: str, value: str, version: str = "", max_entries: int | None = None):
+        """Store an LLM result, evicting the least recently used entries of this kind past max_entries."""
+        now = time.time()
+        async with self._transaction() as db:
+            await db.execute(
+                "INSERT OR REPLACE INTO llm_cache (kind, key, value, version, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, key, value, version, now, now),
+            )
+            if max_entries is not None:
+                await db.execute(
+                    """DELETE FROM llm_cache WHERE kind = ? AND key NOT IN (
+                        SELECT key FROM llm_cache WHERE kind = ? ORDER BY last_used DESC LIMIT ?
+                    )""",
+                    (kind, kind, max_entries),
+                )
+
+    async def cache_clear(self, kind: str | None = None):
+        """Drop cached LLM results (all kinds if kind is None)."""
+        async with self._transaction() as db:
+            if kind is None:
+                await db.execute("DELETE FROM llm_cache")
+            else:
+                await db.execute("DELETE FROM llm_cache WHERE kind = ?", (kind,))
@@ -1,17 +1,25 @@
 import asyncio
 import logging
 import uuid
+from datetime import datetime
 
 from browser_use import BrowserSession
 
 from agents.blinkit_agent import BlinkItAgent
 from agents.whatsapp_agent import WhatsAppAgent
 from config import config
+from core.blinkit_client import BlinkItClient
+from core.browser_pool import BlinkItBrowserPool
+from core.chat_store import ChatStore
+from core.catalog import ProductCatalog
+from core.dom_actions import get_step_stats
 from core.intent import IntentDetector
+from core.llm_cache import LLMCache
 from core.memory import Memory
 from core.step_logger import log_step, log_session_start, log_session_end, StepType
 from core.supermemory import SuperMemory
 from events.bus import EventBus
+from models.schemas import OrderStatus
 
 logger = logging.getLogger(__name__)
 
@@ -27,16 +35,42 @@ class Orchestrator:
         self.event_bus = EventBus()
         self.memory = Memory(config.DB_PATH)
         self.supermemory = SuperMemory()
-        self.intent_detector = IntentDetector(supermemory=self.supermemory)
+        self.llm_cache = LLMCache(self.memory, self.supermemory)
+        self.intent_detector = IntentDetector(supermemory=self.supermemory, cache=self.llm_cache)
+
+        # Shared HTTP client for API-mode ordering (one connection pool, one login)
+        self.blinkit_client: BlinkItClient | None = BlinkItClient() if config.BLINKIT_MODE == "api" else None
+
+        # Warm logged-in BlinkIt browser sessions for browser-mode ordering
+        self.browser_pool: BlinkItBrowserPool | None = None
+        if config.BLINKIT_MODE == "browser" and config.BLINKIT_POOL_SIZE > 0:
+            self.browser_pool = BlinkItBrowserPool(login=self._login_pooled_session)
+        self._pool_task: asyncio.Task | None = None
+
+        # Local product catalog (uses the public product endpoints, so it works in either mode)
+        self.catalog: ProductCatalog | None = None
+        if config.CATALOG_ENABLED:
+            self.catalog = ProductCatalog(self.blinkit_client or BlinkItClient())
+        self._catalog_task: asyncio.Task | None = None
+        self._retention_task: asyncio.Task | None = None
+
+        # Shared async Supabase client for the WhatsApp clone's chats table
+        self.chat_store = ChatStore()
 
         self.whatsapp_agent: WhatsAppAgent | None = None
-        self.blinkit_agent: BlinkItAgent | None = None
 
         self._whatsapp_task: asyncio.Task | None = None
-        self._blinkit_task: asyncio.Task | None = None
         self._running = False
-        self.ordering_in_progress = False
-        self._order_queue: list[str] = []
+
+        # Concurrent orders: MAX_CONCURRENT_ORDERS workers drain the queue, each
+        # batch of orders running its own BlinkItAgent on its own browser session
+        self.orders: dict[str, OrderStatus] = {}
+        self._order_queue: asyncio.Queue[str] = asyncio.Queue()
+        self._order_workers: list[asyncio.Task] = []
+        self._order_tasks: dict[str, asyncio.Task] = {}
+        self._order_agents: dict[str, BlinkItAgent] = {}
+        self._cart_lock = asyncio.Lock()  # all orders share one BlinkIt account cart
+        self._batch_lock = asyncio.Lock()  # one worker at a time collects a batch
 
         # Unique run ID for grouping step logs per session
         self.run_id = uuid.uuid4().hex[:8]
@@ -47,8 +81,9 @@ class Orchestrator:
         await log_session_start(self.run_id)
         await log_step("Orchestrator", StepType.EVENT, "Session starting", f"run_id={self.run_id}", self.run_id)
 
-        # 1. Init memory
-        await self.memory.init_db()
+        # 1. Init memory (messages from before per-conversation storage belong to the target chat)
+        await self.memory.init_db(legacy_conversation_id=WhatsAppAgent.conversation_id_for(config.WHATSAPP_TARGET_ID))
+        self._retention_task = asyncio.create_task(self._retention_loop())
         logger.info("Memory initialized")
 
         # 2. Start event bus
@@ -62,6 +97,19 @@ class Orchestrator:
         )
         logger.info(f"Browser launched (headless={config.HEADLESS})")
 
+        # 3b. Warm the BlinkIt browser pool in the background
+        if self.browser_pool:
+            self._pool_task = asyncio.create_task(self.browser_pool.start())
+
+        # 3c. Build the product catalog in the background
+        if self.catalog:
+            self._catalog_task = asyncio.create_task(self.catalog.ensure_fresh())
+
+        # 3d. Start the order workers
+        self._order_workers = [
+            asyncio.create_task(self._order_worker(n)) for n in range(max(1, config.MAX_CONCURRENT_ORDERS))
+        ]
+
         # 4. Subscribe to events
         self.event_bus.subscribe("ORDER_REQUESTED", self._handle_order_request)
         self.event_bus.subscribe("ORDER_COMPLETED", self._handle_order_complete)
@@ -73,6 +121,7 @@ class Orchestrator:
             event_bus=self.event_bus,
             memory=self.memory,
             intent_detector=self.intent_detector,
+            chat_store=self.chat_store,
         )
 
         await self.whatsapp_agent.setup()
@@ -86,86 +135,221 @@ class Orchestrator:
         logger.info(f"BlinkeyIt URL: {config.BLINKIT_URL}")
 
     async def _handle_order_request(self, payload: dict):
-        """Spawn BlinkItAgent with its OWN browser session (separate from WhatsApp)."""
+        """Queue the order; a free worker picks it up and runs it concurrently with the others."""
         item = payload.get("item", "")
         if not item:
             logger.warning("ORDER_REQUESTED with no item")
             return
 
-        if self.ordering_in_progress:
-            self._order_queue.append(item)
-            await log_step("Orchestrator", StepType.EVENT, f"Order already in progress, queued '{item}'", f"queue_size={len(self._order_queue)}", self.run_id)
-            logger.info(f"Order in progress, queued '{item}' (queue size: {len(self._order_queue)})")
-            await self.memory.log_action("Orchestrator", "order_queued", item)
+        order = OrderStatus(order_id=payload.get("order_id") or uuid.uuid4().hex[:8], item=item)
+        self.orders[order.order_id] = order
+        self._prune_orders()
+        await self._order_queue.put(order.order_id)
+
+        running = len(self._order_tasks)
+        await log_step("Orchestrator", StepType.EVENT, f"Queued order {order.order_id} for '{item}'", f"queue_size={self._order_queue.qsize()}, running={running}", self.run_id)
+        logger.info(f"=== Order requested: {item} (order {order.order_id}, {running} running) ===")
+        await self.memory.log_action("Orchestrator", "order_requested", item, order.order_id, durable=True)
+
+    async def _order_worker(self, worker_id: int):
+        """Take batches of orders off the queue and run each to completion."""
+        while True:
+            async with self._batch_lock:
+                batch = await self._collect_batch()
+
+            items = ", ".join(o.item for o in batch)
+            logger.info(f"Order worker {worker_id} picked up {len(batch)} order(s): {items}")
+            task = asyncio.create_task(self._run_blinkit_batch(batch))
+            for order in batch:
+                self._order_tasks[order.order_id] = task
+            try:
+                # wait() rather than await: a cancelled order must not kill the worker
+                await asyncio.wait([task])
+            finally:
+                for order in batch:
+                    self._order_tasks.pop(order.order_id, None)
+
+    async def _collect_batch(self) -> list[OrderStatus]:
+        """
+        Wait for the next order, then keep taking orders that arrive within
+        ORDER_BATCH_WINDOW of it (up to ORDER_BATCH_MAX) so they share one checkout.
+        """
+        batch = [await self._take_order()]
+        if config.ORDER_BATCH_WINDOW <= 0:
+            return batch
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.ORDER_BATCH_WINDOW
+        while len(batch) < config.ORDER_BATCH_MAX:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._take_order(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Orders cancelled during the window are dropped
+        batch = [o for o in batch if o.status == "queued"] or await self._collect_batch()
+        if len(batch) > 1:
+            await log_step("Orchestrator", StepType.EVENT, f"Batched {len(batch)} orders into one checkout", f"items=[{', '.join(o.item for o in batch)}]", self.run_id)
+        return batch
+
+    async def _take_order(self) -> OrderStatus:
+        """Next order still waiting in the queue (skips ones cancelled while queued)."""
+        while True:
+            order_id = await self._order_queue.get()
+            self._order_queue.task_done()
+            order = self.orders.get(order_id)
+            if order is not None and order.status == "queued":
+                return order
+
+    async def _run_blinkit_batch(self, batch: list[OrderStatus]):
+        """Run one batch's BlinkIt flow on its own session, then return/cleanup the session."""
+        label = ", ".join(f"{o.order_id} ('{o.item}')" for o in batch)
+        for order in batch:
+            order.status = "running"
+            order.started_at = datetime.now()
+        await log_step("Orchestrator", StepType.EVENT, f"Spawning BlinkItAgent for {label}", "using separate browser session", self.run_id)
+
+        pooled = None
+        blinkit_session = None
+        succeeded = False
+        try:
+            # A SEPARATE browser session per batch so orders don't fight with WhatsApp
+            # or each other over navigation: a warm logged-in one from the pool when
+            # available, otherwise a fresh one (launched lazily — API mode only touches
+            # it when falling back to the browser flow)
+            if self.browser_pool:
+                pooled = await self.browser_pool.lease()
+                blinkit_session = pooled.session
+                logger.info(f"Orders {label}: leased warm browser session from BlinkIt pool")
+            else:
+                blinkit_session = BrowserSession(
+                    headless=config.HEADLESS,
+                    keep_alive=True,
+                )
+                logger.info(f"Orders {label}: created separate browser session for BlinkIt agent")
+
+            agent = BlinkItAgent(
+                browser_session=blinkit_session,
+                event_bus=self.event_bus,
+                memory=self.memory,
+                intent_detector=self.intent_detector,
+                api_client=self.blinkit_client,
+                logged_in=pooled is not None,
+                cart_lock=self._cart_lock,
+                catalog=self.catalog,
+                llm_cache=self.llm_cache,
+            )
+            for order in batch:
+                self._order_agents[order.order_id] = agent
+            succeeded = await agent.run_batch(batch)
+        except asyncio.CancelledError:
+            for order in batch:
+                if order.status == "running":
+                    self._finish_order(order, "cancelled", error="cancelled")
+                    await self.event_bus.publish("ORDER_FAILED", {"order_id": order.order_id, "item": order.item, "error": "cancelled"})
+            raise
+        except Exception as e:
+            logger.error(f"BlinkIt order task for {label} failed: {e}")
+            for order in batch:
+                if order.status == "running":
+                    await self.event_bus.publish("ORDER_FAILED", {"order_id": order.order_id, "item": order.item, "error": str(e)})
+        finally:
+            for order in batch:
+                self._order_agents.pop(order.order_id, None)
+
+            if pooled:
+                # A cancelled or failed flow may have stopped mid-page; don't hand that session out again
+                cancelled = any(o.status == "cancelled" for o in batch)
+                await self.browser_pool.release(pooled, healthy=succeeded and not cancelled)
+                logger.info(f"Orders {label}: browser session returned to pool")
+            elif blinkit_session:
+                # Kill the one-off BlinkIt browser session
+                try:
+                    await blinkit_session.kill()
+                    logger.info(f"Orders {label}: BlinkIt browser session closed")
+                except Exception:
+                    pass
+
+    async def cancel_order(self, order_id: str) -> bool:
+        """Cancel a queued or running order. Returns False if it's unknown or already finished."""
+        order = self.orders.get(order_id)
+        if order is None or order.status not in ("queued", "running"):
+            return False
+
+        await log_step("Orchestrator", StepType.EVENT, f"Cancelling order {order_id} ('{order.item}')", f"was={order.status}", self.run_id)
+        logger.info(f"Cancelling order {order_id}: {order.item} ({order.status})")
+        await self.memory.log_action("Orchestrator", "order_cancelled", order.item, order_id, durable=True)
+
+        task = self._order_tasks.get(order_id)
+        batch_mates = [
+            oid for oid, t in self._order_tasks.items()
+            if t is task and oid != order_id and self.orders[oid].status == "running"
+        ]
+        if task is not None and not batch_mates:
+            task.cancel()  # _run_blinkit_batch marks it cancelled and publishes ORDER_FAILED
+        elif task is not None:
+            # Batched with others: the agent skips it unless it's already in the cart, and
+            # reports which (outcome "cancelled", or "unknown" if it was ordered anyway)
+            order.cancel_requested = True
+        else:
+            # Still queued: the worker skips it when it comes off the queue
+            self._finish_order(order, "cancelled", error="cancelled")
+            await self.event_bus.publish("ORDER_FAILED", {"order_id": order_id, "item": order.item, "error": "cancelled"})
+        return True
+
+    def _finish_order(self, order: OrderStatus, status: str, chosen: str | None = None, error: str | None = None):
+        """Record an order's terminal state (first one wins)."""
+        if order.status not in ("queued", "running"):
             return
-
-        await self._start_order(item)
-
-    async def _start_order(self, item: str):
-        """Launch a BlinkIt order for the given item."""
-        self.ordering_in_progress = True
-        await log_step("Orchestrator", StepType.EVENT, f"Spawning BlinkItAgent to order '{item}'", "opening separate browser session", self.run_id)
-        logger.info(f"=== Order requested: {item} ===")
-        await self.memory.log_action("Orchestrator", "order_requested", item)
-
-        # Create a SEPARATE browser session for BlinkIt so it doesn't
-        # fight with WhatsApp over navigation
-        blinkit_session = BrowserSession(
-            headless=config.HEADLESS,
-            keep_alive=True,
-        )
-        logger.info("Created separate browser session for BlinkIt agent")
-
-        self.blinkit_agent = BlinkItAgent(
-            browser_session=blinkit_session,
+        order.status = status
+        order.chosen = chosen
+        order.error = error
+        order.finished_at = datetime.now()
+
+    def _prune_orders(self, keep: int = 50):
+        """Forget the oldest finished orders so the status map stays bounded."""
+        finished = [o for o in self.orders.values() if o.status not in ("queued", "running")]
+        for order in finished[:max(0, len(finished) - keep)]:
+            del self.orders[order.order_id]
+
+    async def _login_pooled_session(self, session: BrowserSession):
+        """Login callback for the browser pool: run BlinkItAgent's login flow on a new session."""
+        agent = BlinkItAgent(
+            browser_session=session,
             event_bus=self.event_bus,
             memory=self.memory,
             intent_detector=self.intent_detector,
         )
-
-        # Run BlinkIt ordering concurrently — WhatsApp keeps polling
-        self._blinkit_task = asyncio.create_task(
-            self._run_blinkit_order(item, blinkit_session)
-        )
-        logger.info(f"BlinkIt agent spawned for: {item} (separate browser, WhatsApp still active)")
-
-    async def _run_blinkit_order(self, item: str, blinkit_session: BrowserSession):
-        """Run the BlinkIt order flow, then cleanup session and process next queued order."""
-        try:
-            await self.blinkit_agent.run(item=item)
-        except Exception as e:
-            logger.error(f"BlinkIt order task failed: {e}")
-        finally:
-            self.ordering_in_progress = False
-
-            # Kill the BlinkIt browser session
-            try:
-                await blinkit_session.kill()
-                logger.info("BlinkIt browser session closed")
-            except Exception:
-                pass
-
-            # Process next queued order if any
-            if self._order_queue:
-                next_item = self._order_queue.pop(0)
-                logger.info(f"Processing next queued order: {next_item} (remaining: {len(self._order_queue)})")
-                await self._start_order(next_item)
+        await agent.setup()
 
     async def _handle_order_complete(self, payload: dict):
         """Log order completion."""
         item = payload.get("item", "")
         chosen = payload.get("chosen", item)
+        order = self.orders.get(payload.get("order_id") or "")
+        if order:
+            self._finish_order(order, "completed", chosen=chosen)
         await log_step("Orchestrator", StepType.EVENT, f"Order completed successfully for '{item}'", f"chosen_product={chosen}", self.run_id)
         logger.info(f"=== Order completed: {item} ===")
-        await self.memory.log_action("Orchestrator", "order_completed", item)
+        await self.memory.log_action("Orchestrator", "order_completed", item, durable=True)
 
     async def _handle_order_failed(self, payload: dict):
-        """Log order failure."""
+        """
+        Log order failure. outcome "unknown" (checkout sent but never confirmed, or
+        cancelled too late) and "cancelled" (dropped before checkout) set that status.
+        """
         item = payload.get("item", "")
         error = payload.get("error", "unknown")
+        order = self.orders.get(payload.get("order_id") or "")
+        if order:
+            outcome = payload.get("outcome")
+            self._finish_order(order, outcome if outcome in ("unknown", "cancelled") else "failed", error=error)
         await log_step("Orchestrator", StepType.EVENT, f"Order FAILED for '{item}'", f"error={error}", self.run_id)
         logger.error(f"=== Order failed: {item} | {error} ===")
-        await self.memory.log_action("Orchestrator", "order_failed", f"{item}: {error}", status="error")
+        await self.memory.log_action("Orchestrator", "order_failed", f"{item}: {error}", status="error", durable=True)
 
     async def stop(self):
         """Gracefully shut down everything."""
@@ -182,18 +366,44 @@ class Orchestrator:
             except asyncio.CancelledError:
                 pass
 
-        if self.blinkit_agent:
-            await self.blinkit_agent.teardown()
-        if self._blinkit_task and not self._blinkit_task.done():
-            self._blinkit_task.cancel()
-            try:
-                await self._blinkit_task
-            except asyncio.CancelledError:
-                pass
+        # Stop order workers, then cancel orders still running
+        for worker in self._order_workers:
+            worker.cancel()
+        await asyncio.gather(*self._order_workers, return_exceptions=True)
+        self._order_workers = []
+
+        for agent in list(self._order_agents.values()):
+            await agent.teardown()
+        running = list(self._order_tasks.values())
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
 
         # Stop event bus
         await self.event_bus.stop()
 
+        # Close pooled BlinkIt browsers
+        if self._pool_task and not self._pool_task.done():
+            self._pool_task.cancel()
+        if self.browser_pool:
+            await self.browser_pool.close()
+
+        # Close the BlinkIt HTTP connection pool(s)
+        if self._catalog_task and not self._catalog_task.done():
+            self._catalog_task.cancel()
+        if self.catalog and self.catalog.client is not self.blinkit_client:
+            await self.catalog.client.close()
+        if self.blinkit_client:
+            await self.blinkit_client.close()
+
+        # Close the Supabase HTTP connection pool
+        await self.chat_store.close()
+
+        # Flush buffered writes and close the SQLite connection
+        if self._retention_task and not self._retention_task.done():
+            self._retention_task.cancel()
+        await self.memory.close()
+
         # Close browser
         if self.browser_session:
             await self.browser_session.kill()
@@ -202,6 +412,15 @@ class Orchestrator:
         await log_session_end(self.run_id)
         logger.info("=== Orchestrator stopped ===")
 
+    async def _retention_loop(self):
+        """Archive old messages and logs now and every MEMORY_COMPACT_INTERVAL seconds."""
+        while True:
+            try:
+                await self.memory.compact(config.MEMORY_RETENTION_DAYS, config.MEMORY_KEEP_PER_CONVERSATION)
+            except Exception as e:
+                logger.error(f"Memory compaction failed: {e}")
+            await asyncio.sleep(config.MEMORY_COMPACT_INTERVAL)
+
     def get_status(self) -> dict:
         """Get current status of all agents."""
         status = {
@@ -209,10 +428,34 @@ class Orchestrator:
             "whatsapp_agent": {
                 "status": self.whatsapp_agent.status if self.whatsapp_agent else "not_created",
                 "action": self.whatsapp_agent.current_action if self.whatsapp_agent else None,
+                "ingest": self.whatsapp_agent.ingest_stats() if self.whatsapp_agent else None,
             },
-            "blinkit_agent": {
-                "status": self.blinkit_agent.status if self.blinkit_agent else "not_created",
-                "action": self.blinkit_agent.current_action if self.blinkit_agent else None,
+            "supabase": self.chat_store.stats(),
+            "memory": self.memory.stats(),
+            "orders": {
+                "max_concurrent": config.MAX_CONCURRENT_ORDERS,
+                "batch_window_s": config.ORDER_BATCH_WINDOW,
+                "queued": sum(1 for o in self.orders.values() if o.status == "queued"),
+                "running": len(self._order_tasks),
+                "items": self.get_orders(),
             },
+            "selector_steps": get_step_stats(),
+            "browser_pool": self.browser_pool.stats() if self.browser_pool else None,
+            "catalog": self.catalog.stats() if self.catalog else None,
+            "food_decisions": self.intent_detector.decision_stats(),
+            "llm_cache": self.llm_cache.stats(),
         }
         return status
+
+    def get_orders(self) -> list[dict]:
+        """State of every tracked order, oldest first."""
+        return [self._order_status(o) for o in self.orders.values()]
+
+    def _order_status(self, order: OrderStatus) -> dict:
+        """One order's state plus, while it runs, what its BlinkItAgent is doing."""
+        agent = self._order_agents.get(order.order_id)
+        return {
+            **order.model_dump(mode="json"),
+            "agent_status": agent.status if agent else None,
+            "action": agent.current_action if agent else None,
+        }
@@ -0,0 +1,78 @@
+"""
+Poll Scheduler — adaptive interval for polling Supabase.
+
+Right after activity (a new message, a reply we sent, an order event) the
+interval drops to `min_interval`; every poll that comes back empty
+multiplies it by `backoff` up to `max_interval`. Sleeps are jittered so
+several agents don't poll in lockstep, and `wake()` cuts the current
+sleep short. A quiet chat overnight ends up at one query a minute
+instead of one every few seconds.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+
+RATE_WINDOW = 300.0  # seconds of query history behind queries_per_min
+
+
+class PollScheduler:
+    def __init__(self, min_interval: float, max_interval: float, backoff: float = 2.0, jitter: float = 0.1):
+        self.min_interval = max(0.1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.backoff = max(1.0, backoff)
+        self.jitter = jitter
+        self.interval = self.min_interval
+        self._wake = asyncio.Event()
+        self._recent: deque[float] = deque()
+
+        # Stats for /status
+        self.queries = 0
+        self.wakeups = 0
+
+    def activity(self):
+        """Something happened in a chat — poll tightly again."""
+        self.interval = self.min_interval
+
+    def idle(self):
+        """A poll found nothing — back off."""
+        self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def wake(self):
+        """Poll now (and tightly from here on)."""
+        self.activity()
+        self._wake.set()
+
+    def record_query(self):
+        now = time.monotonic()
+        self.queries += 1
+        self._recent.append(now)
+        self._trim(now)
+
+    async def sleep(self):
+        """Sleep for the current (jittered) interval, or until woken."""
+        delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        try:
+            await asyncio.wait_for(self._wake.wait(), delay)
+            self.wakeups += 1
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        self._trim(now)
+        span = min(RATE_WINDOW, now - self._recent[0]) if self._recent else 0.0
+        return {
+            "interval_s": round(self.interval, 2),
+            "min_interval_s": self.min_interval,
+            "max_interval_s": self.max_interval,
+            "queries": self.queries,
+            "queries_per_min": round(len(self._recent) * 60 / max(span, self.interval, 1.0), 2),
+            "wakeups": self.wakeups,
+        }
+
+    def _trim(self, now: float):
+        while self._recent and now - self._recent[0] > RATE_WINDOW:
+            self._recent.popleft()
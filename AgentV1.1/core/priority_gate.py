@@ -0,0 +1,89 @@
+"""
+Priority Gate — a semaphore with a priority lane.
+
+Waiters are served lowest priority number first (FIFO within a priority),
+and `reserved` slots are only ever handed to priority-0 callers, so the
+target contact never queues behind a wall of other chats. Used to bound
+concurrent LLM calls and to serialize the shared browser UI.
+"""
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+
+PRIORITY_TARGET = 0
+PRIORITY_OTHER = 1
+
+
+class PriorityGate:
+    def __init__(self, limit: int, reserved: int = 0):
+        self.limit = max(1, limit)
+        self.reserved = max(0, min(reserved, self.limit - 1))
+        self._in_use = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+        # Stats for /status
+        self.acquired = 0
+        self.waited = 0
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_OTHER):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: int = PRIORITY_OTHER):
+        self.acquired += 1
+        if self._can_take(priority) and not self._waiter_ahead(priority):
+            self._in_use += 1
+            return
+
+        self.waited += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # granted just as we were cancelled
+            else:
+                future.cancel()
+                self._wake()
+            raise
+
+    def release(self):
+        self._in_use -= 1
+        self._wake()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "reserved_for_target": self.reserved,
+            "in_use": self._in_use,
+            "waiting": sum(1 for *_, f in self._waiters if not f.done()),
+            "acquired": self.acquired,
+            "waited": self.waited,
+        }
+
+    def _can_take(self, priority: int) -> bool:
+        free = self.limit - self._in_use
+        return free > (0 if priority == PRIORITY_TARGET else self.reserved)
+
+    def _waiter_ahead(self, priority: int) -> bool:
+        return any(p <= priority and not f.done() for p, _, f in self._waiters)
+
+    def _wake(self):
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._can_take(priority):
+                break
+            heapq.heappop(self._waiters)
+            self._in_use += 1
+            future.set_result(None)
@@ -0,0 +1,53 @@
+"""
+Processed IDs — the set of chats.id values the agent has already handled.
+
+A bounded, insertion-ordered set held in memory (O(1) membership, oldest
+evicted first) and mirrored to SQLite so a restart never handles the same
+message twice. Ids only need remembering for as long as a re-read could
+still return them, so the newest PROCESSED_IDS_MAX are plenty.
+"""
+
+import logging
+
+from core.memory import Memory
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessedIds:
+    def __init__(self, memory: Memory, capacity: int):
+        self.memory = memory
+        self.capacity = max(1, capacity)
+        self._ids: dict[str, None] = {}  # insertion-ordered set
+
+        # Stats for /status
+        self.duplicates = 0
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def load(self):
+        """Warm the set from SQLite (newest `capacity` ids)."""
+        self.remember(await self.memory.get_processed_ids(self.capacity))
+        logger.info(f"[ProcessedIds] Loaded {len(self._ids)} handled message id(s)")
+
+    def remember(self, message_ids: list[str]):
+        """Add ids already persisted elsewhere (e.g. with an outbox write)."""
+        for message_id in message_ids:
+            self._ids.pop(message_id, None)
+            self._ids[message_id] = None
+        while len(self._ids) > self.capacity:
+            del self._ids[next(iter(self._ids))]
+
+    async def add(self, conversation_id: str, message_ids: list[str]):
+        """Persist and remember ids handled without a reply."""
+        if not message_ids:
+            return
+        await self.memory.mark_processed(conversation_id, message_ids, keep=self.capacity)
+        self.remember(message_ids)
+
+    def stats(self) -> dict:
+        return {"size": len(self._ids), "capacity": self.capacity, "duplicates_skipped": self.duplicates}
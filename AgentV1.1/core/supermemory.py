@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 
@@ -16,6 +17,8 @@ class SuperMemory:
     def __init__(self):
         self.content: str = ""
         self.price_cap: int = 500  # Default ₹500
+        self.fingerprint: str = ""  # changes whenever the file content does
+        self._mtime: float | None = None
         self._load()
 
     def _load(self):
@@ -24,10 +27,14 @@ class SuperMemory:
         if not os.path.exists(path):
             logger.warning(f"SuperMemory file not found at {path}")
             self.content = "No supermemory configured. Chat naturally."
+            self.fingerprint = ""
+            self._mtime = None
             return
 
+        self._mtime = os.path.getmtime(path)
         with open(path, "r") as f:
             self.content = f.read()
+        self.fingerprint = hashlib.sha1(self.content.encode()).hexdigest()[:12]
 
         # Extract price cap if present
         for line in self.content.split("\n"):
@@ -53,3 +60,15 @@ class SuperMemory:
     def reload(self):
         """Reload supermemory from disk (for live updates)."""
         self._load()
+
+    def reload_if_changed(self) -> bool:
+        """Reload if supermemory.md was edited since the last load. Returns True if it was."""
+        path = config.SUPERMEMORY_PATH
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if mtime == self._mtime:
+            return False
+        old = self.fingerprint
+        self._load()
+        if self.fingerprint != old:
+            logger.info("SuperMemory changed on disk, reloaded")
+        return self.fingerprint != old
@@ -0,0 +1,64 @@
+"""
+Text Match — cheap, deterministic product-name matching.
+
+Shared by the product catalog and the food decision pre-filter: words
+are lowercased with a naive plural strip, and fuzzy matching uses padded
+character trigrams so "kitkat" / "icecream" still hit "KitKat" / "Ice Cream".
+Displayed prices are parsed here too, so every caller reads them the same way.
+"""
+
+import re
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_NOT_PRICE_RE = re.compile(r"[^\d.]")
+
+TOKEN_WEIGHT = 0.6
+TRIGRAM_WEIGHT = 0.4
+
+
+def tokens(text: str) -> list[str]:
+    """Lowercased words with a naive plural strip ("chocolates" → "chocolate")."""
+    words = _WORD_RE.findall(text.lower())
+    return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words]
+
+
+def trigrams(words: list[str] | set[str] | frozenset[str]) -> set[str]:
+    grams = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def score(token_hits: int, n_query_tokens: int, trigram_hits: int, n_query_trigrams: int) -> float:
+    """
+    Blend of exact word overlap and fuzzy trigram overlap, both measured as
+    the share of the *query* found in the name, so long product names
+    aren't penalised for their extra words. 0.0 – 1.0.
+    """
+    if not n_query_tokens or not n_query_trigrams:
+        return 0.0
+    return TOKEN_WEIGHT * token_hits / n_query_tokens + TRIGRAM_WEIGHT * trigram_hits / n_query_trigrams
+
+
+def rank(query: str, names: list[str]) -> list[float]:
+    """Similarity of query to every name, in one pass over precomputed query sets."""
+    q_tokens = set(tokens(query))
+    q_trigrams = trigrams(q_tokens)
+    scores = []
+    for name in names:
+        n_tokens = set(tokens(name))
+        scores.append(score(
+            len(q_tokens & n_tokens), len(q_tokens),
+            len(q_trigrams & trigrams(n_tokens)), len(q_trigrams),
+        ))
+    return scores
+
+
+def parse_paise(price) -> int | None:
+    """Paise from a displayed price ("₹1,299.50" → 129950), None if unparseable."""
+    digits = _NOT_PRICE_RE.sub("", str(price))
+    try:
+        return round(float(digits) * 100)
+    except ValueError:
+        return None
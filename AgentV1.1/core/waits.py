@@ -0,0 +1,68 @@
+"""
+Waits — event-driven readiness conditions instead of fixed sleeps.
+
+wait_until() polls an async predicate with exponential backoff until it
+holds or the timeout expires, so a step continues as soon as the page is
+ready instead of after a guaranteed delay. When given an agent name it
+records how long the wait actually took in the step log.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from config import config
+from core.step_logger import log_step, StepType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WaitPolicy:
+    timeout: float = config.WAIT_TIMEOUT  # give up after this many seconds
+    poll: float = 0.05                    # first re-check interval
+    backoff: float = 1.5                  # interval multiplier after each miss
+    max_poll: float = 0.5                 # interval ceiling
+
+
+DEFAULT_WAIT = WaitPolicy()
+
+
+async def wait_until(
+    condition: Callable[[], Awaitable[bool]],
+    description: str = "",
+    agent: str | None = None,
+    policy: WaitPolicy = DEFAULT_WAIT,
+) -> bool:
+    """
+    Re-check condition until it returns True or policy.timeout elapses.
+    Exceptions from condition count as "not ready yet".
+
+    Returns True if the condition was met.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    interval = policy.poll
+
+    while True:
+        try:
+            ready = await condition()
+        except Exception as e:
+            logger.debug(f"Wait condition '{description}' raised: {e}")
+            ready = False
+
+        elapsed = loop.time() - start
+        if ready:
+            if agent:
+                await log_step(agent, StepType.WAIT, f"Ready: {description}", f"waited={elapsed:.2f}s")
+            return True
+
+        if elapsed >= policy.timeout:
+            if agent:
+                await log_step(agent, StepType.WAIT, f"Timed out waiting for {description}", f"waited={elapsed:.2f}s")
+            logger.warning(f"[{agent or 'wait'}] Timed out after {elapsed:.1f}s waiting for {description}")
+            return False
+
+        await asyncio.sleep(min(interval, policy.timeout - elapsed))
+        interval = min(interval * policy.backoff, policy.max_poll)
@@ -0,0 +1,121 @@
+"""
+Memory benchmark — inserts per second into the agent's SQLite store.
+
+Compares the old access pattern (a fresh connection, default rollback
+journal, per call) with core.memory.Memory's shared WAL connection —
+committing every write (durable=True) and with the default write-behind
+buffer — for the two hot writes (save_message, log_action) and a mixed
+read/write loop like a chat turn. Uses throwaway databases in a temp
+directory.
+
+Run:
+    python dev/bench_memory.py            # 2000 operations per case
+    python dev/bench_memory.py 10000
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiosqlite
+
+from core.memory import Memory
+
+
+class PerCallMemory(Memory):
+    """Memory as it was before the shared connection: connect, write, commit, close on every call."""
+
+    async def save_message(self, role: str, message: str, sender_name: str = "", durable: bool = False):
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                "INSERT INTO conversations (role, message, sender_name) VALUES (?, ?, ?)",
+                (role, message, sender_name),
+            )
+            await db.commit()
+
+    async def log_action(
+        self,
+        agent_name: str,
+        action: str,
+        input_data: str = "",
+        output_data: str = "",
+        status: str = "ok",
+        durable: bool = False,
+    ):
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                "INSERT INTO agent_logs (agent_name, action, input_data, output_data, status) VALUES (?, ?, ?, ?, ?)",
+                (agent_name, action, input_data, output_data, status),
+            )
+            await db.commit()
+
+    async def get_recent_messages(self, limit: int = 20):
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute(
+                "SELECT role, message, sender_name, timestamp FROM conversations ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            return await cursor.fetchall()
+
+
+async def _init(memory: Memory, wal: bool):
+    await memory.init_db()
+    if not wal:
+        # The old code never set a journal mode; undo the WAL that init_db's connection switched on
+        await memory.close()
+        async with aiosqlite.connect(memory.db_path) as db:
+            await db.execute("PRAGMA journal_mode = DELETE")
+
+
+async def _save(memory: Memory, n: int, durable: bool):
+    for i in range(n):
+        await memory.save_message("target", f"message {i}", "Ananya", durable=durable)
+
+
+async def _log(memory: Memory, n: int, durable: bool):
+    for i in range(n):
+        await memory.log_action("WhatsAppAgent", "reply", f"in {i}", f"out {i}", durable=durable)
+
+
+async def _turn(memory: Memory, n: int, durable: bool):
+    # One chat turn: store the incoming message, read context, store the reply, log it
+    for i in range(n // 4):
+        await memory.save_message("target", f"message {i}", "Ananya", durable=durable)
+        await memory.get_recent_messages(10)
+        await memory.save_message("agent", f"reply {i}", "Saswata", durable=durable)
+        await memory.log_action("WhatsAppAgent", "reply", f"in {i}", f"out {i}", durable=durable)
+
+
+CASES = {"save_message": _save, "log_action": _log, "chat turn (mixed)": _turn}
+
+
+async def _run(cls, wal: bool, durable: bool, case, n: int, directory: str) -> float:
+    memory = cls(os.path.join(directory, f"{cls.__name__}-{case.__name__}-{durable}.db"))
+    await _init(memory, wal)
+    started = time.perf_counter()
+    await case(memory, n, durable)
+    await memory.close()  # includes the final write-behind flush
+    return n / (time.perf_counter() - started)
+
+
+async def main(n: int):
+    print(f"{n} operations per case\n")
+    print(f"{'case':<20} {'per-call connect':>18} {'shared WAL':>12} {'write-behind':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, case in CASES.items():
+            before = await _run(PerCallMemory, False, True, case, n, directory)
+            shared = await _run(Memory, True, True, case, n, directory)
+            buffered = await _run(Memory, True, False, case, n, directory)
+            print(
+                f"{name:<20} {before:>16.0f}/s {shared:>10.0f}/s {buffered:>12.0f}/s"
+                f"   ({shared / before:.1f}x, {buffered / before:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
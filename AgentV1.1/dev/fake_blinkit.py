@@ -0,0 +1,192 @@
+"""
+Fake BlinkeyIt server — local stand-in for the Express API in BlinkIt/server.
+
+Implements just the routes the agent uses in API mode, with the same
+request/response shapes, backed by an in-memory catalog. No MongoDB,
+no JWT secret, no network.
+
+Run:
+    python dev/fake_blinkit.py            # serves on http://localhost:8080
+    BLINKIT_API_URL=http://localhost:8080 BLINKIT_MODE=api python main.py
+"""
+
+import os
+import sys
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from config import config
+
+app = FastAPI(title="Fake BlinkeyIt API")
+
+PRODUCTS: list[dict] = [
+    {"name": "Cadbury Dairy Milk Chocolate Bar", "price": 50, "discount": 0, "stock": 40, "unit": "50 g"},
+    {"name": "Nestle KitKat 4 Finger Chocolate", "price": 40, "discount": 5, "stock": 35, "unit": "37.3 g"},
+    {"name": "Cadbury Bournvita Hot Chocolate Drink", "price": 245, "discount": 10, "stock": 12, "unit": "500 g"},
+    {"name": "Hershey's Cocoa Hot Chocolate Mix", "price": 320, "discount": 0, "stock": 8, "unit": "225 g"},
+    {"name": "Amul Vanilla Ice Cream Tub", "price": 180, "discount": 0, "stock": 20, "unit": "1 L"},
+    {"name": "Kwality Walls Cornetto Chocolate", "price": 60, "discount": 0, "stock": 30, "unit": "105 ml"},
+    {"name": "Lays Classic Salted Chips", "price": 20, "discount": 0, "stock": 100, "unit": "52 g"},
+    {"name": "Maggi 2-Minute Masala Noodles", "price": 56, "discount": 0, "stock": 60, "unit": "280 g"},
+    {"name": "Coca-Cola Soft Drink", "price": 40, "discount": 0, "stock": 50, "unit": "750 ml"},
+    {"name": "Haldiram's Bhujia Sev", "price": 105, "discount": 0, "stock": 0, "unit": "400 g"},
+    {"name": "Britannia Good Day Cashew Cookies", "price": 35, "discount": 0, "stock": 45, "unit": "200 g"},
+    {"name": "Domino's Style Margherita Pizza", "price": 499, "discount": 0, "stock": 5, "unit": "1 pc"},
+]
+for _i, _p in enumerate(PRODUCTS):
+    _p.update({
+        "_id": f"prod{_i:04d}",
+        "image": [],
+        "category": [],
+        "subCategory": [],
+        "description": "",
+        "more_details": {},
+        "publish": True,
+        "createdAt": datetime(2025, 1, 1, 0, _i).isoformat(),
+    })
+
+USER = {"_id": "user0001", "email": config.BLINKIT_EMAIL, "password": config.BLINKIT_PASSWORD}
+ADDRESSES = [{"_id": "addr0001", "address_line": "221B Park Street", "city": "Kolkata", "pincode": "700016", "status": True}]
+
+TOKENS: set[str] = set()
+CART: list[dict] = []
+ORDERS: list[dict] = []
+
+
+def _ok(data=None, message="ok", **extra) -> dict:
+    return {"message": message, "error": False, "success": True, "data": data, **extra}
+
+
+def _err(message: str, status: int = 400) -> JSONResponse:
+    return JSONResponse({"message": message, "error": True, "success": False}, status_code=status)
+
+
+def _authorized(request: Request) -> bool:
+    header = request.headers.get("authorization", "")
+    token = request.cookies.get("accessToken") or (header.split(" ")[1] if " " in header else "")
+    return token in TOKENS
+
+
+def _search(term: str) -> list[dict]:
+    # Mongo $text matches any stemmed word; approximate with a case-insensitive word match
+    words = [w for w in term.lower().split() if w]
+    if not words:
+        return list(PRODUCTS)
+    return [p for p in PRODUCTS if any(w in p["name"].lower() for w in words)]
+
+
+@app.post("/api/user/login")
+async def login(request: Request):
+    body = await request.json()
+    if not body.get("email") or not body.get("password"):
+        return _err("provide email, password")
+    if body["email"] != USER["email"]:
+        return _err("User not register")
+    if body["password"] != USER["password"]:
+        return _err("Check your password")
+    token = uuid.uuid4().hex
+    TOKENS.add(token)
+    return _ok({"accesstoken": token, "refreshToken": uuid.uuid4().hex}, "Login successfully")
+
+
+@app.post("/api/product/get")
+async def get_products(request: Request):
+    body = await request.json()
+    page, limit = body.get("page") or 1, body.get("limit") or 10
+    matches = sorted(_search(body.get("search", "")), key=lambda p: p["createdAt"], reverse=True)
+    data = matches[(page - 1) * limit: page * limit]
+    return _ok(data, "Product data", totalCount=len(matches), totalNoPage=-(-len(matches) // limit))
+
+
+@app.post("/api/product/search-product")
+async def search_product(request: Request):
+    body = await request.json()
+    page, limit = body.get("page") or 1, body.get("limit") or 10
+    matches = sorted(_search(body.get("search", "")), key=lambda p: p["createdAt"], reverse=True)
+    data = matches[(page - 1) * limit: page * limit]
+    return _ok(data, "Product data", totalCount=len(matches), totalPage=-(-len(matches) // limit), page=page, limit=limit)
+
+
+@app.post("/api/cart/create")
+async def add_to_cart(request: Request):
+    if not _authorized(request):
+        return _err("Provide token", 401)
+    body = await request.json()
+    product_id = body.get("productId")
+    if not product_id:
+        return _err("Provide productId", 402)
+    if any(c["productId"] == product_id for c in CART):
+        return JSONResponse({"message": "Item already in cart"}, status_code=400)
+    item = {"_id": uuid.uuid4().hex[:12], "productId": product_id, "quantity": 1, "userId": USER["_id"]}
+    CART.append(item)
+    return _ok(item, "Item add successfully")
+
+
+@app.get("/api/cart/get")
+async def get_cart(request: Request):
+    if not _authorized(request):
+        return _err("Provide token", 401)
+    by_id = {p["_id"]: p for p in PRODUCTS}
+    return _ok([{**c, "productId": by_id[c["productId"]]} for c in CART if c["productId"] in by_id])
+
+
+@app.delete("/api/cart/delete-cart-item")
+async def delete_cart_item(request: Request):
+    if not _authorized(request):
+        return _err("Provide token", 401)
+    body = await request.json()
+    item_id = body.get("_id")
+    if not item_id:
+        return _err("Provide _id")
+    # Mongo deleteOne({_id, userId}) result
+    before = len(CART)
+    CART[:] = [c for c in CART if not (c["_id"] == item_id and c["userId"] == USER["_id"])]
+    return _ok({"acknowledged": True, "deletedCount": before - len(CART)}, "Item remove")
+
+
+@app.get("/api/address/get")
+async def get_addresses(request: Request):
+    if not _authorized(request):
+        return _err("Provide token", 401)
+    return _ok(ADDRESSES, "List of address")
+
+
+@app.post("/api/order/cash-on-delivery")
+async def cash_on_delivery(request: Request):
+    if not _authorized(request):
+        return _err("Provide token", 401)
+    body = await request.json()
+    orders = [
+        {
+            "userId": USER["_id"],
+            "orderId": f"ORD-{uuid.uuid4().hex[:24]}",
+            "productId": el["productId"]["_id"],
+            "product_details": {"name": el["productId"]["name"], "image": el["productId"].get("image", [])},
+            "paymentId": "",
+            "payment_status": "CASH ON DELIVERY",
+            "delivery_address": body.get("addressId"),
+            "subTotalAmt": body.get("subTotalAmt"),
+            "totalAmt": body.get("totalAmt"),
+        }
+        for el in body.get("list_items", [])
+    ]
+    ORDERS.extend(orders)
+    CART.clear()
+    return _ok(orders, "Order successfully")
+
+
+@app.get("/api/order/order-list")
+async def order_list(request: Request):
+    if not _authorized(request):
+        return _err("Provide token", 401)
+    return _ok(ORDERS, "order list")
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("FAKE_BLINKIT_PORT", "8080")))
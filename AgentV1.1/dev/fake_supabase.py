@@ -0,0 +1,252 @@
+"""
+Fake Supabase — local stand-in for the WhatsApp clone's Supabase project.
+
+Serves the two surfaces the agent talks to, backed by an in-memory
+`chats` table (same columns as Whatsapp/supabase.sql):
+
+- PostgREST at /rest/v1/chats: select with eq/neq/gt/gte/lt/lte/in/is
+  filters, order, limit/offset, and inserts (return=representation;
+  duplicate ids are a 409 unless resolution=ignore-duplicates).
+- Realtime at /realtime/v1/websocket: Phoenix channel protocol (vsn
+  1.0.0) with phx_join / heartbeat / phx_leave and postgres_changes
+  INSERT broadcasts filtered by eq / in on any column.
+
+POST /dev/realtime/drop?refuse_for=N closes every websocket and refuses
+new ones for N seconds, to exercise the agent's polling fallback and
+gap-fill.
+
+Run:
+    python dev/fake_supabase.py           # serves on http://localhost:54321
+    SUPABASE_URL=http://localhost:54321 SUPABASE_ANON_KEY=dev python main.py
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
+
+app = FastAPI(title="Fake Supabase")
+
+TABLES: dict[str, list[dict]] = {"chats": []}
+COLUMN_DEFAULTS = {
+    "chats": lambda: {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat()},
+}
+
+# websocket → {topic: [binding, ...]}
+SUBSCRIPTIONS: dict[WebSocket, dict[str, list[dict]]] = {}
+_binding_ids = iter(range(1, 1 << 31))
+_refuse_until = 0.0
+
+
+# ── PostgREST ────────────────────────────────────────────────
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+
+def _coerce(value: str):
+    return None if value == "null" else value
+
+
+def _matches(row: dict, column: str, expr: str) -> bool:
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, operand = expr.partition(".")
+    value = row.get(column)
+    if op == "in":
+        options = [o.strip().strip('"') for o in operand.strip("()").split(",")]
+        result = value is not None and str(value) in options
+    elif op == "is":
+        result = value is None if operand == "null" else str(value).lower() == operand
+    elif value is None:
+        result = False
+    else:
+        operand = _coerce(operand)
+        compare = {
+            "eq": lambda a, b: a == b,
+            "neq": lambda a, b: a != b,
+            "gt": lambda a, b: a > b,
+            "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b,
+            "lte": lambda a, b: a <= b,
+        }.get(op)
+        if compare is None:
+            raise ValueError(f"unsupported operator '{op}'")
+        result = compare(_sortable(column, value), _sortable(column, operand))
+    return result != negate
+
+
+def _sortable(column: str, value):
+    """Timestamps compare as instants, whatever their string format."""
+    if column.endswith("_at") and isinstance(value, str):
+        try:
+            ts = datetime.fromisoformat(value.replace("Z", "+00:00").replace(" ", "T", 1))
+            return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    return value
+
+
+def _select(table: str, params) -> list[dict]:
+    rows = TABLES[table]
+    for column, expr in params.multi_items():
+        if column not in RESERVED_PARAMS:
+            rows = [r for r in rows if _matches(r, column, expr)]
+
+    for term in reversed([t for t in params.get("order", "").split(",") if t]):
+        column, *modifiers = term.split(".")
+        rows = sorted(rows, key=lambda r: _sortable(column, r.get(column)) or "", reverse="desc" in modifiers)
+
+    offset = int(params.get("offset", 0))
+    limit = params.get("limit")
+    rows = rows[offset:offset + int(limit) if limit is not None else None]
+
+    columns = [c.strip() for c in params.get("select", "*").split(",") if c.strip()]
+    if columns and "*" not in columns:
+        rows = [{c: r.get(c) for c in columns} for r in rows]
+    return rows
+
+
+def _body(request: Request, rows: list[dict], status: int = 200) -> Response:
+    if "vnd.pgrst.object" in request.headers.get("accept", ""):
+        if len(rows) != 1:
+            return JSONResponse({"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned"}, 406)
+        return JSONResponse(rows[0], status)
+    return JSONResponse(rows, status)
+
+
+@app.get("/rest/v1/{table}")
+async def select_rows(table: str, request: Request):
+    if table not in TABLES:
+        return JSONResponse({"code": "42P01", "message": f'relation "public.{table}" does not exist'}, 404)
+    try:
+        return _body(request, _select(table, request.query_params))
+    except ValueError as e:
+        return JSONResponse({"code": "PGRST100", "message": str(e)}, 400)
+
+
+@app.post("/rest/v1/{table}")
+async def insert_rows(table: str, request: Request):
+    if table not in TABLES:
+        return JSONResponse({"code": "42P01", "message": f'relation "public.{table}" does not exist'}, 404)
+    payload = await request.json()
+    prefer = request.headers.get("prefer", "")
+    existing = {row.get("id") for row in TABLES[table]}
+    inserted = []
+    for item in payload if isinstance(payload, list) else [payload]:
+        row = {**COLUMN_DEFAULTS.get(table, dict)(), **item}
+        if row.get("id") in existing:
+            if "resolution=ignore-duplicates" in prefer:
+                continue
+            return JSONResponse({"code": "23505", "message": f'duplicate key value violates unique constraint "{table}_pkey"'}, 409)
+        existing.add(row.get("id"))
+        inserted.append(row)
+    TABLES[table].extend(inserted)
+    for row in inserted:
+        await _broadcast_insert(table, row)
+
+    if "return=representation" in prefer:
+        return _body(request, inserted, 201)
+    return Response(status_code=201)
+
+
+# ── Realtime ─────────────────────────────────────────────────
+
+def _binding_matches(binding: dict, table: str, row: dict) -> bool:
+    if binding.get("event") not in ("INSERT", "*") or binding.get("table") != table:
+        return False
+    row_filter = binding.get("filter")
+    if not row_filter:
+        return True
+    column, _, expr = row_filter.partition("=")
+    return _matches(row, column, expr)
+
+
+async def _broadcast_insert(table: str, row: dict):
+    for ws, topics in list(SUBSCRIPTIONS.items()):
+        for topic, bindings in topics.items():
+            ids = [b["id"] for b in bindings if _binding_matches(b, table, row)]
+            if not ids:
+                continue
+            message = {
+                "topic": topic,
+                "event": "postgres_changes",
+                "payload": {
+                    "ids": ids,
+                    "data": {
+                        "schema": "public",
+                        "table": table,
+                        "commit_timestamp": row.get("created_at"),
+                        "type": "INSERT",
+                        "errors": None,
+                        "columns": [{"name": k, "type": "text"} for k in row],
+                        "record": row,
+                    },
+                },
+                "ref": None,
+            }
+            try:
+                await ws.send_text(json.dumps(message))
+            except Exception:
+                SUBSCRIPTIONS.pop(ws, None)
+
+
+def _reply(message: dict, status: str = "ok", response: dict | None = None) -> str:
+    return json.dumps({
+        "topic": message.get("topic"),
+        "event": "phx_reply",
+        "payload": {"status": status, "response": response or {}},
+        "ref": message.get("ref"),
+        "join_ref": message.get("join_ref"),
+    })
+
+
+@app.websocket("/realtime/v1/websocket")
+async def realtime(ws: WebSocket):
+    if time.monotonic() < _refuse_until:
+        await ws.close(code=1013)
+        return
+    await ws.accept()
+    SUBSCRIPTIONS[ws] = {}
+    try:
+        while True:
+            message = json.loads(await ws.receive_text())
+            event, topic = message.get("event"), message.get("topic")
+            if event == "heartbeat":
+                await ws.send_text(_reply(message))
+            elif event == "phx_join":
+                changes = ((message.get("payload") or {}).get("config") or {}).get("postgres_changes") or []
+                bindings = [{**c, "id": next(_binding_ids)} for c in changes]
+                if any(b.get("table") not in TABLES for b in bindings):
+                    await ws.send_text(_reply(message, "error", {"reason": "unknown table"}))
+                    continue
+                SUBSCRIPTIONS[ws][topic] = bindings
+                await ws.send_text(_reply(message, response={"postgres_changes": bindings}))
+            elif event == "phx_leave":
+                SUBSCRIPTIONS[ws].pop(topic, None)
+                await ws.send_text(_reply(message))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        SUBSCRIPTIONS.pop(ws, None)
+
+
+@app.post("/dev/realtime/drop")
+async def drop_realtime(refuse_for: float = 0):
+    """Close every realtime socket and refuse reconnects for `refuse_for` seconds."""
+    global _refuse_until
+    _refuse_until = time.monotonic() + refuse_for
+    sockets = list(SUBSCRIPTIONS)
+    SUBSCRIPTIONS.clear()
+    await asyncio.gather(*(ws.close(code=1012) for ws in sockets), return_exceptions=True)
+    return {"dropped": len(sockets), "refusing_for_s": refuse_for}
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("FAKE_SUPABASE_PORT", "54321")))
@@ -2,12 +2,13 @@ import asyncio
 import logging
 import os
 import sys
+import uuid
 
 # Add project root to path so imports work
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import config
@@ -105,26 +106,73 @@ async def trigger_order(body: dict):
     item = body.get("item", "")
     if not item:
         return {"error": "No item specified"}
-    await orchestrator.event_bus.publish("ORDER_REQUESTED", {"item": item})
-    return {"status": "order_requested", "item": item}
+    order_id = uuid.uuid4().hex[:8]
+    await orchestrator.event_bus.publish("ORDER_REQUESTED", {"item": item, "order_id": order_id})
+    return {"status": "order_requested", "item": item, "order_id": order_id}
+
+
+@app.get("/orders")
+async def get_orders():
+    """Get the state of recent orders (queued, running, finished)."""
+    if not orchestrator:
+        return {"error": "Orchestrator not running"}
+    return {"orders": orchestrator.get_orders()}
+
+
+@app.post("/order/{order_id}/cancel")
+async def cancel_order(order_id: str):
+    """Cancel a queued or running order."""
+    if not orchestrator:
+        return {"error": "Orchestrator not running"}
+    if not await orchestrator.cancel_order(order_id):
+        return {"error": f"Order {order_id} not found or already finished"}
+    return {"status": "cancelling", "order_id": order_id}
 
 
 @app.get("/logs")
-async def get_logs(limit: int = 50):
-    """Get recent agent activity logs."""
+async def get_logs(limit: int = 50, agent: str | None = None):
+    """Get recent agent activity logs (of one agent if given)."""
     if not orchestrator:
         return {"error": "Orchestrator not running"}
-    logs = await orchestrator.memory.get_recent_logs(limit)
+    logs = await orchestrator.memory.get_recent_logs(limit, agent_name=agent)
     return {"logs": logs}
 
 
 @app.get("/messages")
-async def get_messages(limit: int = 20):
-    """Get recent conversation messages."""
+async def get_messages(limit: int = 20, conversation_id: str | None = None):
+    """Get recent conversation messages (of one conversation if given)."""
+    if not orchestrator:
+        return {"error": "Orchestrator not running"}
+    messages = await orchestrator.memory.get_recent_messages(limit, conversation_id=conversation_id)
+    return {"messages": [m.to_dict() for m in messages]}
+
+
+@app.get("/search")
+async def search(
+    q: str,
+    conversation_id: str | None = None,
+    agent_name: str | None = None,
+    limit: int = 20,
+    scope: str = "messages",
+):
+    """
+    Full-text search, best match first: stored messages (scope=messages,
+    optionally in one conversation_id) or agent logs (scope=logs, optionally
+    from one agent_name).
+    """
+    if scope not in ("messages", "logs"):
+        raise HTTPException(status_code=400, detail=f"Unknown scope '{scope}' (use 'messages' or 'logs')")
+    if scope == "logs" and conversation_id:
+        raise HTTPException(status_code=400, detail="conversation_id only applies to scope=messages")
+    if scope == "messages" and agent_name:
+        raise HTTPException(status_code=400, detail="agent_name only applies to scope=logs")
     if not orchestrator:
         return {"error": "Orchestrator not running"}
-    messages = await orchestrator.memory.get_recent_messages(limit)
-    return {"messages": [m.model_dump() for m in messages]}
+    if scope == "logs":
+        results = await orchestrator.memory.search_logs(q, agent_name, limit)
+    else:
+        results = await orchestrator.memory.search(q, conversation_id, limit)
+    return {"query": q, "scope": scope, "results": results}
 
 
 @app.get("/supermemory")
@@ -156,10 +204,12 @@ if __name__ == "__main__":
     print("=" * 60)
     print(f"  WhatsApp URL  : {config.WHATSAPP_URL}")
     print(f"  BlinkeyIt URL : {config.BLINKIT_URL}")
+    print(f"  BlinkeyIt Mode: {config.BLINKIT_MODE} (API: {config.BLINKIT_API_URL})")
     print(f"  Agent (You)   : {config.WHATSAPP_AGENT_USER}")
     print(f"  Chatting with : {config.WHATSAPP_TARGET_CONTACT}")
     print(f"  Headless      : {config.HEADLESS}")
-    print(f"  Poll Interval : {config.POLL_INTERVAL}s")
+    print(f"  Ingest        : {config.INGEST_MODE} (poll every {config.POLL_MIN_INTERVAL:g}-{config.POLL_MAX_INTERVAL:g}s)")
+    print(f"  Max Orders    : {config.MAX_CONCURRENT_ORDERS} concurrent")
     print("-" * 60)
     print(f"  Instruction   : {config.INITIAL_INSTRUCTION[:80]}...")
     print(f"  SuperMemory   : {config.SUPERMEMORY_PATH}")
@@ -170,7 +220,9 @@ if __name__ == "__main__":
     print("    GET  /logs              - Activity logs")
     print("    GET  /messages          - Chat messages")
     print("    GET  /supermemory       - View supermemory")
+    print("    GET  /orders            - Order states")
     print("    POST /order             - Trigger order: {\"item\": \"...\"}")
+    print("    POST /order/{id}/cancel - Cancel an order")
     print("    POST /supermemory/reload- Reload supermemory.md")
     print("    POST /stop              - Stop orchestrator")
     print("    POST /restart           - Restart orchestrator")
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ChatMessage(BaseModel):
@@ -20,9 +20,12 @@ class IntentResult(BaseModel):
 
 class FoodOption(BaseModel):
     name: str
-    price: str
+    price: str  # as displayed, e.g. "₹120.00"
+    price_paise: Optional[int] = None  # None when the price couldn't be read
     description: Optional[str] = None
-    element_index: int = 0
+    element_index: int = 0  # position of the product card / result
+    product_id: Optional[str] = None
+    add_selector: Optional[str] = None  # CSS selector for the card's "Add" button (browser only)
 
 
 class OrderDecision(BaseModel):
@@ -41,3 +44,15 @@ class AgentStatus(BaseModel):
     status: str = "idle"  # "running" | "idle" | "error"
     current_action: Optional[str] = None
     last_update: datetime = datetime.now()
+
+
+class OrderStatus(BaseModel):
+    order_id: str
+    item: str
+    status: str = "queued"  # "queued" | "running" | "completed" | "failed" | "cancelled" | "unknown"
+    cancel_requested: bool = False  # cancelled mid-batch; the agent reports whether it was dropped in time
+    chosen: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -148,6 +148,21 @@ export default function Home() {
     setHydrated(true);
   }, []);
 
+  // Deep link: #chat=<contact id> opens that chat, so scripts can switch chats without clicking
+  useEffect(() => {
+    const openFromHash = () => {
+      const contactId = new URLSearchParams(window.location.hash.slice(1)).get("chat");
+      if (!contactId || !ALL_CONTACTS.some((c) => c.id === contactId)) return;
+      setSelectedContactId(contactId);
+      setMessages([]);
+      setNewMessage("");
+      setReadChats((prev) => ({ ...prev, [contactId]: true }));
+    };
+    openFromHash();
+    window.addEventListener("hashchange", openFromHash);
+    return () => window.removeEventListener("hashchange", openFromHash);
+  }, []);
+
   const formattedMessages = useMemo(
     () =>
       messages.map((m) => ({
@@ -361,6 +376,7 @@ export default function Home() {
                   <div
                     className={`user${effectiveSelectedId === contact.id ? " selected" : ""}`}
                     key={contact.id}
+                    data-contact-id={contact.id}
                     onClick={() => handleSelectContact(contact.id)}
                   >
                     <div className={`pfp${contact.nopic ? " nopic" : ""}`}>
@@ -406,7 +422,7 @@ export default function Home() {
                   alt=""
                 />
               </div>
-              <div className="profileInformation">
+              <div className="profileInformation" data-contact-id={effectiveSelectedId ?? ""}>
                 <h4>{selectedContact?.name ?? ""}</h4>
                 <p>online</p>
               </div>
@@ -64,7 +64,7 @@ async def run_chat_agent(
     print(f"{'='*60}\n")
 
     # Build the style prompt from chat history
-    style_prompt = build_style_prompt(WHATSAPP_USER_ID)
+    style_prompt = await build_style_prompt(WHATSAPP_USER_ID)
     print("[Style] Loaded user texting style from chat history.\n")
 
     llm = get_llm()
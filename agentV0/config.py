@@ -11,6 +11,8 @@ ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 # Supabase
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "5"))  # per request, seconds
+SUPABASE_RETRIES = int(os.getenv("SUPABASE_RETRIES", "2"))  # extra attempts on timeouts / connection errors
 
 # WhatsApp Clone
 WHATSAPP_URL = os.getenv("WHATSAPP_URL", "https://whatsapp-rl-clone.vercel.app/")
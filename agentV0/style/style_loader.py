@@ -1,50 +1,92 @@
 """
 Style Loader — Pulls chat history from Supabase and builds a system prompt
 that teaches the LLM to text like the user (Saswata / user1).
+
+Queries go through supabase's async client so they don't block the event
+loop the browser agent runs on; each one has a timeout and is retried on
+timeouts / connection errors and 429 / 5xx responses.
 """
 
-from supabase import create_client
-from config import SUPABASE_URL, SUPABASE_ANON_KEY, WHATSAPP_USER_ID
+import asyncio
+import random
+
+import httpx
+from postgrest.exceptions import APIError
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+from config import SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_TIMEOUT, SUPABASE_RETRIES, WHATSAPP_USER_ID
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# PostgREST answers 503/504 with these codes while the database is unreachable
+RETRY_POSTGREST_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+_client: AsyncClient | None = None
+
+
+async def get_supabase_client() -> AsyncClient:
+    """One shared async client (and connection pool) per process."""
+    global _client
+    if _client is None:
+        _client = await acreate_client(
+            SUPABASE_URL,
+            SUPABASE_ANON_KEY,
+            options=AsyncClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT),
+        )
+    return _client
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, and 429 / 5xx responses."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        # A non-JSON error body (gateway 429 / 5xx) leaves the HTTP status in .code
+        return error.code in RETRY_STATUSES or error.code in RETRY_POSTGREST_CODES
+    return False
 
 
-def get_supabase_client():
-    return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+async def _execute(query):
+    """Run a read query, retrying timeouts / connection errors and 429 / 5xx with backoff."""
+    for attempt in range(SUPABASE_RETRIES + 1):
+        try:
+            return await query.execute()
+        except (httpx.TransportError, APIError) as e:
+            if attempt == SUPABASE_RETRIES or not _is_retryable(e):
+                raise
+            await asyncio.sleep(min(0.25 * 2 ** attempt, 4.0) * random.uniform(0.5, 1.5))
 
 
-def fetch_chat_history(user_id: str = WHATSAPP_USER_ID, limit: int = 200) -> list[dict]:
+async def fetch_chat_history(user_id: str = WHATSAPP_USER_ID, limit: int = 200) -> list[dict]:
     """Fetch recent messages sent BY the user to learn their texting style."""
-    client = get_supabase_client()
-    result = (
+    client = await get_supabase_client()
+    result = await _execute(
         client.table("chats")
         .select("content, conversation_id, created_at")
         .eq("sender_id", user_id)
         .order("created_at", desc=True)
         .limit(limit)
-        .execute()
     )
     return result.data if result.data else []
 
 
-def fetch_conversation_history(conversation_id: str, limit: int = 50) -> list[dict]:
+async def fetch_conversation_history(conversation_id: str, limit: int = 50) -> list[dict]:
     """Fetch full conversation history for a specific chat."""
-    client = get_supabase_client()
-    result = (
+    client = await get_supabase_client()
+    result = await _execute(
         client.table("chats")
         .select("sender_id, content, created_at")
         .eq("conversation_id", conversation_id)
         .order("created_at", desc=False)
         .limit(limit)
-        .execute()
     )
     return result.data if result.data else []
 
 
-def build_style_prompt(user_id: str = WHATSAPP_USER_ID) -> str:
+async def build_style_prompt(user_id: str = WHATSAPP_USER_ID) -> str:
     """
     Analyze the user's past messages and build a system prompt
     that instructs the LLM to mimic their texting style.
     """
-    messages = fetch_chat_history(user_id, limit=200)
+    messages = await fetch_chat_history(user_id, limit=200)
 
     if not messages:
         return (
@@ -91,5 +133,5 @@ RULES:
 
 if __name__ == "__main__":
     # Test: print the generated style prompt
-    prompt = build_style_prompt()
+    prompt = asyncio.run(build_style_prompt())
     print(prompt)